@@ -0,0 +1,158 @@
+"""Measures compute_features throughput for a growing number of workers.
+
+Rows are computed by the real get_row against a local fake of the Github
+API, which answers after the given latency and, like Github, refuses the
+requests of a token beyond its rate limit until the limit resets. The
+tokens are leased from the token pool as in production, S3 uploads are
+skipped. Logs, metrics and caches are written into a temporary directory.
+Run from this directory, e.g.:
+
+    python benchmark_workers.py --repos 200 --latency 0.02 --workers 1 2 4 8
+"""
+from argparse import ArgumentParser
+from base64 import b64encode
+from logging import getLogger
+from marshal import dump
+from os import chdir, environ, path, remove
+from shutil import copytree
+from tempfile import mkdtemp
+from time import time
+
+from tests.fake_github import FakeGithub, repo_json
+
+
+CONTRIBUTORS = ['alice', 'bob', 'carol']
+
+
+def _date(year: int, month: int, day: int = 1) -> str:
+    return f'{year}-{month:02d}-{day:02d}T12:00:00Z'
+
+
+def _serve_user(fake: FakeGithub, login: str) -> None:
+    fake.route('GET', f'/users/{login}', (200, {
+        'login': login, 'type': 'User', 'url': f'{fake.url}/users/{login}',
+        'created_at': _date(2012, 1), 'followers': 10, 'following': 5,
+        'public_repos': 20
+    }))
+
+
+def _serve_repo(fake: FakeGithub, repo_id: int) -> None:
+    """Serves a repository with three years of history."""
+    repo = repo_json(url=fake.url, name=f'repo{repo_id}')
+    repo['id'] = repo_id
+    repo_path = f'/repos/owner/repo{repo_id}'
+    fake.route('GET', f'/repositories/{repo_id}', (200, repo))
+    fake.route('GET', repo_path, (200, repo))
+
+    dates = [
+        _date(year, month) for year in (2020, 2019, 2018)
+        for month in range(12, 0, -1)
+    ]
+    fake.route('GET', f'{repo_path}/commits', (200, [{
+        'sha': f'{repo_id:020x}{index:020x}',
+        'commit': {
+            'author': {'name': login, 'date': date},
+            'committer': {'name': login, 'date': date},
+        },
+        'author': {'login': login},
+    } for index, (date, login) in enumerate(zip(
+        dates, CONTRIBUTORS * len(dates)
+    ))]))
+    fake.route('GET', f'{repo_path}/pulls', (200, [{
+        'number': index, 'state': 'closed', 'created_at': date,
+        'closed_at': date, 'merged_at': date
+    } for index, date in enumerate(dates[:12])]))
+    fake.route('GET', f'{repo_path}/issues', (200, [{
+        'number': index, 'state': 'open', 'created_at': date
+    } for index, date in enumerate(dates[:12])]))
+    fake.route('GET', f'{repo_path}/releases', (200, [{
+        'id': index, 'created_at': date
+    } for index, date in enumerate(dates[::6])]))
+    fake.route('GET', f'{repo_path}/branches', (200, [
+        {'name': 'master'}, {'name': 'develop'}
+    ]))
+    fake.route('GET', f'{repo_path}/contributors', (200, [
+        {'login': login, 'type': 'User', 'url': f'{fake.url}/users/{login}'}
+        for login in CONTRIBUTORS
+    ]))
+    fake.route('GET', f'{repo_path}/git/trees/master', (200, {
+        'sha': 'master', 'truncated': False, 'tree': [
+            {'path': name, 'type': kind, 'mode': '040000', 'sha': name}
+            for name, kind in [
+                ('src', 'tree'), ('src/main.py', 'blob'),
+                ('tests', 'tree'), ('tests/test_main.py', 'blob'),
+                ('docs', 'tree'), ('README.md', 'blob')
+            ]
+        ]
+    }))
+    fake.route('GET', f'{repo_path}/readme', (200, {
+        'type': 'file', 'encoding': 'base64', 'name': 'README.md',
+        'path': 'README.md', 'content': b64encode(b'# repo').decode()
+    }))
+
+
+parser = ArgumentParser()
+parser.add_argument('--repos', type=int, default=200)
+parser.add_argument('--latency', type=float, default=0.02)
+parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+parser.add_argument('--tokens', type=int, default=2)
+parser.add_argument(
+    '--rate-limit', type=int, default=1000,
+    help='Requests of a token until its limit resets'
+)
+parser.add_argument(
+    '--reset-seconds', type=float, default=5.0,
+    help='Time until the rate limit of a token resets'
+)
+args = parser.parse_args()
+
+configs = path.join(path.dirname(path.abspath(__file__)), 'configs')
+directory = mkdtemp()
+copytree(configs, path.join(directory, 'configs'))
+ids_file = f'{directory}/ids.dat'
+csv_file = f'{directory}/features.csv'
+
+with FakeGithub(
+    latency=args.latency, rate_limit=args.rate_limit,
+    reset_seconds=args.reset_seconds
+) as fake:
+    _serve_user(fake, login='owner')
+    for login in CONTRIBUTORS:
+        _serve_user(fake, login=login)
+    for repo_id in range(1, args.repos + 1):
+        _serve_repo(fake, repo_id=repo_id)
+
+    # the package reads the API and the tokens, and creates its files in
+    # the working directory, when it is imported
+    for name in list(environ):
+        if name.startswith('GITHUB_ACCESS_TOKEN'):
+            del environ[name]
+    environ['GITHUB_API_URL'] = fake.url
+    environ['GITHUB_ACCESS_TOKENS'] = ','.join(
+        f'token{index}' for index in range(args.tokens)
+    )
+    chdir(directory)
+    from data_gathering import TOKEN_POOL  # noqa: E402
+    from data_gathering.dataset import OfflineDataset  # noqa: E402
+    getLogger('data_gathering.dataset').disabled = True
+
+    for workers in args.workers:
+        with open(ids_file, 'wb') as f:
+            dump(set(range(1, args.repos + 1)), f)
+        requests, limited = len(fake.requests), fake.limited
+        start = time()
+        OfflineDataset().compute_features(
+            logger_name=f'{directory}/benchmark.log',
+            features_file='configs/features.yml', ids_file_name=ids_file,
+            csv_file_name=csv_file, region_name='', file_name_prefix='',
+            workers=workers
+        )
+        elapsed = time() - start
+        print(
+            f'workers: {workers:3d}, {args.repos / elapsed * 3600:10.0f} ' +
+            f'repos/hour, {elapsed:.2f} s, ' +
+            f'{len(fake.requests) - requests} requests, ' +
+            f'{fake.limited - limited} rate limited'
+        )
+        remove(csv_file)
+    print(f'Outputs in {directory}, tokens: {len(TOKEN_POOL)}')
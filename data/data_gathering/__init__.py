@@ -1,20 +1,32 @@
-
-from github import Github
-
 from os import getenv
 
-from .config import config_values
-
+from github.MainClass import DEFAULT_BASE_URL
 
-_GITHUB_ACCESS_TOKEN_0 = getenv('GITHUB_ACCESS_TOKEN_0')
-_GITHUB_ACCESS_TOKEN_1 = getenv('GITHUB_ACCESS_TOKEN_1')
-_GITHUB_ACCESS_TOKEN_2 = getenv('GITHUB_ACCESS_TOKEN_2')
-
-GIT_INSTANCE_0 = Github(login_or_token=_GITHUB_ACCESS_TOKEN_0)
-GIT_INSTANCE_1 = Github(login_or_token=_GITHUB_ACCESS_TOKEN_1)
-GIT_INSTANCE_2 = Github(login_or_token=_GITHUB_ACCESS_TOKEN_2)
-
-GITHUB_INSTANCES = [GIT_INSTANCE_0, GIT_INSTANCE_1, GIT_INSTANCE_2]
+from .config import config_values
+from .connection import install, observe_rate_limits
+from .http_cache import HttpCache
+from .metrics import Metrics
+from .token_pool import read_tokens, TokenPool
+
+
+_http_cache_config_values = config_values['http_cache']
+if _http_cache_config_values['enabled']:
+    HTTP_CACHE = HttpCache(
+        file_name=_http_cache_config_values['file'],
+        max_size=_http_cache_config_values['max_size_mb'] * 1024 ** 2
+    )
+else:
+    HTTP_CACHE = None
+METRICS = Metrics()
+# has to precede creation of the Github instances
+install(cache=HTTP_CACHE, metrics=METRICS)
+
+# e.g. the API of a Github Enterprise server
+TOKEN_POOL = TokenPool(
+    tokens=read_tokens(),
+    base_url=getenv('GITHUB_API_URL', DEFAULT_BASE_URL)
+)
+observe_rate_limits(observer=TOKEN_POOL.observe)
+GITHUB_INSTANCES = TOKEN_POOL.instances
 
 logger_config_values = config_values['logger']
-
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from .commit_store import CommitStore
+
+
+class _Author:
+
+    __slots__ = ('first', 'last', 'count')
+
+    def __init__(self, first: datetime, last: datetime, count: int) -> None:
+        self.first = first
+        self.last = last
+        self.count = count
+
+    def add(self, first: datetime, last: datetime, count: int) -> None:
+        self.first = min(self.first, first)
+        self.last = max(self.last, last)
+        self.count += count
+
+
+class AuthorTimeline:
+    """First and last commit dates and commit counts of the authors.
+
+    Authors are indexed both by name and by login, commits without a
+    linked account have no login. Built in a single pass, it answers join
+    dates, tenures and the first and last commit without going through the
+    history again.
+    """
+
+    def __init__(self) -> None:
+        self._names: Dict[Optional[str], _Author] = {}
+        self._logins: Dict[str, _Author] = {}
+        self._first: Optional[datetime] = None
+        self._last: Optional[datetime] = None
+
+    @classmethod
+    def from_commits(cls, commits: CommitStore) -> 'AuthorTimeline':
+        timeline = cls()
+        for index in range(len(commits)):
+            date = commits.date(index=index)
+            timeline.add(
+                name=commits.author_names[index],
+                login=commits.author_logins[index],
+                first=date, last=date, count=1
+            )
+        return timeline
+
+    @classmethod
+    def from_weeks(
+        cls, weeks: Dict[str, List[Tuple[datetime, int]]]
+    ) -> 'AuthorTimeline':
+        """Builds the timeline of weekly commit counts by login.
+
+        Commits are dated to their week, logins serve as names as well.
+        """
+        timeline = cls()
+        for login, counts in weeks.items():
+            for start, count in counts:
+                timeline.add(
+                    name=login, login=login, first=start,
+                    last=start + timedelta(days=7, seconds=-1), count=count
+                )
+        return timeline
+
+    def add(
+        self, name: Optional[str], login: Optional[str], first: datetime,
+        last: datetime, count: int
+    ) -> None:
+        authors = [(self._names, name)]
+        if login:
+            authors.append((self._logins, login))
+        for index, key in authors:
+            if key in index:
+                index[key].add(first=first, last=last, count=count)
+            else:
+                index[key] = _Author(first=first, last=last, count=count)
+        if self._first is None or first < self._first:
+            self._first = first
+        if self._last is None or last > self._last:
+            self._last = last
+
+    def first_datetime(self) -> datetime:
+        if self._first is None:
+            raise ValueError('Repository has no commits')
+        return self._first
+
+    def last_datetime(self) -> datetime:
+        if self._last is None:
+            raise ValueError('Repository has no commits')
+        return self._last
+
+    def joined(self, login: str) -> Optional[datetime]:
+        author = self._logins.get(login)
+        return author.first if author else None
+
+    def tenure(self, login: str) -> Optional[timedelta]:
+        author = self._logins.get(login)
+        return author.last - author.first if author else None
+
+    def names_joined(self, until: datetime) -> Set[Optional[str]]:
+        """Returns names of the authors with a commit until the date."""
+        return {
+            name for name, author in self._names.items()
+            if author.first <= until
+        }
+
+    def names_active(self, since: datetime) -> Set[Optional[str]]:
+        """Returns names of the authors with a commit since the date."""
+        return {
+            name for name, author in self._names.items()
+            if author.last >= since
+        }
+
+    def logins_active(self, since: datetime) -> Set[str]:
+        return {
+            login for login, author in self._logins.items()
+            if author.last >= since
+        }
+
+    def most_commits_by_name(self) -> Tuple[Optional[str], int]:
+        if not self._names:
+            raise ValueError('Repository has no commits')
+        name = max(self._names, key=lambda key: self._names[key].count)
+        return name, self._names[name].count
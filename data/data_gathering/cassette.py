@@ -0,0 +1,114 @@
+from datetime import datetime
+from hashlib import sha256
+from json import dumps, loads
+from sqlite3 import connect
+from threading import Lock
+from typing import Any, Dict, Optional
+from zlib import compress, decompress
+
+from .http_cache import CachedResponse
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+# time of the recording while a cassette is replayed
+_frozen_datetime: Optional[datetime] = None
+
+
+def current_datetime() -> datetime:
+    """Returns the current time, or the time of the replayed recording.
+
+    Requests derived from the current time, e.g. commits of the last year,
+    are then the same on replay as when recorded, and so are the ages.
+    """
+    return _frozen_datetime or datetime.now()
+
+
+def freeze_clock(at: Optional[datetime]) -> None:
+    global _frozen_datetime
+    _frozen_datetime = at
+
+
+class Cassette:
+    """HTTP exchanges with Github recorded into a file and replayed from it.
+
+    While recording, responses are stored by the request method, URL and a
+    hash of the request body, without the credentials, so a cassette
+    recorded with any token is replayed without one. The last response to
+    a repeated request wins. Bodies are stored compressed in an SQLite
+    database, like in HttpCache. The time of the recording is stored too,
+    replaying freezes the clock at it, see current_datetime.
+    """
+
+    def __init__(self, file_name: str, replay: bool = False) -> None:
+        self.file_name = file_name
+        self.replay = replay
+        self._connection = connect(file_name, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS interactions (' +
+            'key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB)'
+        )
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS recording (' +
+            'id INTEGER PRIMARY KEY CHECK (id = 0), started TEXT)'
+        )
+        if not replay:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO recording VALUES (0, ?)',
+                (datetime.now().isoformat(),)
+            )
+        self._connection.commit()
+        self._lock = Lock()
+
+        self.recorded = 0
+        self.replayed = 0
+
+    @property
+    def recorded_at(self) -> Optional[datetime]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT started FROM recording'
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    @staticmethod
+    def key(verb: str, url: str, input: Any) -> str:
+        body = sha256(str(input).encode()).hexdigest() if input else ''
+        return f'{verb} {url} {body}'
+
+    def record(
+        self, key: str, status: int, headers: Dict[str, str], body: str
+    ) -> None:
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO interactions VALUES (?, ?, ?, ?)',
+                (key, status, dumps(headers), compress(body.encode()))
+            )
+            self._connection.commit()
+            self.recorded += 1
+
+    def play(self, key: str) -> CachedResponse:
+        """Returns the recorded response.
+
+        Raises:
+            CassetteMiss: The request was not recorded.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT status, headers, body FROM interactions ' +
+                'WHERE key = ?', (key,)
+            ).fetchone()
+            if not row:
+                raise CassetteMiss(f'Request not recorded: {key}')
+            self.replayed += 1
+        return CachedResponse(
+            status=row[0], headers=loads(row[1]),
+            body=decompress(row[2]).decode()
+        )
+
+    def stats(self) -> str:
+        mode = 'replayed' if self.replay else 'recorded'
+        count = self.replayed if self.replay else self.recorded
+        return f'Cassette {self.file_name}: {count} responses {mode}'
@@ -0,0 +1,57 @@
+from re import compile, Pattern
+from typing import Any, Callable, Dict, List, Optional
+from yaml import safe_load
+
+
+LANGUAGES_FILE = 'configs/languages.yml'
+VENDOR_FILE = 'configs/vendor.yml'
+
+# built from the configs once per process, on first use
+_language_types: Optional[Dict[str, str]] = None
+_vendor_regex: Optional[Pattern] = None
+
+
+def _load(file_name: str, build: Callable[[Any], Any]) -> Any:
+    """Loads a YAML config and converts it by build."""
+    with open(file_name, 'r') as f:
+        return build(safe_load(f))
+
+
+def _build_language_types(languages: Dict[str, Dict]) -> Dict[str, str]:
+    language_types = {}
+    for language in languages.values():
+        for alias in language.get('aliases', []):
+            language_types[alias.lower()] = language['type']
+    # names take precedence over aliases of other languages
+    for name, language in languages.items():
+        language_types[name.lower()] = language['type']
+    return language_types
+
+
+def _build_vendor_regex(regexes: List[str]) -> Pattern:
+    return compile('|'.join(f'(?:{regex})' for regex in regexes))
+
+
+def load_configs() -> None:
+    global _language_types, _vendor_regex
+    _language_types = _load(
+        file_name=LANGUAGES_FILE, build=_build_language_types
+    )
+    _vendor_regex = _load(file_name=VENDOR_FILE, build=_build_vendor_regex)
+
+
+def language_type(name: str) -> Optional[str]:
+    if _language_types is None:
+        load_configs()
+    return _language_types.get(name.lower())
+
+
+def is_programming_language(name: str) -> bool:
+    return language_type(name=name) == 'programming'
+
+
+def is_vendored(path: str) -> bool:
+    """Returns whether a vendor pattern matches at the start of the path."""
+    if _vendor_regex is None:
+        load_configs()
+    return _vendor_regex.match(path) is not None
@@ -0,0 +1,79 @@
+from array import array
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from github.Repository import Repository
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class CommitStore:
+    """Columnar record of the commit history of a single repository.
+
+    Commits are kept in the order returned by the Github API, i.e. newest
+    first. Dates are commit dates stored as seconds since the epoch.
+    """
+
+    def __init__(self) -> None:
+        self.shas: List[str] = []
+        self.author_names: List[Optional[str]] = []
+        self.author_logins: List[Optional[str]] = []
+        self.dates: array = array('q')
+
+    @classmethod
+    def from_repo(cls, repo: Repository) -> 'CommitStore':
+        store = cls()
+        for commit in repo.get_commits():
+            git_commit = commit.commit
+            store.append(
+                sha=commit.sha,
+                author_name=git_commit.author.name,
+                author_login=commit.author.login if commit.author else None,
+                date=git_commit.committer.date
+            )
+        return store
+
+    def append(
+        self, sha: str, author_name: Optional[str],
+        author_login: Optional[str], date: datetime
+    ) -> None:
+        self.shas.append(sha)
+        self.author_names.append(author_name)
+        self.author_logins.append(author_login)
+        self.dates.append(self._to_timestamp(dtime=date))
+
+    def __len__(self) -> int:
+        return len(self.shas)
+
+    @staticmethod
+    def _to_timestamp(dtime: datetime) -> int:
+        if dtime.tzinfo:
+            dtime = dtime.replace(tzinfo=None) - dtime.utcoffset()
+        return int((dtime - _EPOCH).total_seconds())
+
+    @staticmethod
+    def _to_datetime(timestamp: int) -> datetime:
+        return _EPOCH + timedelta(seconds=timestamp)
+
+    def date(self, index: int) -> datetime:
+        return self._to_datetime(timestamp=self.dates[index])
+
+    def _window(
+        self, since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Iterator[int]:
+        low = self._to_timestamp(dtime=since) if since else None
+        high = self._to_timestamp(dtime=until) if until else None
+        for index, timestamp in enumerate(self.dates):
+            if low is not None and timestamp < low:
+                continue
+            if high is not None and timestamp > high:
+                continue
+            yield index
+
+    def count(
+        self, since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> int:
+        return sum(1 for _ in self._window(since=since, until=until))
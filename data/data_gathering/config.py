@@ -1,5 +1,12 @@
 
+from os import path
 from yaml import safe_load
 
-with open('configs/gathering.yml', 'r') as f:
+# the configs directory lies next to the package, wherever it is run from
+_CONFIG_FILE = path.join(
+    path.dirname(path.dirname(path.abspath(__file__))), 'configs',
+    'gathering.yml'
+)
+
+with open(_CONFIG_FILE, 'r') as f:
     config_values = safe_load(f)
@@ -0,0 +1,255 @@
+from contextlib import contextmanager
+from threading import local
+from time import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from github.Requester import (
+    HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass, Requester
+)
+
+from .cassette import Cassette, freeze_clock
+from .http_cache import CachedResponse, HttpCache
+from .metrics import Metrics, token_label
+
+
+class NotReady(Exception):
+    """Github is still preparing the response, see accepted_attempts."""
+
+
+# budget of 202 Accepted responses of the current thread
+_accepted = local()
+
+
+@contextmanager
+def accepted_attempts(attempts: int) -> Iterator[None]:
+    """Bounds the requests answered with 202 Accepted within the block.
+
+    PyGithub repeats such GET requests until the response is ready, with
+    no limit. Within the block, the request raises NotReady after attempts
+    202 responses instead.
+    """
+    _accepted.remaining = attempts
+    try:
+        yield
+    finally:
+        _accepted.remaining = None
+
+
+class _Response:
+    # mimics the httplib response object, like PyGithub's RequestsResponse
+
+    def __init__(self, status: int, headers: Dict[str, str], body: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def getheaders(self) -> Any:
+        return self.headers.items()
+
+    def read(self) -> str:
+        return self.body
+
+
+class _Connection:
+    """Connection used by the PyGithub requester for every request.
+
+    The underlying requests connection is kept per thread, so Github
+    instances shared by several worker threads do not mix their requests
+    up. GET requests are made conditional when their response is cached.
+    Every response is recorded in the metrics and its rate limit headers
+    are passed to the rate limit observer. With a cassette, responses
+    are recorded into it or, when replaying, served from it without any
+    request.
+    """
+
+    base_class: Any = HTTPSRequestsConnectionClass
+    cache: Optional[HttpCache] = None
+    metrics: Optional[Metrics] = None
+    cassette: Optional[Cassette] = None
+    rate_limits: Optional[
+        Callable[[Optional[str], Dict[str, str]], None]
+    ] = None
+
+    _connections = local()
+
+    def __init__(
+        self, host: str, port: Optional[int] = None, **kwargs: Any
+    ) -> None:
+        connections = self._connections.__dict__.setdefault(
+            'by_host', {}
+        )
+        connection_key = (self.base_class, host, port)
+        if connection_key not in connections:
+            connections[connection_key] = self.base_class(
+                host, port, **kwargs
+            )
+        self._connection = connections[connection_key]
+        self._cache_key: Optional[str] = None
+        self._unconditional: Optional[Tuple[Any, ...]] = None
+        self._cassette_key: Optional[str] = None
+        self._authorization: Optional[str] = None
+        self._token = token_label(authorization=None)
+        self._started = 0.0
+
+    def request(
+        self, verb: str, url: str, input: Any, headers: Dict[str, str]
+    ) -> None:
+        self._cache_key = None
+        self._authorization = headers.get('Authorization')
+        self._token = token_label(authorization=self._authorization)
+        self._started = time()
+        if self.cassette:
+            self._cassette_key = self.cassette.key(
+                verb=verb, url=f'{self._connection.host}{url}', input=input
+            )
+            if self.cassette.replay:
+                return
+        if self.cache and verb == 'GET' and input is None:
+            self._cache_key = self.cache.key(
+                url=f'{self._connection.host}{url}',
+                authorization=headers.get('Authorization')
+            )
+            self._unconditional = (verb, url, input, headers)
+            headers = {
+                **headers, **self.cache.validators(key=self._cache_key)
+            }
+        self._connection.request(verb, url, input, headers)
+
+    def getresponse(self) -> Any:
+        if self.cassette and self.cassette.replay:
+            response = self._replayed(
+                played=self.cassette.play(key=self._cassette_key)
+            )
+            self._record(response=response, cache_hit=False)
+        else:
+            response = self._from_server()
+            if self.cassette:
+                self.cassette.record(
+                    key=self._cassette_key, status=response.status,
+                    headers={k.lower(): v for k, v in response.getheaders()},
+                    body=response.read()
+                )
+        # read from the class, a function would be bound to the instance
+        observer = _Connection.rate_limits
+        if observer:
+            observer(
+                self._authorization,
+                {k.lower(): v for k, v in response.getheaders()}
+            )
+        if response.status == 202:
+            self._accept()
+        return response
+
+    @staticmethod
+    def _accept() -> None:
+        remaining = getattr(_accepted, 'remaining', None)
+        if remaining is None:
+            return
+        _accepted.remaining = remaining - 1
+        if _accepted.remaining <= 0:
+            raise NotReady()
+
+    def _from_server(self) -> Any:
+        response = self._connection.getresponse()
+        if self._cache_key and response.status == 304:
+            cached = self.cache.get(key=self._cache_key)
+            self._record(response=response, cache_hit=bool(cached))
+            if cached:
+                return self._from_cache(cached=cached, headers={
+                    k.lower(): v for k, v in response.getheaders()
+                })
+            # the response was evicted since its validators were sent, it
+            # is requested again without them
+            self._started = time()
+            self._connection.request(*self._unconditional)
+            response = self._connection.getresponse()
+        if self._cache_key and response.status == 200:
+            self.cache.put(
+                key=self._cache_key, status=response.status,
+                headers={k.lower(): v for k, v in response.getheaders()},
+                body=response.read()
+            )
+        self._record(response=response, cache_hit=False)
+        return response
+
+    def _record(self, response: Any, cache_hit: bool) -> None:
+        if self.metrics:
+            self.metrics.record_request(
+                token=self._token, size=len(response.read() or ''),
+                seconds=time() - self._started, cache_hit=cache_hit
+            )
+
+    @staticmethod
+    def _replayed(played: CachedResponse) -> _Response:
+        # recorded rate limits would make the token pool wait
+        return _Response(
+            status=played.status, headers={
+                k: v for k, v in played.headers.items()
+                if not k.startswith('x-ratelimit-')
+            }, body=played.body
+        )
+
+    @staticmethod
+    def _from_cache(
+        cached: CachedResponse, headers: Dict[str, str]
+    ) -> _Response:
+        # fresh headers carry the current X-RateLimit-* values
+        return _Response(
+            status=cached.status, headers={**cached.headers, **headers},
+            body=cached.body
+        )
+
+    def close(self) -> None:
+        pass
+
+
+def _connection_class(
+    base_class: Any, cache: Optional[HttpCache], metrics: Optional[Metrics]
+) -> Any:
+    return type(
+        '_' + base_class.__name__, (_Connection,),
+        {'base_class': base_class, 'cache': cache, 'metrics': metrics}
+    )
+
+
+def used_cassette() -> Optional[Cassette]:
+    return _Connection.cassette
+
+
+def use_cassette(cassette: Optional[Cassette]) -> None:
+    """Records into or replays from the cassette all following requests.
+
+    Replaying freezes the clock at the time of the recording.
+    """
+    _Connection.cassette = cassette
+    freeze_clock(
+        at=cassette.recorded_at if cassette and cassette.replay else None
+    )
+
+
+def observe_rate_limits(
+    observer: Optional[Callable[[Optional[str], Dict[str, str]], None]]
+) -> None:
+    """Passes the Authorization and the headers of every response on.
+
+    Used by the token pool, whose budgets the headers update.
+    """
+    _Connection.rate_limits = observer
+
+
+def install(
+    cache: Optional[HttpCache] = None, metrics: Optional[Metrics] = None
+) -> Tuple[Any, Any]:
+    """Makes Github instances created afterwards use _Connection."""
+    classes = (
+        _connection_class(
+            base_class=HTTPRequestsConnectionClass, cache=cache,
+            metrics=metrics
+        ),
+        _connection_class(
+            base_class=HTTPSRequestsConnectionClass, cache=cache,
+            metrics=metrics
+        )
+    )
+    Requester.injectConnectionClasses(*classes)
+    return classes
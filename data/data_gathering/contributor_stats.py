@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from json import loads
+from typing import Optional
+
+from github.Repository import Repository
+
+from .author_timeline import AuthorTimeline
+from .connection import accepted_attempts, NotReady
+
+
+_EPOCH = datetime(1970, 1, 1)
+# Github lists at most this many contributors in the statistics
+_MAX_AUTHORS = 100
+
+
+def fetch_contributor_stats(
+    repo: Repository, attempts: int = 4
+) -> Optional[AuthorTimeline]:
+    """Returns the timeline of the contributors statistics of the repository.
+
+    The statistics hold weekly commit counts per author, so a single request
+    replaces the whole commit history. Authors are identified by their
+    logins and commits are known to a week. Github answers 202 until the
+    statistics are computed, PyGithub repeats the request every few
+    seconds, at most attempts times here.
+
+    The author features computed from it differ from those of the history,
+    which tell authors by the name of the commit: an author committing
+    under several names counts once, and commits near a threshold may fall
+    on either side of it.
+
+    Returns:
+        None if the statistics are not available in time, or may be
+        incomplete: commits of authors without a Github account are missing
+        and only the top authors are listed.
+    """
+    try:
+        with accepted_attempts(attempts=attempts):
+            status, _, body = repo._requester.requestJson(
+                'GET', f'{repo.url}/stats/contributors'
+            )
+    except NotReady:
+        return None
+
+    authors = loads(body) if status == 200 and body else None
+    if not authors or len(authors) >= _MAX_AUTHORS:
+        return None
+    if any(not author.get('author') for author in authors):
+        return None
+    return AuthorTimeline.from_weeks(weeks={
+        author['author']['login']: [
+            (_EPOCH + timedelta(seconds=week['w']), week['c'])
+            for week in author['weeks'] if week['c']
+        ]
+        for author in authors
+    })
@@ -1,110 +1,136 @@
 
-from csv import writer
-from datetime import date, datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from csv import DictReader
+from datetime import datetime, timedelta
+from functools import partial
+from json import dumps, loads
 from logging import getLogger, Logger
-from marshal import dump, load
-from pathlib import Path
-from random import randrange, sample
+from math import ceil
+from os import path
+from threading import local
 from requests.exceptions import ConnectionError, ReadTimeout
 from time import sleep
-from typing import Any, List, Optional, Set, Tuple
+from typing import (
+    Any, Callable, Container, Dict, Iterable, Iterator, List, Optional, Tuple
+)
 from yaml import safe_load
 
 from github import Github
+from github.Repository import Repository
 from github.GithubException import (
     GithubException, RateLimitExceededException, UnknownObjectException
 )
 
-from data_gathering import logger_config_values
+from data_gathering import (
+    HTTP_CACHE, logger_config_values, METRICS, TOKEN_POOL
+)
+from .cassette import CassetteMiss
+from .connection import used_cassette
 from .enums import EndCondition
-from .logger import logger_file_name, setup_logger
-from .repository_data import RepositoryData
+from .dataset_writer import DatasetWriter, read_parquet
+from .feature_store import FeatureStore
+from .graphql_data import GraphQLRepositoryData
+from .profile_cache import ProfileCache
+from .logger import logger_file_name, metrics_file_name, setup_logger
+from .repository_data import (
+    COULD_NOT_COMPUTE, RepositoryData, SUITABLE_RULE, UNMAINTAINED_RULE
+)
 from .s3_handler import S3Handler
-from .waiting import get_git_instance, NoAPICalls
+from .search_planner import SearchPlanner
+from .segmented_files import SegmentedFiles
+from .token_pool import NoAPICalls, rate_limited_resource
+from .visited_store import delta_sequence, VisitedStore
+from .work_queue import Lease, LocalObjects, WorkQueue
+
+
+# Github search returns at most 1000 results of a query
+_SEARCH_RESULTS_LIMIT = 1000
 
 
 class Dataset:
 
     def __init__(self) -> None:
-        self._git: Github = get_git_instance()
+        self._pool = TOKEN_POOL
+        # searching is limited apart from the other requests
+        self._git: Github = self._pool.lease(resource='search')
 
     @staticmethod
     def load_features(features_file: str) -> List[str]:
         with open(file=features_file, mode='r') as f:
             return safe_load(f)
 
-    @staticmethod
-    def prepare_csv(features: List[str], file_name: str) -> None:
-        with open(file=file_name, mode='w') as f:
-            csv_writer = writer(f, delimiter=',')
-            csv_writer.writerow(features)
-
-    @staticmethod
-    def write_to_csv(data: List[Any], file_name: str) -> None:
-        with open(file=file_name, mode='a') as f:
-            csv_writer = writer(f, delimiter=',')
-            data = [str(col) for col in data]
-            csv_writer.writerow(data)
-
-    @staticmethod
-    def save_visited_ids(dat_file: str, ids_set: Set[int]) -> None:
-        with open(file=dat_file, mode='wb') as f:
-            dump(ids_set, f)
-
     @staticmethod
     def load_visited_ids(
-            dat_file: str, logger: Optional[Logger] = None
-    ) -> Optional[Set[int]]:
+            dat_file: str, logger: Optional[Logger] = None,
+            hashed: bool = False
+    ) -> VisitedStore:
         if not logger:
             logger = getLogger('dummy')
 
-        try:
-            with open(file=dat_file, mode='rb') as f:
-                try:
-                    logger.debug(msg=f'IDs from file loaded: {dat_file}')
-                    return load(f)
-                except EOFError:
-                    logger.debug(
-                        msg=f'No IDs loaded: {dat_file}, created new set')
-                    return set()
-        except FileNotFoundError:
-            logger.debug(msg=f'No IDs loaded: {dat_file}, created new set')
-            return set()
+        return VisitedStore(file_name=dat_file, hashed=hashed, logger=logger)
 
-    @staticmethod
-    def random_date(from_date: date, to_date: date) -> date:
-        delta = to_date - from_date
-        offset_day = randrange(delta.days)
-        return from_date + timedelta(days=offset_day)
-
-    def get_random_repos_ids(
-            self, query: str, n: Optional[int] = None
-    ) -> List[int]:
-        repos = list(self._git.search_repositories(query=query))
-
-        if n:
-            return [repo.id for repo in sample(repos, n)]
-        else:
-            return [repo.id for repo in repos]
+    def search_page(
+            self, query: str, page: int
+    ) -> Tuple[List[Repository], int]:
+        """Returns a page of repositories found by the query.
 
+        Returns:
+            Repositories of the page and the total count of the results.
+        """
+        results = self._git.search_repositories(query=query)
+        repos = results.get_page(page)
+        return repos, results.totalCount if repos else 0
+
+    @staticmethod
     def save_all(
-        self, file_set_tuples: List[Tuple[str, set]], logger: Logger
-    ) -> None:
-        for tup in file_set_tuples:
-            self.save_visited_ids(dat_file=tup[0], ids_set=tup[1])
+        stores: List[VisitedStore], logger: Logger, compact: bool = False
+    ) -> List[Tuple[str, str]]:
+        """Saves IDs added since the last save.
+
+        Returns:
+            Pairs of the IDs file name and the name of its new delta file,
+            or of the snapshot when compacted.
+        """
+        saved_files = []
+        for store in stores:
+            saved_file = store.compact() if compact else store.checkpoint()
+            if saved_file:
+                saved_files.append((store.file_name, saved_file))
         logger.info(msg='IDs saved to files')
+        return saved_files
 
     @staticmethod
     def upload_all(
         file_name_prefix: str, file_names: List[str], region_name: str,
-        logger: Logger
+        logger: Logger, delta_files: Optional[List[Tuple[str, str]]] = None,
+        segments: Optional[SegmentedFiles] = None,
+        rewritten_files: Optional[List[str]] = None
     ) -> None:
+        """Uploads files replacing their older versions in the bucket.
+
+        Delta files, given with the name of the file they belong to, are
+        uploaded alongside the older ones, which are still needed to
+        reassemble the visited IDs. Of the segmented files, only
+        the bytes appended since the last upload are uploaded, unless they
+        are among the rewritten files.
+        """
         s3_handler = S3Handler(region_name=region_name)
         if not s3_handler.bucket_exits_check():
             s3_handler.create_bucket()
             logger.info(msg='Created S3 bucket')
 
+        for file_name, delta_name in delta_files or []:
+            s3_handler.upload_delta(
+                file_name=file_name, delta_name=delta_name,
+                prefix=file_name_prefix, logger=logger
+            )
         for file_name in file_names:
+            if segments and file_name in segments.file_names:
+                segments.upload(
+                    file_name=file_name, logger=logger,
+                    rewrite=file_name in (rewritten_files or [])
+                )
+                continue
             s3_handler.upload_file(
                 file_name=file_name, prefix=file_name_prefix, logger=logger
             )
@@ -113,24 +139,58 @@ class Dataset:
             )
         logger.info(msg='IDs files uploaded to the S3 bucket')
 
+    @staticmethod
+    def delete_merged_deltas(
+        stores: List[VisitedStore], region_name: str, logger: Logger,
+        file_name_prefix: str = ''
+    ) -> None:
+        s3_handler = S3Handler(region_name=region_name)
+        for store in stores:
+            merged = [
+                delta['name'] for delta in s3_handler.deltas(
+                    file_name=store.file_name, prefix=file_name_prefix
+                )
+                if delta_sequence(
+                    file_name=store.file_name, delta_name=delta['name']
+                ) <= store.sequence
+            ]
+            if merged:
+                s3_handler.delete_deltas(
+                    file_name=store.file_name, delta_names=merged,
+                    prefix=file_name_prefix, logger=logger
+                )
+        logger.info(msg='Merged IDs deltas deleted from the S3 bucket')
+
     def save_and_upload_all(
-            self, file_set_tuples: List[Tuple[str, set]],
+            self, stores: List[VisitedStore],
             other_files: Optional[List[str]], logger: Logger,
-            region_name: str, file_name_prefix: str
+            region_name: str, file_name_prefix: str, compact: bool = False,
+            segments: Optional[SegmentedFiles] = None
     ) -> None:
-        file_names = [file_name[0] for file_name in file_set_tuples]
-        if other_files:
-            file_names += other_files
+        """Saves and uploads IDs added since the last save.
 
-        self.save_all(file_set_tuples=file_set_tuples, logger=logger)
+        When compacted, the snapshots are uploaded instead and the deltas
+        merged into them are deleted from the bucket.
+        """
+        saved_files = self.save_all(
+            stores=stores, logger=logger, compact=compact
+        )
+        snapshots = [saved_file for _, saved_file in saved_files]
         self.upload_all(
-            file_name_prefix=file_name_prefix, file_names=file_names,
-            region_name=region_name, logger=logger
+            file_name_prefix=file_name_prefix,
+            file_names=(snapshots if compact else []) + (other_files or []),
+            delta_files=[] if compact else saved_files,
+            region_name=region_name, logger=logger, segments=segments
         )
+        if compact:
+            self.delete_merged_deltas(
+                stores=stores, region_name=region_name,
+                file_name_prefix=file_name_prefix, logger=logger
+            )
 
     @staticmethod
     def already_visited(
-            repo_id: int, id_sets: Optional[List[Set[int]]] = None
+            repo_id: int, id_sets: Optional[List[VisitedStore]] = None
     ) -> bool:
         try:
             for id_set in id_sets:
@@ -144,11 +204,21 @@ class Dataset:
     @staticmethod
     def download_all(
         region_name: str, file_names: List[str], logger: Logger,
-        file_name_prefix: str = ''
+        file_name_prefix: str = '', segments: Optional[SegmentedFiles] = None
     ) -> None:
+        """Downloads the latest versions of files from the bucket.
+
+        Segmented files are reassembled from their segments, files uploaded
+        whole before are downloaded as such.
+        """
         s3_handler = S3Handler(region_name=region_name)
         if s3_handler.bucket_exits_check():
             for file_name in file_names:
+                if (
+                    segments and file_name in segments.file_names and
+                    segments.download(file_name=file_name, logger=logger)
+                ):
+                    continue
                 s3_handler.download_file(
                     file_name=file_name, prefix=file_name_prefix, logger=logger
                 )
@@ -156,26 +226,84 @@ class Dataset:
         else:
             logger.info(msg='S3 bucket does not exist')
 
+    @staticmethod
+    def download_visited(
+        region_name: str, file_names: List[str], logger: Logger,
+        file_name_prefix: str = ''
+    ) -> None:
+        """Downloads snapshots of visited IDs and deltas missing locally."""
+        s3_handler = S3Handler(region_name=region_name)
+        if not s3_handler.bucket_exits_check():
+            logger.info(msg='S3 bucket does not exist')
+            return
+
+        for file_name in file_names:
+            s3_handler.download_file(
+                file_name=file_name, prefix=file_name_prefix, logger=logger
+            )
+            for delta in s3_handler.deltas(
+                file_name=file_name, prefix=file_name_prefix
+            ):
+                if not path.isfile(delta['name']):
+                    s3_handler.download_file(
+                        file_name=delta['name'], object_name=delta['key'],
+                        logger=logger
+                    )
+        logger.info(msg='IDs files downloaded from S3 bucket')
+
+    def download_http_cache(
+        self, region_name: str, file_name_prefix: str, logger: Logger
+    ) -> List[str]:
+        """Downloads the HTTP cache, returns its files to upload at the end.
+
+        The cache is opened on import, so it is reopened once downloaded.
+        It is uploaded only at the end of a run, unlike the smaller files
+        uploaded at every checkpoint.
+        """
+        if not HTTP_CACHE or HTTP_CACHE.file_name == ':memory:':
+            return []
+        self.download_all(
+            file_names=[HTTP_CACHE.file_name], region_name=region_name,
+            file_name_prefix=file_name_prefix, logger=logger
+        )
+        HTTP_CACHE.reopen()
+        return [HTTP_CACHE.file_name]
+
     def search_repos(
             self, logger_name: str, from_year: str, to_year: str,
             unmaintained_ids_file: str, maintained_ids_file: str,
             not_suitable_ids_file: str,
             end_condition: EndCondition, value: int,
             region_name: str, file_name_prefix: str, query: str,
-            partial_upload_size: int = 10
+            partial_upload_size: int = 10, segmented_upload: bool = False,
+            max_segments: int = 100,
+            slices_file_name: str = 'search_slices.json'
     ) -> None:
+        """Searches repositories created in the date range into IDs files.
+
+        The range is searched slice by slice, see SearchPlanner, the state
+        of the slices is kept in the slices file.
+        """
         logger = setup_logger(
             name=__name__, file=logger_name,
             format=logger_config_values['format'],
             level=logger_config_values['level']
         )
-        self.download_all(
+        self.download_visited(
             file_names=[
                 unmaintained_ids_file, maintained_ids_file,
                 not_suitable_ids_file
             ], region_name=region_name, file_name_prefix=file_name_prefix,
             logger=logger
         )
+        self.download_all(
+            file_names=[slices_file_name], region_name=region_name,
+            file_name_prefix=file_name_prefix, logger=logger
+        )
+        http_cache_files = self.download_http_cache(
+            region_name=region_name, file_name_prefix=file_name_prefix,
+            logger=logger
+        )
         unmaintained_ids = self.load_visited_ids(
             dat_file=unmaintained_ids_file, logger=logger
         )
@@ -187,18 +315,19 @@ class Dataset:
         )
 
         main_names = self.load_visited_ids(
-            dat_file='main_names.dat', logger=logger
+            dat_file='main_names.dat', logger=logger, hashed=True
         )
 
-        file_set_tuples = [
-            (unmaintained_ids_file, unmaintained_ids),
-            (maintained_ids_file, maintained_ids),
-            (not_suitable_ids_file, not_suitable_ids),
-            ('main_names.dat', main_names)
+        stores = [
+            unmaintained_ids, maintained_ids, not_suitable_ids, main_names
         ]
 
-        from_year_date = datetime.strptime(from_year, '%Y').date()
-        to_year_date = datetime.strptime(to_year, '%Y').date()
+        planner = SearchPlanner(
+            file_name=slices_file_name,
+            from_date=datetime.strptime(from_year, '%Y').date(),
+            to_date=datetime.strptime(to_year, '%Y').date(), logger=logger
+        )
+        logger.info(msg=f'Date slices remaining: {planner.remaining()}')
 
         maintained_count = len(maintained_ids)
         unmaintained_count = len(unmaintained_ids)
@@ -206,29 +335,64 @@ class Dataset:
         repo_analyzed_counter = 0
         repo_data = RepositoryData(git=self._git)
         logger_file = logger_file_name(logger=logger)
+        metrics_file = metrics_file_name(logger=logger)
+        segments = None
+        if segmented_upload:
+            segments = SegmentedFiles(
+                file_names=[logger_file], region_name=region_name,
+                prefix=file_name_prefix, max_segments=max_segments
+            )
         logger.info(msg='Start of the search')
         try:
             while len(eval(EndCondition[end_condition].value)) < value:
                 try:
-                    random_date = self.random_date(
-                        from_date=from_year_date,
-                        to_date=to_year_date
-                    )
-                    logger.debug(msg=f'random date: {random_date}')
-                    repos_ids = self.get_random_repos_ids(
-                        query=query.format(date=random_date), n=100
+                    repo_id = None
+                    date_slice = planner.next_slice()
+                    if not date_slice:
+                        logger.info(msg='All date slices exhausted')
+                        break
+                    logger.debug(
+                        msg=f'date slice: {date_slice.query()}, ' +
+                            f'page: {date_slice.page}'
                     )
+                    with METRICS.scope(feature='search'):
+                        repos, total_count = self.search_page(
+                            query=query.format(date=date_slice.query()),
+                            page=date_slice.page
+                        )
+                    # results beyond the limit are unreachable
+                    if (
+                        total_count > _SEARCH_RESULTS_LIMIT and
+                        planner.split(date_slice=date_slice)
+                    ):
+                        continue
 
-                    for repo_id in repos_ids:
-
-                        repo = self._git.get_repo(full_name_or_id=repo_id)
+                    # repositories from the search results are complete
+                    # enough, they are not fetched again
+                    for repo in repos:
+                        repo_id = repo.id
+                        if self.already_visited(
+                            repo_id=repo_id, id_sets=[
+                                unmaintained_ids, maintained_ids,
+                                not_suitable_ids
+                            ]
+                        ):
+                            continue
                         repo_data.set_repo(repo=repo)
 
                         if (repo_name := repo.name) in main_names:
                             continue
 
-                        if repo_data.suitable():
-                            if repo_data.unmaintained():
+                        with METRICS.scope(repo=repo_id):
+                            with METRICS.scope(feature='suitable'):
+                                suitable = repo_data.suitable()
+                            with METRICS.scope(feature='unmaintained'):
+                                unmaintained = (
+                                    suitable and repo_data.unmaintained()
+                                )
+                        METRICS.record_repo()
+                        if suitable:
+                            if unmaintained:
                                 unmaintained_ids.add(repo_id)
                                 unmaintained_count += 1
                                 logger.info(
@@ -254,28 +418,45 @@ class Dataset:
                         if repo_analyzed_counter == partial_upload_size:
                             repo_analyzed_counter = 0
                             logger.info(msg='Partial save and upload')
+                            METRICS.dump(file_name=metrics_file)
                             self.save_and_upload_all(
-                                file_set_tuples=file_set_tuples,
-                                other_files=[logger_file], logger=logger,
-                                region_name=region_name,
-                                file_name_prefix=file_name_prefix
+                                stores=stores,
+                                other_files=[
+                                    slices_file_name, logger_file,
+                                    metrics_file
+                                ], logger=logger, region_name=region_name,
+                                file_name_prefix=file_name_prefix,
+                                segments=segments
                             )
+                    planner.advance(
+                        date_slice=date_slice, pages_count=ceil(
+                            min(total_count, _SEARCH_RESULTS_LIMIT) /
+                            self._git.per_page
+                        )
+                    )
 
-                except RateLimitExceededException:
+                except RateLimitExceededException as error:
                     logger.info(msg='Github API rate limit reached')
-                    self._git = get_git_instance(
-                        number_of_attempts=10, logger=logger
+                    METRICS.record_retry()
+                    self._git = self._pool.renew(
+                        git=self._git, logger=logger,
+                        resource=rate_limited_resource(error=error)
                     )
                     repo_data = RepositoryData(git=self._git)
                     continue
                 except UnknownObjectException:
-                    not_suitable_ids.add(repo_id)
-                    logger.info(
-                        msg=f'Added not suitable repo ID: {repo_id}'
-                    )
+                    if repo_id is not None:
+                        not_suitable_ids.add(repo_id)
+                        logger.info(
+                            msg=f'Added not suitable repo ID: {repo_id}'
+                        )
                     continue
                 except GithubException:
                     logger.info(msg='Encoutered an incomplete repository')
+                    # the page is searched again, the repository would be
+                    # encountered over and over
+                    if repo_id is not None:
+                        not_suitable_ids.add(repo_id)
                     continue
                 except ReadTimeout:
                     logger.info(msg='Newtwork issue')
@@ -286,71 +467,332 @@ class Dataset:
                     return
 
         finally:
+            logger.info(msg=SUITABLE_RULE.stats())
+            logger.info(msg=UNMAINTAINED_RULE.stats())
+            logger.info(msg=METRICS.stats())
+            METRICS.dump(file_name=metrics_file)
             self.save_and_upload_all(
-                file_set_tuples=file_set_tuples,
-                other_files=[logger_file], logger=logger,
-                region_name=region_name,
-                file_name_prefix=file_name_prefix
+                stores=stores,
+                other_files=[
+                    slices_file_name, logger_file, metrics_file
+                ] + http_cache_files,
+                logger=logger, region_name=region_name,
+                file_name_prefix=file_name_prefix, compact=True,
+                segments=segments
             )
+            if HTTP_CACHE:
+                logger.info(msg=HTTP_CACHE.stats())
+            if used_cassette():
+                logger.info(msg=used_cassette().stats())
             logger.info(msg='End of the search')
 
+    @staticmethod
+    def _compute_stored_row(
+            repo_id: int, features: List[str], repo_data: RepositoryData,
+            feature_store: FeatureStore, refresh: bool, logger: Logger
+    ) -> List[Any]:
+        pushed_at, updated_at = repo_data.pushed_at(), repo_data.updated_at()
+        stale = {feature: 'missing' for feature in features}
+        if refresh:
+            stale = feature_store.stale_features(
+                repo_id=repo_id, features=features, pushed_at=pushed_at,
+                updated_at=updated_at
+            )
+        logger.debug(msg=f'Features to compute: {stale}')
+
+        stored = feature_store.values(repo_id=repo_id, features=features)
+        snapshot = feature_store.snapshot(repo_id=repo_id)
+        commits_count_delta = (
+            stale.get('commits_count') == 'pushed_at' and
+            'commits_count' in stored and
+            snapshot and snapshot.last_commit_at
+        )
+        row_features = [
+            feature for feature in features
+            if feature in stale and not (
+                feature == 'commits_count' and commits_count_delta
+            )
+        ]
+        values = dict(zip(
+            row_features,
+            repo_data.get_row(features=row_features, logger=logger)
+        ))
+        if commits_count_delta:
+            values['commits_count'] = repo_data.commits_count_delta(
+                previous_count=stored['commits_count'],
+                previous_until=datetime.fromisoformat(snapshot.last_commit_at)
+            )
+
+        feature_store.save(
+            repo_id=repo_id, pushed_at=pushed_at, updated_at=updated_at,
+            last_commit_at=repo_data.known_last_commit_datetime(),
+            values={
+                feature: value for feature, value in values.items()
+                if value != COULD_NOT_COMPUTE
+            }
+        )
+        values = {**stored, **values}
+        return [values.get(feature) for feature in features]
+
+    @staticmethod
+    def _store_covers(
+            feature_store: FeatureStore, features: List[str],
+            csv_file_name: Optional[str], parquet_file_name: Optional[str]
+    ) -> bool:
+        """Checks that the store holds every repository already published.
+
+        Published rows are read from the CSV, or from the Parquet file
+        without the CSV. Repositories are matched by their url if it is
+        among the features, otherwise only their numbers are compared.
+        """
+        published: List[Dict[str, Any]] = []
+        if csv_file_name and path.isfile(csv_file_name):
+            with open(file=csv_file_name, mode='r', newline='') as f:
+                published = list(DictReader(f))
+        elif parquet_file_name and path.isfile(parquet_file_name):
+            published = read_parquet(file_name=parquet_file_name).to_pylist()
+
+        stored = list(feature_store.rows(features=features))
+        if 'url' not in features:
+            return len(stored) >= len(published)
+        index = features.index('url')
+        stored_urls = {row[index] for row in stored}
+        return all(row.get('url') in stored_urls for row in published)
+
+    def _compute_repo_row(
+            self, repo_id: int, features: List[str],
+            processed_names: Container[str], repo_data: RepositoryData,
+            logger: Logger, feature_store: Optional[FeatureStore],
+            refresh: bool
+    ) -> Optional[List[Any]]:
+        logger.info(msg=f'Computing repo: {repo_id}')
+        with METRICS.scope(feature='repo'):
+            repo_data.set_repo(repo_name_or_id=repo_id)
+
+        if repo_data.repo_name() in processed_names:
+            logger.info(msg='Duplicate repo')
+            return None
+
+        if not feature_store:
+            row = repo_data.get_row(features=features, logger=logger)
+        else:
+            row = self._compute_stored_row(
+                repo_id=repo_id, features=features, repo_data=repo_data,
+                feature_store=feature_store, refresh=refresh, logger=logger
+            )
+        METRICS.record_repo()
+        return row
+
+    def _compute_row(
+            self, repo_id: int, features: List[str],
+            processed_names: Container[str], workers_data: local,
+            create_repo_data: Callable[[], RepositoryData], logger: Logger,
+            feature_store: Optional[FeatureStore] = None, refresh: bool = False
+    ) -> Optional[List[Any]]:
+        """Computes the row of a single repository in a worker thread.
+
+        Every worker uses its own RepositoryData. Returns None if the
+        repository was skipped, so its ID remains in the IDs file. Computed
+        values are saved to the feature store, when refreshing, only stale
+        features are computed.
+        """
+        if not hasattr(workers_data, 'repo_data'):
+            workers_data.repo_data = create_repo_data()
+        repo_data = workers_data.repo_data
+
+        try:
+            with METRICS.scope(repo=repo_id):
+                return self._compute_repo_row(
+                    repo_id=repo_id, features=features,
+                    processed_names=processed_names, repo_data=repo_data,
+                    logger=logger, feature_store=feature_store,
+                    refresh=refresh
+                )
+        except RateLimitExceededException as error:
+            logger.info(msg='Github API rate limit reached')
+            METRICS.record_retry()
+            repo_data.renew_git(
+                logger=logger, resource=rate_limited_resource(error=error)
+            )
+        except UnknownObjectException:
+            logger.info(msg='Encountered a removed repository')
+        except GithubException:
+            logger.info(msg='Encoutered an incomplete repository')
+        except (ReadTimeout, ConnectionError):
+            logger.info(msg='Newtwork issue')
+            sleep(10)
+        except CassetteMiss as error:
+            logger.info(msg=str(error))
+        return None
+
+    @staticmethod
+    def _compute_rows(
+            executor: ThreadPoolExecutor, workers: int,
+            repo_ids: Iterable[int],
+            compute: Callable[..., Optional[List[Any]]]
+    ) -> Iterator[Tuple[int, Optional[List[Any]]]]:
+        """Yields rows of the repositories as the worker threads compute them.
+
+        Only a few repositories are queued ahead, so that an interrupted
+        run does not leave much work behind, the queued ones are cancelled
+        when the iteration stops.
+        """
+        ids_iterator = iter(repo_ids)
+        pending = {}
+        try:
+            while True:
+                while len(pending) < 2 * workers:
+                    repo_id = next(ids_iterator, None)
+                    if repo_id is None:
+                        break
+                    pending[executor.submit(compute, repo_id=repo_id)] = (
+                        repo_id
+                    )
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    repo_id = pending.pop(future)
+                    yield repo_id, future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
     def compute_features(
             self, logger_name: str, features_file: str, ids_file_name: str,
             csv_file_name: str, region_name: str, file_name_prefix: str,
-            partial_upload_size: int = 10
+            partial_upload_size: int = 10, graphql: bool = False,
+            profile_cache_file: str = ':memory:',
+            profile_cache_size: int = 100000, profile_cache_ttl: int = 30,
+            workers: int = 1, feature_store_file: Optional[str] = None,
+            feature_store_max_age: int = 90, refresh: bool = False,
+            parquet_file_name: Optional[str] = None, csv_export: bool = True,
+            segmented_upload: bool = False, max_segments: int = 100,
+            contributor_stats: bool = False
     ) -> None:
+        """Computes features of repositories from the IDs file.
+
+        Rows are written into the CSV (unless csv_export is disabled) and
+        into the Parquet file, if given. With a feature store, computed
+        values are also saved to the store. When refreshing, all
+        repositories in the store are processed instead of the IDs file,
+        only their stale features are recomputed and the outputs are
+        regenerated from the store, unless published repositories are
+        missing in it. With segmented upload, checkpoints upload only the
+        rows and log lines written since the previous one.
+        With contributor_stats, the author features are computed from the
+        contributors statistics instead of the history, where available,
+        which tells authors by login and dates commits to a week.
+        The profile cache file, unless in memory, is downloaded and
+        uploaded along with the feature store.
+        """
+        repo_data_class = GraphQLRepositoryData if graphql else RepositoryData
+        if refresh and not feature_store_file:
+            raise ValueError('Refresh requires a feature store')
+        store_files = [feature_store_file] if feature_store_file else []
+        # the profile cache is kept in the bucket along with the store
+        if profile_cache_file != ':memory:':
+            store_files.append(profile_cache_file)
+        csv_files = [csv_file_name] if csv_export else []
+        parquet_files = [parquet_file_name] if parquet_file_name else []
+        dataset_writer = None
+        segments = None
         try:
             logger = setup_logger(
                 name=__name__, file=logger_name,
                 format=logger_config_values['format'],
                 level=logger_config_values['level']
             )
+            logger_file = logger_file_name(logger=logger)
+            metrics_file = metrics_file_name(logger=logger)
+            if segmented_upload:
+                segments = SegmentedFiles(
+                    file_names=csv_files + [logger_file],
+                    region_name=region_name, prefix=file_name_prefix,
+                    max_segments=max_segments
+                )
             self.download_all(
-                file_names=[ids_file_name, csv_file_name],
+                file_names=csv_files + parquet_files + store_files,
+                region_name=region_name, file_name_prefix=file_name_prefix,
+                logger=logger, segments=segments
+            )
+            profile_cache = ProfileCache(
+                file_name=profile_cache_file, max_size=profile_cache_size,
+                ttl=timedelta(days=profile_cache_ttl)
+            )
+            http_cache_files = self.download_http_cache(
                 region_name=region_name, file_name_prefix=file_name_prefix,
                 logger=logger
             )
+            if not refresh:
+                self.download_visited(
+                    file_names=[ids_file_name], region_name=region_name,
+                    file_name_prefix=file_name_prefix, logger=logger
+                )
+            feature_store = None
+            if feature_store_file:
+                feature_store = FeatureStore(
+                    file_name=feature_store_file,
+                    max_age=timedelta(days=feature_store_max_age)
+                )
 
-            processed_names = self.load_visited_ids(
-                dat_file='main_names.dat', logger=logger
-            )
+            if refresh:
+                processed_names = set()
+            else:
+                processed_names = self.load_visited_ids(
+                    dat_file='main_names.dat', logger=logger, hashed=True
+                )
 
-            repo_data = RepositoryData(git=self._git)
             features = self.load_features(features_file=features_file)
             repo_computed_counter = 0
             computed_ids = set()
 
-            if not Path(csv_file_name).is_file():
-                self.prepare_csv(features=features, file_name=csv_file_name)
+            if not refresh:
+                dataset_writer = DatasetWriter(
+                    features=features,
+                    csv_file_name=csv_file_name if csv_export else None,
+                    parquet_file_name=parquet_file_name
+                )
 
-            repo_ids = self.load_visited_ids(
-                dat_file=ids_file_name, logger=logger
-            )
+            if refresh:
+                repo_ids = feature_store.repo_ids()
+            else:
+                repo_ids = self.load_visited_ids(
+                    dat_file=ids_file_name, logger=logger
+                )
             logger.debug(msg=f'IDs set size: {len(repo_ids)}')
 
             ids_all = len(repo_ids)
             ids_count = 0
 
-            logger_file = logger_file_name(logger=logger)
-            logger.info(msg='Start of computation')
-            for repo_id in repo_ids:
-                try:
-                    logger.info(msg=f'Computing repo: {repo_id}')
-                    repo_data.set_repo(repo_name_or_id=repo_id)
+            logger.info(msg=f'Start of computation, workers: {workers}')
 
-                    if repo_data.repo_name() in processed_names:
-                        logger.info(msg='Duplicate repo')
+            workers_data = local()
+            compute = partial(
+                self._compute_row, features=features,
+                processed_names=processed_names, workers_data=workers_data,
+                create_repo_data=lambda: repo_data_class(
+                    profile_cache=profile_cache,
+                    contributor_stats=contributor_stats
+                ),
+                logger=logger, feature_store=feature_store, refresh=refresh
+            )
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for repo_id, row in self._compute_rows(
+                    executor=executor, workers=workers, repo_ids=repo_ids,
+                    compute=compute
+                ):
+                    if row is None:
                         continue
 
-                    self.write_to_csv(
-                        data=repo_data.get_row(
-                            features=features, logger=logger
-                        ),
-                        file_name=csv_file_name
-                    )
+                    # rows are written only by this thread, refreshed
+                    # outputs are regenerated from the store at the end
+                    if dataset_writer:
+                        dataset_writer.write_row(row=row)
                     ids_count += 1
                     logger.info(
-                        msg=f'Computed repo: {repo_id} to: {csv_file_name}, ' +
+                        msg=f'Computed repo: {repo_id}, ' +
                             f'rank: {ids_count} / {ids_all}'
                     )
                     repo_computed_counter += 1
@@ -359,39 +801,347 @@ class Dataset:
                     if repo_computed_counter == partial_upload_size:
                         repo_computed_counter = 0
                         logger.info(msg='Partial upload')
+                        if dataset_writer:
+                            dataset_writer.flush()
+                        METRICS.dump(file_name=metrics_file)
+                        # the Parquet file is complete only after close
                         self.upload_all(
-                            file_names=[csv_file_name, logger_file],
+                            file_names=csv_files + [
+                                logger_file, metrics_file
+                            ] + store_files,
                             region_name=region_name,
                             file_name_prefix=file_name_prefix,
-                            logger=logger
+                            logger=logger, segments=segments
                         )
-                except RateLimitExceededException:
-                    logger.info(msg='Github API rate limit reached')
-                    self._git = get_git_instance(
-                        number_of_attempts=10, logger=logger
-                    )
-                    repo_data = RepositoryData(git=self._git)
-                    continue
-                except UnknownObjectException:
-                    logger.info(msg='Encountered a removed repository')
-                    continue
-                except GithubException:
-                    logger.info(msg='Encoutered an incomplete repository')
-                    continue
-                except (ReadTimeout, ConnectionError):
-                    logger.info(msg='Newtwork issue')
-                    sleep(10)
-                    continue
-                except NoAPICalls:
-                    logger.info(msg='API calls were not granted')
-                    return
 
+        except NoAPICalls:
+            logger.info(msg='API calls were not granted')
         finally:
-            remaining_ids = repo_ids - computed_ids
+            if dataset_writer:
+                dataset_writer.close()
+            logger.info(msg=METRICS.stats())
+            METRICS.dump(file_name=metrics_file)
+            if refresh and self._store_covers(
+                feature_store=feature_store, features=features,
+                csv_file_name=csv_file_name if csv_export else None,
+                parquet_file_name=parquet_file_name
+            ):
+                dataset_writer = DatasetWriter(
+                    features=features,
+                    csv_file_name=csv_file_name if csv_export else None,
+                    parquet_file_name=parquet_file_name, append=False
+                )
+                exported = 0
+                for row in feature_store.rows(
+                    features=features, missing=COULD_NOT_COMPUTE
+                ):
+                    dataset_writer.write_row(row=row)
+                    exported += 1
+                dataset_writer.close()
+                logger.info(msg=f'Exported {exported} repos from the store')
+                self.upload_all(
+                    file_names=csv_files + parquet_files + [
+                        logger_file, metrics_file
+                    ] + store_files + http_cache_files,
+                    region_name=region_name,
+                    file_name_prefix=file_name_prefix, logger=logger,
+                    segments=segments, rewritten_files=csv_files
+                )
+            elif refresh:
+                logger.warning(
+                    msg='Published repos are missing in the store, ' +
+                        'outputs are not rebuilt'
+                )
+                self.upload_all(
+                    file_names=[
+                        logger_file, metrics_file
+                    ] + store_files + http_cache_files,
+                    region_name=region_name,
+                    file_name_prefix=file_name_prefix, logger=logger,
+                    segments=segments
+                )
+            else:
+                repo_ids.rewrite(keys=set(repo_ids) - computed_ids)
+                self.save_and_upload_all(
+                    stores=[repo_ids], compact=True,
+                    other_files=csv_files + parquet_files + [
+                        logger_file, metrics_file
+                    ] + store_files + http_cache_files,
+                    logger=logger, region_name=region_name,
+                    file_name_prefix=file_name_prefix, segments=segments
+                )
+            if HTTP_CACHE:
+                logger.info(msg=HTTP_CACHE.stats())
+            if used_cassette():
+                logger.info(msg=used_cassette().stats())
+            logger.info(msg='End of the search')
+
+    def _compute_chunk(
+            self, queue: WorkQueue, lease: Lease,
+            executor: ThreadPoolExecutor, workers: int,
+            compute: Callable[..., Optional[List[Any]]], logger: Logger
+    ) -> None:
+        """Computes rows of the leased chunk into its output.
+
+        The lease is renewed meanwhile, once it is lost, the chunk is left
+        to the worker that claimed it. The chunk is released when the
+        computation is interrupted, e.g. by NoAPICalls.
+        """
+        logger.info(msg=f'Claimed {lease.name}: {len(lease.ids)} IDs')
+        rows, computed = [], []
+        try:
+            with queue.keep_alive(lease=lease):
+                for repo_id, row in self._compute_rows(
+                    executor=executor, workers=workers, repo_ids=lease.ids,
+                    compute=compute
+                ):
+                    if lease.lost:
+                        break
+                    if row is None:
+                        continue
+                    rows.append(row)
+                    computed.append(repo_id)
+                    logger.info(
+                        msg=f'Computed repo: {repo_id}, ' +
+                            f'rank: {len(computed)} / {len(lease.ids)}'
+                    )
+        except BaseException:
+            queue.release(lease=lease)
+            raise
+
+        if lease.lost or not queue.complete(
+            lease=lease, computed=computed, output=dumps(rows).encode()
+        ):
+            logger.info(msg=f'Lease of {lease.name} lost')
+            return
+        logger.info(msg=f'Completed {lease.name}')
+
+    def _merge_chunks(
+            self, queue: WorkQueue, lease: Lease, features: List[str],
+            ids_file_name: str, csv_file_name: Optional[str],
+            parquet_file_name: Optional[str], other_files: List[str],
+            region_name: str, file_name_prefix: str, logger: Logger,
+            segments: Optional[SegmentedFiles] = None
+    ) -> None:
+        """Appends the outputs of all chunks to the CSV and Parquet files.
+
+        Computed IDs are removed from the IDs file, just as in
+        compute_features, the outputs and the IDs file are uploaded before
+        the merge is marked done. A worker stopping in between leaves the
+        merge to another one, which skips the rows already merged by their
+        url, if it is among the features.
+        """
+        output_files = [
+            file_name for file_name in [csv_file_name, parquet_file_name]
+            if file_name
+        ]
+        with queue.keep_alive(lease=lease):
+            self.download_all(
+                file_names=output_files, region_name=region_name,
+                file_name_prefix=file_name_prefix, logger=logger,
+                segments=segments
+            )
+            dataset_writer = DatasetWriter(
+                features=features, csv_file_name=csv_file_name,
+                parquet_file_name=parquet_file_name,
+                key='url' if 'url' in features else None
+            )
+            computed_ids = set()
+            for computed, output in queue.outputs():
+                for row in loads(output) if output else []:
+                    dataset_writer.write_row(row=row)
+                computed_ids.update(computed)
+            dataset_writer.close()
+            logger.info(msg=f'Merged {len(computed_ids)} repos')
+
+            repo_ids = self.load_visited_ids(
+                dat_file=ids_file_name, logger=logger
+            )
+            repo_ids.rewrite(keys=set(repo_ids) - computed_ids)
             self.save_and_upload_all(
-                file_set_tuples=[(ids_file_name, remaining_ids)],
-                other_files=[csv_file_name, logger_file], logger=logger,
-                region_name=region_name,
-                file_name_prefix=file_name_prefix
+                stores=[repo_ids], compact=True,
+                other_files=output_files + other_files, logger=logger,
+                region_name=region_name, file_name_prefix=file_name_prefix,
+                segments=segments
             )
-            logger.info(msg='End of the search')
+        if not queue.complete(lease=lease, computed=[]):
+            logger.info(msg='Lease of the merge lost')
+
+    def compute_features_sharded(
+            self, logger_name: str, features_file: str, ids_file_name: str,
+            csv_file_name: str, region_name: str, file_name_prefix: str,
+            queue_name: str, worker_name: str, chunk_size: int = 100,
+            lease_seconds: int = 300, objects_file: Optional[str] = None,
+            graphql: bool = False, profile_cache_file: str = ':memory:',
+            profile_cache_size: int = 100000, profile_cache_ttl: int = 30,
+            workers: int = 1, parquet_file_name: Optional[str] = None,
+            csv_export: bool = True, segmented_upload: bool = False,
+            max_segments: int = 100, contributor_stats: bool = False
+    ) -> None:
+        """Computes features of the IDs file together with other workers.
+
+        The IDs are split into chunks of a work queue kept in the bucket,
+        or in the objects file on a volume shared by the workers, see
+        WorkQueue. Every worker claims chunks and computes them with its
+        own tokens, chunks of workers that stopped are claimed again once
+        their leases expire. When no chunk remains, one of the workers
+        merges the outputs of the chunks into the CSV and Parquet files.
+        Every worker logs into a file of its own, named after the worker.
+        The profile cache file, unless in memory, is downloaded at the start
+        and uploaded after every chunk, the last upload wins.
+        """
+        repo_data_class = GraphQLRepositoryData if graphql else RepositoryData
+        cache_files = (
+            [profile_cache_file] if profile_cache_file != ':memory:' else []
+        )
+        stem, extension = path.splitext(logger_name)
+        logger = setup_logger(
+            name=__name__, file=f'{stem}.{worker_name}{extension}',
+            format=logger_config_values['format'],
+            level=logger_config_values['level']
+        )
+        logger_file = logger_file_name(logger=logger)
+        metrics_file = metrics_file_name(logger=logger)
+        segments = None
+        if segmented_upload:
+            segments = SegmentedFiles(
+                file_names=([csv_file_name] if csv_export else []) + [
+                    logger_file
+                ], region_name=region_name, prefix=file_name_prefix,
+                max_segments=max_segments
+            )
+
+        if objects_file:
+            objects = LocalObjects(file_name=objects_file)
+        else:
+            objects = S3Handler(region_name=region_name)
+            if not objects.bucket_exits_check():
+                objects.create_bucket()
+        queue = WorkQueue(
+            objects=objects, name=queue_name, worker=worker_name,
+            lease_seconds=lease_seconds, prefix=file_name_prefix
+        )
+        self.download_visited(
+            file_names=[ids_file_name], region_name=region_name,
+            file_name_prefix=file_name_prefix, logger=logger
+        )
+        self.download_all(
+            file_names=cache_files, region_name=region_name,
+            file_name_prefix=file_name_prefix, logger=logger
+        )
+        profile_cache = ProfileCache(
+            file_name=profile_cache_file, max_size=profile_cache_size,
+            ttl=timedelta(days=profile_cache_ttl)
+        )
+        http_cache_files = self.download_http_cache(
+            region_name=region_name, file_name_prefix=file_name_prefix,
+            logger=logger
+        )
+        chunks = queue.populate(
+            ids=self.load_visited_ids(dat_file=ids_file_name, logger=logger),
+            chunk_size=chunk_size
+        )
+        logger.info(
+            msg=f'Work queue {queue_name}: {chunks} chunks, ' +
+                f'worker: {worker_name}, workers: {workers}'
+        )
+
+        features = self.load_features(features_file=features_file)
+        compute = partial(
+            self._compute_row, features=features,
+            processed_names=self.load_visited_ids(
+                dat_file='main_names.dat', logger=logger, hashed=True
+            ),
+            workers_data=local(),
+            create_repo_data=lambda: repo_data_class(
+                profile_cache=profile_cache,
+                contributor_stats=contributor_stats
+            ),
+            logger=logger
+        )
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                while not queue.merged():
+                    lease = queue.claim()
+                    if lease:
+                        self._compute_chunk(
+                            queue=queue, lease=lease, executor=executor,
+                            workers=workers, compute=compute, logger=logger
+                        )
+                        METRICS.dump(file_name=metrics_file)
+                        self.upload_all(
+                            file_names=[
+                                logger_file, metrics_file
+                            ] + cache_files,
+                            region_name=region_name,
+                            file_name_prefix=file_name_prefix,
+                            logger=logger, segments=segments
+                        )
+                        continue
+
+                    lease = queue.claim_merge()
+                    if lease:
+                        logger.info(msg='Merging outputs of the chunks')
+                        self._merge_chunks(
+                            queue=queue, lease=lease, features=features,
+                            ids_file_name=ids_file_name,
+                            csv_file_name=csv_file_name if csv_export
+                            else None,
+                            parquet_file_name=parquet_file_name,
+                            other_files=[logger_file, metrics_file],
+                            region_name=region_name,
+                            file_name_prefix=file_name_prefix,
+                            logger=logger, segments=segments
+                        )
+                        continue
+
+                    # the remaining chunks are leased by other workers,
+                    # they are claimed here if their leases expire
+                    logger.debug(msg='No chunk to claim, waiting')
+                    sleep(lease_seconds / 3)
+
+        except NoAPICalls:
+            logger.info(msg='API calls were not granted')
+        finally:
+            logger.info(msg=METRICS.stats())
+            METRICS.dump(file_name=metrics_file)
+            self.upload_all(
+                file_names=[
+                    logger_file, metrics_file
+                ] + cache_files + http_cache_files,
+                region_name=region_name, file_name_prefix=file_name_prefix,
+                logger=logger, segments=segments
+            )
+            if HTTP_CACHE:
+                logger.info(msg=HTTP_CACHE.stats())
+            if used_cassette():
+                logger.info(msg=used_cassette().stats())
+            logger.info(msg='End of the computation')
+
+
+class OfflineDataset(Dataset):
+    """Dataset working with local files only, nothing goes to S3.
+
+    Used with cassettes, so that recorded and replayed runs need no S3
+    credentials and do not mix their outputs into the bucket.
+    """
+
+    @staticmethod
+    def upload_all(logger: Logger, *args: Any, **kwargs: Any) -> None:
+        logger.debug(msg='Offline run, upload skipped')
+
+    @staticmethod
+    def download_all(logger: Logger, *args: Any, **kwargs: Any) -> None:
+        logger.debug(msg='Offline run, download skipped')
+
+    @staticmethod
+    def download_visited(
+        logger: Logger, *args: Any, **kwargs: Any
+    ) -> None:
+        logger.debug(msg='Offline run, download skipped')
+
+    @staticmethod
+    def delete_merged_deltas(
+        logger: Logger, *args: Any, **kwargs: Any
+    ) -> None:
+        pass
@@ -0,0 +1,160 @@
+from csv import DictReader, writer
+from enum import Enum
+from os import path, replace
+from typing import Any, Dict, List, Optional, Set, get_type_hints
+
+import pyarrow
+from pyarrow import parquet
+
+from .repository_data import COULD_NOT_COMPUTE, RepositoryData
+
+
+def _arrow_type(feature: str) -> Any:
+    """Derives the column type from the return type of the feature method."""
+    return_type = get_type_hints(getattr(RepositoryData, feature)).get(
+        'return'
+    )
+    if return_type is bool:
+        return pyarrow.bool_()
+    if return_type is float:
+        return pyarrow.float64()
+    # enums are stored by their values
+    if return_type is int or (
+        isinstance(return_type, type) and issubclass(return_type, Enum)
+    ):
+        return pyarrow.int64()
+    return pyarrow.string()
+
+
+def features_schema(features: List[str]) -> Any:
+    return pyarrow.schema(
+        [(feature, _arrow_type(feature=feature)) for feature in features]
+    )
+
+
+def read_parquet(file_name: str) -> Any:
+    """Reads the dataset as an Arrow table, memory mapping the file."""
+    return parquet.read_table(file_name, memory_map=True)
+
+
+class DatasetWriter:
+    """Writes rows of features into a CSV and/or a Parquet file.
+
+    The CSV file is kept open, the rows are buffered and written to disk on
+    flush. In Parquet, every flush writes a row group with types derived
+    from the feature methods, values that could not be computed are nulls.
+    The Parquet file is complete only after close, existing rows are
+    carried over when appending to it. With a key feature, rows whose key
+    a file already holds are not written into it again, so appending the
+    same rows twice is harmless.
+    """
+
+    def __init__(
+        self, features: List[str], csv_file_name: Optional[str] = None,
+        parquet_file_name: Optional[str] = None, append: bool = True,
+        key: Optional[str] = None
+    ) -> None:
+        self._features = features
+        self._key_index = features.index(key) if key else None
+        # keys of the rows in the CSV and the Parquet file
+        self._csv_keys: Set[str] = set()
+        self._parquet_keys: Set[str] = set()
+        self._csv_file = None
+        self._csv_writer = None
+        if csv_file_name:
+            exists = append and path.isfile(csv_file_name)
+            if exists and key:
+                with open(file=csv_file_name, mode='r', newline='') as f:
+                    self._csv_keys = {row[key] for row in DictReader(f)}
+            self._csv_file = open(
+                file=csv_file_name, mode='a' if exists else 'w'
+            )
+            self._csv_writer = writer(self._csv_file, delimiter=',')
+            if not exists:
+                self._csv_writer.writerow(features)
+
+        self._parquet_file_name = None
+        self._parquet_writer = None
+        self._columns: Dict[str, List[Any]] = {}
+        if parquet_file_name:
+            self._parquet_file_name = parquet_file_name
+            self._schema = features_schema(features=features)
+            self._parquet_writer = parquet.ParquetWriter(
+                parquet_file_name + '.tmp', self._schema
+            )
+            if append and path.isfile(parquet_file_name):
+                table = read_parquet(file_name=parquet_file_name).select(
+                    features
+                ).cast(self._schema)
+                self._parquet_writer.write_table(table)
+                if key:
+                    self._parquet_keys = {
+                        str(value) for value in table.column(key).to_pylist()
+                    }
+            self._clear_columns()
+
+    def _clear_columns(self) -> None:
+        self._columns = {feature: [] for feature in self._features}
+
+    @staticmethod
+    def _unseen(keys: Set[str], key: Optional[str]) -> bool:
+        if key is None:
+            return True
+        if key in keys:
+            return False
+        keys.add(key)
+        return True
+
+    def write_row(self, row: List[Any]) -> None:
+        key = None if self._key_index is None else str(row[self._key_index])
+        if self._csv_writer and self._unseen(keys=self._csv_keys, key=key):
+            self._csv_writer.writerow([str(col) for col in row])
+        if self._parquet_writer and self._unseen(
+            keys=self._parquet_keys, key=key
+        ):
+            for feature, value in zip(self._features, row):
+                self._columns[feature].append(
+                    None if value == COULD_NOT_COMPUTE else value
+                )
+
+    def _arrays(self) -> List[Any]:
+        arrays = []
+        for field in self._schema:
+            values = self._columns[field.name]
+            try:
+                arrays.append(pyarrow.array(values, type=field.type))
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                # a value of an unexpected type nulls only that value
+                arrays.append(pyarrow.array(
+                    [self._convert(value, field.type) for value in values],
+                    type=field.type
+                ))
+        return arrays
+
+    @staticmethod
+    def _convert(value: Any, arrow_type: Any) -> Any:
+        try:
+            return pyarrow.scalar(value).cast(arrow_type).as_py()
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError,
+                pyarrow.ArrowNotImplementedError):
+            return None
+
+    def flush(self) -> None:
+        if self._csv_file:
+            self._csv_file.flush()
+        if self._parquet_writer and self._columns[self._features[0]]:
+            self._parquet_writer.write_batch(pyarrow.record_batch(
+                self._arrays(), schema=self._schema
+            ))
+            self._clear_columns()
+
+    def close(self) -> None:
+        self.flush()
+        if self._csv_file:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv_writer = None
+        if self._parquet_writer:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+            replace(self._parquet_file_name + '.tmp', self._parquet_file_name)
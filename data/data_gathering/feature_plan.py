@@ -0,0 +1,54 @@
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+
+class Source:
+    """Data fetched once per repository and shared by the features.
+
+    The cost estimates API calls of the fetch, after lists the sources
+    fetched first when they are needed too, e.g. the commits whose window
+    bounds the pulls.
+    """
+
+    def __init__(
+        self, name: str, fetch: Callable[[Any], Any], cost: float,
+        after: Tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.fetch = fetch
+        self.cost = cost
+        self.after = after
+
+
+class FeaturePlan:
+    """Registry of the sources needed by every feature.
+
+    Features missing in the registry need no source, they are computed
+    from the repository itself.
+    """
+
+    def __init__(
+        self, sources: List[Source], features: Dict[str, Tuple[str, ...]]
+    ) -> None:
+        self._sources = {source.name: source for source in sources}
+        self._features = features
+
+    def sources(self, features: List[str]) -> List[Source]:
+        """Returns the sources needed by the features in fetching order.
+
+        Every source follows the sources it is fetched after, otherwise
+        the cheaper sources go first.
+        """
+        needed: Set[str] = {
+            name for feature in features
+            for name in self._features.get(feature, ())
+        }
+        planned: List[Source] = []
+        while needed:
+            ready = [
+                self._sources[name] for name in needed
+                if not needed.intersection(self._sources[name].after)
+            ]
+            source = min(ready, key=lambda s: (s.cost, s.name))
+            planned.append(source)
+            needed.remove(source.name)
+        return planned
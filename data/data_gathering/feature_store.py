@@ -0,0 +1,202 @@
+from datetime import datetime, timedelta
+from json import dumps, loads
+from sqlite3 import connect
+from threading import Lock
+from time import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set
+
+
+# bumping the version of a feature recomputes it in the next refresh
+FEATURE_VERSIONS: Dict[str, int] = {}
+
+# timestamp of the repository whose change invalidates the stored value,
+# a push also invalidates the values depending on updated_at, features not
+# listed here are recomputed on every refresh
+_INVALIDATED_BY = {
+    'repo_name': 'updated_at',
+    'url': 'updated_at',
+    'pulls_count_open': 'updated_at',
+    'pulls_count_closed': 'updated_at',
+    'issues_count_open': 'updated_at',
+    'issues_count_closed': 'updated_at',
+    'commits_count': 'pushed_at',
+    'branches_count': 'pushed_at',
+    'releases_count': 'updated_at',
+    'owner_type': 'updated_at',
+    'watchers_count': 'updated_at',
+    'forks_count': 'updated_at',
+    'stargazers_count': 'updated_at',
+    'development_time': 'pushed_at',
+    'owner_account_age': 'max_age',
+    'avg_dev_account_age': 'pushed_at',
+    'has_test': 'pushed_at',
+    'has_doc': 'pushed_at',
+    'has_example': 'pushed_at',
+    'has_readme': 'pushed_at',
+    'owner_projects_count': 'max_age',
+    'owner_following': 'max_age',
+    'owner_followers': 'max_age',
+    'devs_followers_avg': 'max_age',
+    'devs_following_avg': 'max_age',
+    'commits_by_dev_with_most_commits': 'pushed_at',
+    'magnetism': 'pushed_at',
+    'stickiness': 'pushed_at',
+    'wealth': 'updated_at',
+    'last_commit_age': 'pushed_at',
+}
+
+# ages in days grow with time, stored values are shifted by the days elapsed
+# since they were computed
+_AGE_FEATURES = {'last_commit_age', 'owner_account_age', 'avg_dev_account_age'}
+
+
+class Snapshot(NamedTuple):
+    pushed_at: Optional[str]
+    updated_at: Optional[str]
+    last_commit_at: Optional[str]
+
+
+class FeatureStore:
+    """Computed features of repositories keyed by repository ID.
+
+    Every value is stored with the feature version and the time it was
+    computed, every repository with its pushed_at and updated_at at that
+    time, so that a refresh recomputes only the values that could have
+    changed. Values older than max_age are recomputed regardless.
+    """
+
+    def __init__(
+        self, file_name: str = ':memory:',
+        max_age: timedelta = timedelta(days=90)
+    ) -> None:
+        self._connection = connect(file_name, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS repos (repo_id INTEGER PRIMARY KEY, ' +
+            'pushed_at TEXT, updated_at TEXT, last_commit_at TEXT)'
+        )
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS features (repo_id INTEGER, ' +
+            'feature TEXT, value TEXT, version INTEGER, computed_at REAL, ' +
+            'PRIMARY KEY (repo_id, feature))'
+        )
+        self._connection.commit()
+        self._lock = Lock()
+        self._max_age = max_age.total_seconds()
+
+    @staticmethod
+    def _format(dtime: Optional[datetime]) -> Optional[str]:
+        return dtime.isoformat() if dtime else None
+
+    def repo_ids(self) -> Set[int]:
+        with self._lock:
+            return {
+                row[0] for row in self._connection.execute(
+                    'SELECT repo_id FROM repos'
+                )
+            }
+
+    def snapshot(self, repo_id: int) -> Optional[Snapshot]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT pushed_at, updated_at, last_commit_at FROM repos ' +
+                'WHERE repo_id = ?', (repo_id,)
+            ).fetchone()
+        return Snapshot(*row) if row else None
+
+    def stale_features(
+        self, repo_id: int, features: List[str], pushed_at: datetime,
+        updated_at: datetime
+    ) -> Dict[str, str]:
+        """Returns features to be recomputed with the reason why.
+
+        The reason is 'pushed_at' when only a push invalidated the value,
+        so it can be updated from the difference since the last snapshot.
+        """
+        snapshot = self.snapshot(repo_id=repo_id)
+        with self._lock:
+            stored = {
+                row[0]: row[1:] for row in self._connection.execute(
+                    'SELECT feature, version, computed_at FROM features ' +
+                    'WHERE repo_id = ?', (repo_id,)
+                )
+            }
+        pushed = not snapshot or snapshot.pushed_at != self._format(pushed_at)
+        updated = (
+            pushed or snapshot.updated_at != self._format(updated_at)
+        )
+
+        now = time()
+        stale = {}
+        for feature in features:
+            invalidated_by = _INVALIDATED_BY.get(feature)
+            if feature not in stored:
+                stale[feature] = 'missing'
+            elif stored[feature][0] != FEATURE_VERSIONS.get(feature, 1):
+                stale[feature] = 'version'
+            elif now - stored[feature][1] > self._max_age:
+                stale[feature] = 'max_age'
+            elif not invalidated_by:
+                stale[feature] = 'always'
+            elif invalidated_by == 'pushed_at' and pushed:
+                stale[feature] = 'pushed_at'
+            elif invalidated_by == 'updated_at' and updated:
+                stale[feature] = 'updated_at'
+        return stale
+
+    def values(self, repo_id: int, features: List[str]) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT feature, value, computed_at FROM features ' +
+                'WHERE repo_id = ?', (repo_id,)
+            ).fetchall()
+        now = time()
+        values = {}
+        for feature, value, computed_at in rows:
+            if feature not in features:
+                continue
+            value = loads(value)
+            if feature in _AGE_FEATURES and value is not None:
+                value += int((now - computed_at) // (24 * 60 * 60))
+            values[feature] = value
+        return values
+
+    def save(
+        self, repo_id: int, values: Dict[str, Any], pushed_at: datetime,
+        updated_at: datetime, last_commit_at: Optional[datetime] = None
+    ) -> None:
+        now = time()
+        with self._lock:
+            self._connection.execute(
+                'INSERT INTO repos VALUES (?, ?, ?, ?) ' +
+                'ON CONFLICT (repo_id) DO UPDATE SET ' +
+                'pushed_at = excluded.pushed_at, ' +
+                'updated_at = excluded.updated_at, last_commit_at = ' +
+                'COALESCE(excluded.last_commit_at, last_commit_at)',
+                (
+                    repo_id, self._format(pushed_at),
+                    self._format(updated_at), self._format(last_commit_at)
+                )
+            )
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?)',
+                [
+                    (
+                        repo_id, feature, dumps(value),
+                        FEATURE_VERSIONS.get(feature, 1), now
+                    )
+                    for feature, value in values.items()
+                ]
+            )
+            self._connection.commit()
+
+    def rows(
+        self, features: List[str], missing: Any = None
+    ) -> Iterator[List[Any]]:
+        """Yields rows of all the repositories in the store.
+
+        Values that were never stored, e.g. those that could not be
+        computed, are given as missing.
+        """
+        for repo_id in sorted(self.repo_ids()):
+            values = self.values(repo_id=repo_id, features=features)
+            yield [values.get(feature, missing) for feature in features]
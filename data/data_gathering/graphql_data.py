@@ -0,0 +1,348 @@
+from datetime import datetime
+from json import dumps, loads
+from math import ceil
+from logging import Logger
+from os import getenv
+from typing import Any, Dict, Iterator, List, Optional
+
+from github import Github
+from github.GithubException import (
+    GithubException, RateLimitExceededException, UnknownObjectException
+)
+from github.Repository import Repository
+
+from data_gathering import METRICS
+from .cassette import current_datetime
+from .enums import AccountType
+from .profile_cache import ProfileCache
+from .repository_data import RepositoryData
+from .token_pool import rate_limited_resource, TokenPool
+
+
+_GRAPHQL_URL = getenv('GITHUB_GRAPHQL_URL', 'https://api.github.com/graphql')
+
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+_PAGE_SIZE = 100
+
+# fields of the repository object requested only by the features they serve,
+# GraphQL merges repeated selections of the same field (e.g. owner)
+_REPO_FIELDS = {
+    'branches_count': 'branches: refs(refPrefix: "refs/heads/") ' +
+                      '{ totalCount }',
+    'owner_account_age': 'owner { ... on User { createdAt } ' +
+                         '... on Organization { createdAt } }',
+    'owner_projects_count': 'owner { repositories(privacy: PUBLIC, ' +
+                            'ownerAffiliations: [OWNER]) { totalCount } }',
+    'owner_following': 'owner { ... on User { following { totalCount } } }',
+    'owner_followers': 'owner { ... on User { followers { totalCount } } }',
+}
+
+# features counted by the search API in the window preceding the last commit,
+# just as the REST issues endpoint, searching without is:issue includes pulls
+_WINDOW_SEARCHES = {
+    'pulls_count_open': 'is:pr is:open',
+    'pulls_count_closed': 'is:pr is:closed',
+    'issues_count_open': 'is:open',
+    'issues_count_closed': 'is:closed',
+}
+
+_CONNECTIONS = {
+    'releases': 'releases(first: {size}{after}, orderBy: ' +
+                '{{field: CREATED_AT, direction: DESC}}) ' +
+                '{{ pageInfo {{ hasNextPage endCursor }} ' +
+                'nodes {{ createdAt }} }}',
+    'closedPulls': 'pullRequests(states: [CLOSED, MERGED], ' +
+                   'first: {size}{after}, orderBy: ' +
+                   '{{field: CREATED_AT, direction: DESC}}) ' +
+                   '{{ pageInfo {{ hasNextPage endCursor }} ' +
+                   'nodes {{ createdAt closedAt }} }}',
+}
+
+_WINDOW_FEATURES = {
+    'commits_count', 'development_time', 'releases_count', 'wealth'
+} | set(_WINDOW_SEARCHES)
+
+GRAPHQL_FEATURES = (
+    set(_REPO_FIELDS) | _WINDOW_FEATURES | {'owner_type', 'last_commit_age'}
+)
+
+
+class GraphQLRepositoryData(RepositoryData):
+    """RepositoryData fetching the costly features in a few GraphQL queries.
+
+    Features that cannot be expressed in GraphQL (e.g. contributors or the
+    commit authorship aggregates) are computed by the REST implementation.
+    """
+    _resource = 'graphql'
+
+    def __init__(
+        self, git: Optional[Github] = None,
+        profile_cache: Optional[ProfileCache] = None,
+        token_pool: Optional[TokenPool] = None, endpoint: str = _GRAPHQL_URL,
+        contributor_stats: bool = False
+    ) -> None:
+        super().__init__(
+            git=git, profile_cache=profile_cache, token_pool=token_pool,
+            contributor_stats=contributor_stats
+        )
+        self._endpoint = endpoint
+        self._prefetched: Dict[str, Any] = {}
+
+    def set_repo(
+        self, repo_name_or_id: str = None, repo: Repository = None
+    ) -> None:
+        super().set_repo(repo_name_or_id=repo_name_or_id, repo=repo)
+        self._prefetched = {}
+
+    def _query(self, query: str, **variables: Any) -> Dict[str, Any]:
+        # posted by the requester of the repository, so the query goes
+        # through the connection (token, metrics, cassette) as REST calls do
+        status, headers, body = self._repo._requester.requestJson(
+            'POST', self._endpoint,
+            input={'query': query, 'variables': variables}
+        )
+        data = loads(body) if body else {}
+
+        if (
+            status in (403, 429) and
+            headers.get('x-ratelimit-remaining') == '0'
+        ):
+            raise RateLimitExceededException(status, data, headers)
+        if status != 200:
+            raise GithubException(status, data, headers)
+
+        errors = data.get('errors')
+        if errors:
+            error_types = {error.get('type') for error in errors}
+            if 'RATE_LIMITED' in error_types:
+                raise RateLimitExceededException(403, data, headers)
+            if 'NOT_FOUND' in error_types:
+                raise UnknownObjectException(404, data, headers)
+            raise GithubException(status, data, headers)
+
+        return data['data']
+
+    @staticmethod
+    def _parse_datetime(value: str) -> datetime:
+        return datetime.strptime(value, _DATETIME_FORMAT)
+
+    @staticmethod
+    def _format_datetime(value: datetime) -> str:
+        return value.strftime(_DATETIME_FORMAT)
+
+    @staticmethod
+    def _repo_query(
+        fields: List[str], top_level_fields: Optional[List[str]] = None,
+        **variables: str
+    ) -> str:
+        declarations = ''.join(
+            f', ${name}: {gql_type}' for name, gql_type in variables.items()
+        )
+        return (
+            f'query($owner: String!, $name: String!{declarations}) ' +
+            '{ repository(owner: $owner, name: $name) { ' +
+            ' '.join(dict.fromkeys(fields or ['id'])) + ' } ' +
+            ' '.join(top_level_fields or []) + ' }'
+        )
+
+    def _connection_nodes(
+        self, key: str, first_page: Dict[str, Any], since: datetime
+    ) -> Iterator[Dict[str, Any]]:
+        """Yields nodes of a connection ordered by creation date descending.
+
+        Further pages are requested only while the nodes are newer than
+        since.
+        """
+        page = first_page
+        while True:
+            for node in page['nodes']:
+                if self._parse_datetime(node['createdAt']) <= since:
+                    return
+                yield node
+            if not page['pageInfo']['hasNextPage']:
+                return
+            query = self._repo_query(
+                fields=[f'{key}: ' + _CONNECTIONS[key].format(
+                    size=_PAGE_SIZE, after=', after: $cursor'
+                )],
+                cursor='String!'
+            )
+            page = self._query(
+                query, owner=self._repo.owner.login, name=self._repo.name,
+                cursor=page['pageInfo']['endCursor']
+            )['repository'][key]
+
+    def prefetch(self, features: List[str]) -> Dict[str, Any]:
+        requested = [f for f in features if f in GRAPHQL_FEATURES]
+        if not requested:
+            return self._prefetched
+
+        owner, name = self._repo.owner.login, self._repo.name
+        fields = [
+            'owner { __typename }',
+            'defaultBranchRef { target { ... on Commit ' +
+            '{ oid committedDate history { totalCount } } } }'
+        ] + [_REPO_FIELDS[f] for f in requested if f in _REPO_FIELDS]
+        repository = self._query(
+            self._repo_query(fields=fields), owner=owner, name=name
+        )['repository']
+
+        if not repository['defaultBranchRef']:
+            raise GithubException(409, repository, None)
+        head = repository['defaultBranchRef']['target']
+        until = self._parse_datetime(head['committedDate'])
+        since = self.threshold_datetime(until=until, days=730)
+        values = self._prefetched
+
+        owner_data = repository['owner']
+        for feature in requested:
+            if feature == 'owner_type':
+                if owner_data['__typename'] not in AccountType.__members__:
+                    raise ValueError('Unsupported account type')
+                values[feature] = AccountType[owner_data['__typename']].value
+            elif feature == 'owner_account_age':
+                values[feature] = self.datetime_to_days(
+                    dtime=self._parse_datetime(owner_data['createdAt'])
+                )
+            elif feature == 'owner_projects_count':
+                values[feature] = owner_data['repositories']['totalCount']
+            elif feature in ('owner_following', 'owner_followers'):
+                # organizations have no followers in GraphQL, unlike in
+                # REST, so their values are left to the REST implementation
+                if owner_data['__typename'] == 'User':
+                    values[feature] = owner_data[
+                        feature[len('owner_'):]
+                    ]['totalCount']
+            elif feature == 'branches_count':
+                values[feature] = repository['branches']['totalCount']
+            elif feature == 'last_commit_age':
+                values[feature] = (
+                    current_datetime().date() - until.date()
+                ).days
+
+        if not _WINDOW_FEATURES.intersection(requested):
+            return values
+
+        window = (
+            f'{self._format_datetime(since)}..' +
+            f'{self._format_datetime(until)}'
+        )
+        declarations, variables = {}, {}
+        head_fields = []
+        if 'commits_count' in requested:
+            head_fields.append(
+                'windowHistory: history(since: $since, until: $until) ' +
+                '{ totalCount }'
+            )
+            declarations.update(since='GitTimestamp!', until='GitTimestamp!')
+            variables.update(
+                since=self._format_datetime(since),
+                until=self._format_datetime(until)
+            )
+        # the history cursor is "<oid> <offset>", so the oldest commit is
+        # reached directly without paginating through the whole history
+        total_commits = head['history']['totalCount']
+        if 'development_time' in requested and total_commits > 1:
+            head_fields.append(
+                'firstHistory: history(first: 1, after: $firstCursor) ' +
+                '{ nodes { committedDate } }'
+            )
+            declarations.update(firstCursor='String!')
+            variables.update(firstCursor=f'{head["oid"]} {total_commits - 2}')
+        fields = []
+        if head_fields:
+            fields.append(
+                'head: object(oid: $oid) { ... on Commit { ' +
+                ' '.join(head_fields) + ' } }'
+            )
+            declarations.update(oid='GitObjectID!')
+            variables.update(oid=head['oid'])
+        if 'releases_count' in requested:
+            fields.append('releases: ' + _CONNECTIONS['releases'].format(
+                size=_PAGE_SIZE, after=''
+            ))
+        if 'wealth' in requested:
+            fields.append('closedPulls: ' + _CONNECTIONS['closedPulls'].format(
+                size=_PAGE_SIZE, after=''
+            ))
+        searches = [
+            f'{feature}: search(query: ' +
+            dumps(f'repo:{owner}/{name} {_WINDOW_SEARCHES[feature]} ' +
+                  f'created:{window}') +
+            ', type: ISSUE) { issueCount }'
+            for feature in requested if feature in _WINDOW_SEARCHES
+        ]
+
+        query = self._repo_query(
+            fields=fields, top_level_fields=searches, **declarations
+        )
+        data = self._query(query, owner=owner, name=name, **variables)
+        repository = data['repository']
+
+        for feature in requested:
+            if feature in _WINDOW_SEARCHES:
+                values[feature] = data[feature]['issueCount']
+            elif feature == 'commits_count':
+                values[feature] = (
+                    repository['head']['windowHistory']['totalCount']
+                )
+            elif feature == 'development_time':
+                if total_commits > 1:
+                    first = self._parse_datetime(
+                        repository['head']['firstHistory']['nodes'][0][
+                            'committedDate'
+                        ]
+                    )
+                else:
+                    first = until
+                values[feature] = (until - first).days
+            elif feature == 'releases_count':
+                values[feature] = sum(1 for node in self._connection_nodes(
+                    key='releases', first_page=repository['releases'],
+                    since=since
+                ) if self._parse_datetime(node['createdAt']) < until)
+            elif feature == 'wealth':
+                wealth = 0.0
+                for node in self._connection_nodes(
+                    key='closedPulls', first_page=repository['closedPulls'],
+                    since=since
+                ):
+                    days_to_close = (
+                        self._parse_datetime(node['closedAt']) -
+                        self._parse_datetime(node['createdAt'])
+                    ).days
+                    if days_to_close == 0:
+                        days_to_close = 1
+                    wealth += 1 / ceil(days_to_close / 30)
+                values[feature] = wealth
+
+        return values
+
+    def _compute_feature(self, feature: str) -> Any:
+        if feature in self._prefetched:
+            return self._prefetched[feature]
+        return super()._compute_feature(feature=feature)
+
+    def _source_features(self, features: List[str]) -> List[str]:
+        return [
+            feature for feature in features if feature not in self._prefetched
+        ]
+
+    def get_row(self, features: List[str], logger: Logger) -> List[Any]:
+        # retried once with a renewed instance, like the sources, the
+        # features not prefetched then are computed by REST
+        for _ in range(2):
+            try:
+                with METRICS.scope(feature='source:graphql'):
+                    self.prefetch(features=features)
+                break
+            except RateLimitExceededException as error:
+                METRICS.record_retry(feature='source:graphql')
+                logger.info(msg='Github API rate limit reached')
+                self.renew_git(
+                    logger=logger, resource=rate_limited_resource(error=error)
+                )
+        logger.debug(
+            msg=f'Prefetched {len(self._prefetched)} features with GraphQL'
+        )
+        return super().get_row(features=features, logger=logger)
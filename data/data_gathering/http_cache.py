@@ -0,0 +1,145 @@
+from hashlib import sha256
+from json import dumps, loads
+from sqlite3 import connect
+from threading import Lock
+from time import time
+from typing import Dict, NamedTuple, Optional
+from zlib import compress, decompress
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: str
+
+
+class HttpCache:
+    """Persistent cache of GET responses validated by ETag / Last-Modified.
+
+    Responses are keyed by URL and a hash of the Authorization header, as
+    Github answers conditional requests only for the same credentials.
+    Bodies are stored compressed in an SQLite database, least recently used
+    responses are evicted once the bodies exceed max_size bytes.
+    """
+
+    def __init__(
+        self, file_name: str = ':memory:', max_size: int = 1024 ** 3
+    ) -> None:
+        self.file_name = file_name
+        self._lock = Lock()
+        self._max_size = max_size
+        self._open()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _open(self) -> None:
+        self._connection = connect(self.file_name, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses (' +
+            'key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, ' +
+            'status INTEGER, headers TEXT, body BLOB, size INTEGER, ' +
+            'used_at REAL)'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS responses_used_at ' +
+            'ON responses (used_at)'
+        )
+        self._connection.commit()
+        self._size = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses'
+        ).fetchone()[0]
+
+    def reopen(self) -> None:
+        """Opens the database again, once replaced by a downloaded one."""
+        with self._lock:
+            self._connection.close()
+            self._open()
+
+    @staticmethod
+    def key(url: str, authorization: Optional[str]) -> str:
+        credentials = sha256((authorization or '').encode()).hexdigest()
+        return f'{credentials}:{url}'
+
+    def validators(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT etag, last_modified FROM responses WHERE key = ?',
+                (key,)
+            ).fetchone()
+        if not row:
+            return {}
+        headers = {}
+        if row[0]:
+            headers['If-None-Match'] = row[0]
+        if row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT status, headers, body FROM responses WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if not row:
+                return None
+            self._connection.execute(
+                'UPDATE responses SET used_at = ? WHERE key = ?',
+                (time(), key)
+            )
+            self._connection.commit()
+            self.hits += 1
+        return CachedResponse(
+            status=row[0], headers=loads(row[1]),
+            body=decompress(row[2]).decode()
+        )
+
+    def put(
+        self, key: str, status: int, headers: Dict[str, str], body: str
+    ) -> None:
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+        with self._lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                return
+            compressed = compress(body.encode())
+            previous = self._connection.execute(
+                'SELECT size FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES ' +
+                '(?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    key, etag, last_modified, status, dumps(headers),
+                    compressed, len(compressed), time()
+                )
+            )
+            self._size += len(compressed) - (previous[0] if previous else 0)
+            if self._size > self._max_size:
+                self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        # evicts down to 90 % of the limit, not to evict on every write
+        rows = self._connection.execute(
+            'SELECT key, size FROM responses ORDER BY used_at'
+        )
+        keys = []
+        for key, size in rows:
+            if self._size <= self._max_size * 0.9:
+                break
+            keys.append((key,))
+            self._size -= size
+        self._connection.executemany(
+            'DELETE FROM responses WHERE key = ?', keys
+        )
+        self.evictions += len(keys)
+
+    def stats(self) -> str:
+        return (
+            f'HTTP cache hits: {self.hits}, misses: {self.misses}, ' +
+            f'evictions: {self.evictions}, size: {self._size} B'
+        )
@@ -1,6 +1,6 @@
 
 import logging
-from os.path import basename
+from os.path import basename, splitext
 
 
 def setup_logger(
@@ -30,3 +30,8 @@ def logger_file_name(logger: logging.Logger) -> str:
         if isinstance(handler, logging.FileHandler):
             return basename(handler.baseFilename)
     return ''
+
+
+def metrics_file_name(logger: logging.Logger) -> str:
+    """Returns the name of the metrics dump kept next to the log."""
+    return splitext(logger_file_name(logger=logger))[0] + '_metrics.json'
@@ -0,0 +1,198 @@
+from contextlib import contextmanager
+from hashlib import sha256
+from json import dump
+from os import replace
+from threading import local, Lock
+from time import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# labels of the requests made outside of any feature or repository
+_NONE = '-'
+_PERCENTILES = (50, 90, 99)
+# repositories listed in the dump, the others are only in the percentiles
+_TOP_REPOS = 100
+
+
+def token_label(authorization: Optional[str]) -> str:
+    """Returns a label of the token which does not reveal the token."""
+    if not authorization:
+        return 'anonymous'
+    return sha256(authorization.encode()).hexdigest()[:8]
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        f'p{p}': values[min(len(values) - 1, len(values) * p // 100)]
+        for p in _PERCENTILES
+    }
+
+
+class _Counts:
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.cache_hits = 0
+        self.retries = 0
+        self.pages_saved = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls, 'bytes': self.bytes,
+            'seconds': round(self.seconds, 3), 'cache_hits': self.cache_hits,
+            'retries': self.retries, 'pages_saved': self.pages_saved
+        }
+
+
+class Metrics:
+    """Counts API calls, bytes, time, cache hits, retries and saved pages.
+
+    Requests are attributed to the feature and repository of the scope
+    entered by the thread making them and to the token they are made
+    with. Calls of every feature computation are also kept, for the cost
+    percentiles in the summary.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._scope = local()
+        self._started = time()
+        self._repos_count = 0
+        self._total = _Counts()
+        self._by: Dict[str, Dict[str, _Counts]] = {
+            'feature': {}, 'repo': {}, 'token': {}
+        }
+        self._feature_costs: Dict[str, List[int]] = {}
+
+    def _labels(self) -> Dict[str, str]:
+        return {
+            'feature': getattr(self._scope, 'feature', _NONE),
+            'repo': getattr(self._scope, 'repo', _NONE)
+        }
+
+    def _counts(self, labels: Dict[str, str]) -> List[_Counts]:
+        # called with the lock held
+        return [self._total] + [
+            self._by[dimension].setdefault(label, _Counts())
+            for dimension, label in labels.items()
+        ]
+
+    @contextmanager
+    def scope(
+        self, feature: Optional[str] = None, repo: Optional[Any] = None
+    ) -> Iterator[None]:
+        """Attributes requests made by the thread within to the labels."""
+        previous = self._labels()
+        calls = getattr(self._scope, 'calls', 0)
+        if feature is not None:
+            self._scope.feature = feature
+            self._scope.calls = 0
+        if repo is not None:
+            self._scope.repo = str(repo)
+        try:
+            yield
+        finally:
+            if feature is not None:
+                with self._lock:
+                    self._feature_costs.setdefault(feature, []).append(
+                        self._scope.calls
+                    )
+                calls += self._scope.calls
+            self._scope.feature = previous['feature']
+            self._scope.repo = previous['repo']
+            self._scope.calls = calls
+
+    def record_request(
+        self, token: str, size: int, seconds: float, cache_hit: bool
+    ) -> None:
+        self._scope.calls = getattr(self._scope, 'calls', 0) + 1
+        with self._lock:
+            for counts in self._counts(
+                labels={**self._labels(), 'token': token}
+            ):
+                counts.calls += 1
+                counts.bytes += size
+                counts.seconds += seconds
+                counts.cache_hits += cache_hit
+
+    def record_retry(self, feature: Optional[str] = None) -> None:
+        labels = self._labels()
+        if feature is not None:
+            labels['feature'] = feature
+        with self._lock:
+            for counts in self._counts(labels=labels):
+                counts.retries += 1
+
+    def record_pages_saved(self, pages: int) -> None:
+        """Records pages of a list left unfetched past its window."""
+        with self._lock:
+            for counts in self._counts(labels=self._labels()):
+                counts.pages_saved += pages
+
+    def record_repo(self) -> None:
+        with self._lock:
+            self._repos_count += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            hours = max(time() - self._started, 1) / 3600
+            repo_calls = [
+                counts.calls for label, counts in self._by['repo'].items()
+                if label != _NONE
+            ]
+            return {
+                'repos': self._repos_count,
+                'repos_per_hour': round(self._repos_count / hours, 1),
+                'calls': self._total.calls,
+                'calls_per_repo': round(
+                    self._total.calls / max(self._repos_count, 1), 1
+                ),
+                'repo_calls': percentiles(values=repo_calls),
+                'feature_calls': {
+                    feature: percentiles(values=costs)
+                    for feature, costs in self._feature_costs.items()
+                }
+            }
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary = self.summary()
+        with self._lock:
+            repos = sorted(
+                (
+                    item for item in self._by['repo'].items()
+                    if item[0] != _NONE
+                ), key=lambda item: item[1].calls, reverse=True
+            )[:_TOP_REPOS]
+            return {
+                'summary': summary, 'total': self._total.to_dict(),
+                'feature': {
+                    label: counts.to_dict()
+                    for label, counts in self._by['feature'].items()
+                },
+                'token': {
+                    label: counts.to_dict()
+                    for label, counts in self._by['token'].items()
+                },
+                'top_repos': {
+                    label: counts.to_dict() for label, counts in repos
+                }
+            }
+
+    def dump(self, file_name: str) -> None:
+        temp_file_name = file_name + '.tmp'
+        with open(file=temp_file_name, mode='w') as f:
+            dump(self.to_dict(), f, indent=1)
+        replace(temp_file_name, file_name)
+
+    def stats(self) -> str:
+        summary = self.summary()
+        return (
+            f'Repos: {summary["repos"]}, per hour: ' +
+            f'{summary["repos_per_hour"]}, API calls: {summary["calls"]}, ' +
+            f'per repo: {summary["calls_per_repo"]}, feature calls: ' +
+            f'{summary["feature_calls"]}'
+        )
@@ -0,0 +1,68 @@
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Predicate:
+    """Check of a repository with its estimated cost in API calls.
+
+    The cost drops to zero once fetched reports the data needed by the
+    check as already fetched.
+    """
+
+    def __init__(
+        self, name: str, check: Callable[[Any], bool], cost: float,
+        fetched: Optional[Callable[[Any], bool]] = None
+    ) -> None:
+        self.name = name
+        self.check = check
+        self.cost = cost
+        self.fetched = fetched
+
+    def estimated_cost(self, repo_data: Any) -> float:
+        if self.fetched and self.fetched(repo_data):
+            return 0
+        return self.cost
+
+
+class Rule:
+    """Conjunction or disjunction of predicates evaluated cheapest first.
+
+    Evaluation stops at the first predicate deciding the result, that is
+    the first failing one when all predicates are required, the first
+    passing one otherwise. For every predicate, the rule counts how many
+    times it was evaluated and how many times it decided the result.
+    """
+
+    def __init__(
+        self, name: str, predicates: List[Predicate], require_all: bool = True
+    ) -> None:
+        self.name = name
+        self._predicates = predicates
+        self._require_all = require_all
+        self._lock = Lock()
+        self._evaluated: Dict[str, int] = {p.name: 0 for p in predicates}
+        self._decided: Dict[str, int] = {p.name: 0 for p in predicates}
+
+    def __call__(self, repo_data: Any) -> bool:
+        # the sort is stable, predicates of equal cost keep their order
+        predicates = sorted(
+            self._predicates,
+            key=lambda predicate: predicate.estimated_cost(repo_data)
+        )
+        for predicate in predicates:
+            result = bool(predicate.check(repo_data))
+            with self._lock:
+                self._evaluated[predicate.name] += 1
+                if result != self._require_all:
+                    self._decided[predicate.name] += 1
+            if result != self._require_all:
+                return result
+        return self._require_all
+
+    def stats(self) -> str:
+        with self._lock:
+            counts = [
+                f'{name}: {self._decided[name]} / {self._evaluated[name]}'
+                for name in self._evaluated
+            ]
+        return f'{self.name} decided / evaluated: ' + ', '.join(counts)
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlite3 import connect
+from threading import Lock
+from time import time
+from typing import NamedTuple, Optional
+
+from github.NamedUser import NamedUser
+
+
+class Profile(NamedTuple):
+    created_at: datetime
+    followers: int
+    following: int
+    public_repos: int
+
+
+class ProfileCache:
+    """Cache of Github account profiles keyed by login.
+
+    Recently used profiles are kept in memory, all of them are persisted in
+    an SQLite database, so the cache survives restarts and may be shared by
+    several processes. Profiles older than ttl are fetched again, when the
+    database holds more than max_size profiles, the least recently used
+    ones are evicted.
+    """
+
+    def __init__(
+        self, file_name: str = ':memory:', max_size: int = 100000,
+        ttl: timedelta = timedelta(days=30), memory_size: int = 10000
+    ) -> None:
+        self._connection = connect(file_name, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS profiles (' +
+            'login TEXT PRIMARY KEY, created_at TEXT, followers INTEGER, ' +
+            'following INTEGER, public_repos INTEGER, fetched_at REAL, ' +
+            'used_at REAL)'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS profiles_used_at ON profiles (used_at)'
+        )
+        self._connection.commit()
+        self._lock = Lock()
+        self._memory: OrderedDict = OrderedDict()
+        self._max_size = max_size
+        self._memory_size = min(memory_size, max_size)
+        self._ttl = ttl.total_seconds()
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user: NamedUser) -> Profile:
+        login = user.login
+        with self._lock:
+            profile = self._get_cached(login=login)
+            if profile:
+                self.hits += 1
+                return profile
+            self.misses += 1
+
+        # lazily completes the user, which costs one API call
+        profile = Profile(
+            created_at=user.created_at, followers=user.followers,
+            following=user.following, public_repos=user.public_repos or 0
+        )
+        with self._lock:
+            self._put(login=login, profile=profile)
+        return profile
+
+    def _get_cached(self, login: str) -> Optional[Profile]:
+        now = time()
+        if login in self._memory:
+            fetched_at, profile = self._memory[login]
+            if now - fetched_at < self._ttl:
+                self._memory.move_to_end(login)
+                return profile
+            del self._memory[login]
+
+        row = self._connection.execute(
+            'SELECT created_at, followers, following, public_repos, ' +
+            'fetched_at FROM profiles WHERE login = ?', (login,)
+        ).fetchone()
+        if not row or now - row[4] >= self._ttl:
+            return None
+
+        profile = Profile(
+            created_at=datetime.fromisoformat(row[0]), followers=row[1],
+            following=row[2], public_repos=row[3]
+        )
+        self._connection.execute(
+            'UPDATE profiles SET used_at = ? WHERE login = ?', (now, login)
+        )
+        self._connection.commit()
+        self._remember(login=login, fetched_at=row[4], profile=profile)
+        return profile
+
+    def _remember(
+        self, login: str, fetched_at: float, profile: Profile
+    ) -> None:
+        self._memory[login] = (fetched_at, profile)
+        self._memory.move_to_end(login)
+        while len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
+    def _put(self, login: str, profile: Profile) -> None:
+        now = time()
+        self._connection.execute(
+            'INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                login, profile.created_at.isoformat(), profile.followers,
+                profile.following, profile.public_repos, now, now
+            )
+        )
+        self._writes += 1
+        # counting rows on every write would be wasteful
+        if self._writes % 100 == 0:
+            self._evict()
+        self._connection.commit()
+        self._remember(login=login, fetched_at=now, profile=profile)
+
+    def _evict(self) -> None:
+        self._connection.execute(
+            'DELETE FROM profiles WHERE login IN (SELECT login FROM ' +
+            'profiles ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+            (self._max_size,)
+        )
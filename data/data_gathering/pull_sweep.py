@@ -0,0 +1,49 @@
+from datetime import datetime
+from math import ceil
+from typing import Iterable
+
+from github.PullRequest import PullRequest
+
+
+class PullSweep:
+    """Counts and wealth of the pulls created in a window, from one pass.
+
+    Pulls created after until are not counted, but they add to the wealth,
+    which is bounded by since only. Merges are told by merged_at of the
+    list payload, the merged attribute would fetch every pull.
+    """
+
+    def __init__(
+        self, pulls: Iterable[PullRequest], until: datetime, since: datetime
+    ) -> None:
+        self.until = until
+        self.since = since
+        self.open = 0
+        self.closed = 0
+        self.merged = 0
+        self.wealth = 0.0
+        for pull in pulls:
+            if pull.created_at > since:
+                self._add(pull=pull)
+
+    def _add(self, pull: PullRequest) -> None:
+        if pull.state == 'closed':
+            days_to_close = (pull.closed_at - pull.created_at).days
+            self.wealth += 1 / ceil(max(days_to_close, 1) / 30)
+        if pull.created_at >= self.until:
+            return
+        if pull.state == 'open':
+            self.open += 1
+        else:
+            self.closed += 1
+        if pull.merged_at is not None:
+            self.merged += 1
+
+    def count(self, state: str) -> int:
+        if state == 'open':
+            return self.open
+        elif state == 'closed':
+            return self.closed
+        elif state == 'merged':
+            return self.merged
+        raise ValueError('Wrong value for state')
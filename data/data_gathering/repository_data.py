@@ -1,74 +1,182 @@
 
 from datetime import datetime, timedelta
 from logging import Logger
-from math import ceil
-from os import path
-from re import compile
-from typing import Any, List, Optional, Set, Tuple
-from yaml import safe_load
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from dateutil.relativedelta import relativedelta
 from github import Github
 from github.GithubException import (
     RateLimitExceededException, UnknownObjectException
 )
+from github.Commit import Commit
+from github.ContentFile import ContentFile
+from github.GitRelease import GitRelease
+from github.Issue import Issue
 from github.NamedUser import NamedUser
+from github.PullRequest import PullRequest
 from github.Repository import Repository
 
+from data_gathering import METRICS, TOKEN_POOL
+from .classification import is_programming_language
+from .author_timeline import AuthorTimeline
+from .cassette import current_datetime
+from .commit_store import CommitStore
+from .contributor_stats import fetch_contributor_stats
 from .enums import AccountType
-from .waiting import get_git_instance
-
-
-COMMIT_LAST_MODIFIED_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
+from .feature_plan import FeaturePlan, Source
+from .predicates import Predicate, Rule
+from .profile_cache import Profile, ProfileCache
+from .pull_sweep import PullSweep
+from .tree_index import TreeIndex
+from .windowed_list import WindowedList
+from .token_pool import rate_limited_resource, TokenPool
+
+
+COULD_NOT_COMPUTE = 'Could not compute'
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+# lists fetched newest first by creation down to the window start, the
+# releases are listed in that order without any parameter
+_WINDOWED_LISTS = {
+    'pulls': (
+        PullRequest, 'pulls',
+        {'state': 'all', 'sort': 'created', 'direction': 'desc'}
+    ),
+    'issues': (
+        Issue, 'issues',
+        {'state': 'all', 'sort': 'created', 'direction': 'desc'}
+    ),
+    'releases': (GitRelease, 'releases', {})
+}
 
 
 class RepositoryData:
-
-    def __init__(self, git: Optional[Github] = None) -> None:
+    # rate limit resource the instances are leased by
+    _resource = 'core'
+
+    def __init__(
+        self, git: Optional[Github] = None,
+        profile_cache: Optional[ProfileCache] = None,
+        token_pool: Optional[TokenPool] = None,
+        contributor_stats: bool = False
+    ) -> None:
+        self._pool = token_pool if token_pool else TOKEN_POOL
+        # an instance given by the caller is used for all repositories,
+        # otherwise one is leased from the pool for every repository
+        self._leased = not git
         if git:
             self._git: Github = git
         else:
-            self._git: Github = get_git_instance()
+            self._git: Github = self._pool.lease(resource=self._resource)
 
         self._repo: Optional[Repository] = None
-
-        self._files = None
-        self._dirs = None
+        self._profiles = profile_cache if profile_cache else ProfileCache()
+
+        self._tree: Optional[TreeIndex] = None
+        self._commits: Optional[CommitStore] = None
+        self._timeline: Optional[AuthorTimeline] = None
+        # author features are answered by the statistics when available
+        self._use_stats = contributor_stats
+        self._stats: Any = None
+        self._head_datetime: Optional[datetime] = None
+        self._tail_datetime: Optional[datetime] = None
+        self._contributors: Optional[List[NamedUser]] = None
+        self._readme: Any = None
+        # windowed lists by name with the start of the fetched window
+        self._windowed: Dict[str, Tuple[datetime, List[Any]]] = {}
+        self._pull_sweeps: Dict[Tuple[datetime, datetime], PullSweep] = {}
+        self._branches_count: Optional[int] = None
+        self._languages: Optional[Dict[str, int]] = None
 
     def set_repo(
         self, repo_name_or_id: str = None, repo: Repository = None
     ) -> None:
         if repo_name_or_id:
+            if self._leased:
+                self._pool.release(git=self._git)
+                self._git = self._pool.lease(resource=self._resource)
             self._repo = self._git.get_repo(full_name_or_id=repo_name_or_id)
         if repo:
             self._repo = repo
 
-        self._files = None
-        self._dirs = None
+        self._tree = None
+        self._commits = None
+        self._timeline = None
+        self._stats = None
+        self._head_datetime = None
+        self._tail_datetime = None
+        self._contributors = None
+        self._readme = None
+        self._windowed = {}
+        self._pull_sweeps = {}
+        self._branches_count = None
+        self._languages = None
+
+    def renew_git(
+        self, logger: Optional[Logger] = None, resource: str = 'core'
+    ) -> None:
+        """Replaces the instance that exceeded its rate limit.
 
-    def pulls_count(
-        self, until: Optional[datetime] = None, days: int = 730,
-        state: str = 'open'
-    ) -> int:
-        if state == 'open' or state == 'closed':
-            pulls = self._repo.get_pulls(state=state)
-        elif state == 'merged':
-            pulls = [
-                pull for pull in self._repo.get_pulls(state='all')
-                if pull.merged
-            ]
-        else:
-            raise ValueError('Wrong value for state')
+        The repository is fetched again, so that the following requests are
+        made with the new instance.
+        """
+        self._git = self._pool.renew(
+            git=self._git, logger=logger, resource=resource
+        )
+        self._leased = True
+        if self._repo:
+            self._repo = self._git.get_repo(full_name_or_id=self._repo.id)
+
+    def _get_commits(self) -> CommitStore:
+        if self._commits is None:
+            self._commits = CommitStore.from_repo(repo=self._repo)
+        return self._commits
+
+    def _window_since(self, days: int = 730) -> datetime:
+        return self.threshold_datetime(
+            until=self.last_commit_datetime(), days=days
+        )
+
+    def _get_windowed(self, name: str, since: datetime) -> List[Any]:
+        """Returns items of the windowed list created after since.
+
+        The listing stops at since, a later call reaching further back
+        lists the items again.
+        """
+        if name not in self._windowed or self._windowed[name][0] > since:
+            content_class, list_path, params = _WINDOWED_LISTS[name]
+            windowed_list = WindowedList(
+                requester=self._repo._requester, content_class=content_class,
+                url=f'{self._repo.url}/{list_path}', params=params
+            )
+            self._windowed[name] = (
+                since, windowed_list.fetch(since=since)
+            )
+            METRICS.record_pages_saved(pages=windowed_list.saved_pages)
+        return [
+            item for item in self._windowed[name][1]
+            if item.created_at > since
+        ]
 
-        counter = 0
+    def _sweep_pulls(
+        self, until: Optional[datetime] = None, days: int = 730
+    ) -> PullSweep:
         if not until:
             until = self.last_commit_datetime()
         since = self.threshold_datetime(until=until, days=days)
+        if (until, since) not in self._pull_sweeps:
+            self._pull_sweeps[(until, since)] = PullSweep(
+                pulls=self._get_windowed(name='pulls', since=since),
+                until=until, since=since
+            )
+        return self._pull_sweeps[(until, since)]
 
-        for pull in pulls:
-            if until > pull.created_at > since:
-                counter += 1
-        return counter
+    def pulls_count(
+        self, until: Optional[datetime] = None, days: int = 730,
+        state: str = 'open'
+    ) -> int:
+        if state not in ('open', 'closed', 'merged'):
+            raise ValueError('Wrong value for state')
+        return self._sweep_pulls(until=until, days=days).count(state=state)
 
     def pulls_count_open(
         self, until: Optional[datetime] = None, days: int = 730,
@@ -84,20 +192,17 @@ class RepositoryData:
         self, until: Optional[datetime] = None, days: int = 730,
         state: str = 'open'
     ) -> int:
-        if state == 'open' or state == 'closed':
-            issues = self._repo.get_issues(state=state)
-        else:
+        if state != 'open' and state != 'closed':
             raise ValueError('Wrong value for state')
 
-        counter = 0
         if not until:
             until = self.last_commit_datetime()
         since = self.threshold_datetime(until=until, days=days)
 
-        for issue in issues:
-            if until > issue.created_at > since:
-                counter += 1
-        return counter
+        return sum(
+            1 for issue in self._get_windowed(name='issues', since=since)
+            if until > issue.created_at and issue.state == state
+        )
 
     def issues_count_open(
         self, until: Optional[datetime] = None, days: int = 730,
@@ -109,48 +214,156 @@ class RepositoryData:
     ) -> int:
         return self.issues_count(state='closed', until=until, days=days)
 
+    def _count(
+        self, list_path: str, params: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """Returns the number of items of a list in a single request."""
+        return WindowedList(
+            requester=self._repo._requester, content_class=None,
+            url=f'{self._repo.url}/{list_path}', params=params
+        ).count()
+
+    def _count_commits(self, since: datetime, until: datetime) -> int:
+        return self._count(list_path='commits', params={
+            'since': since.strftime(_DATETIME_FORMAT),
+            'until': until.strftime(_DATETIME_FORMAT)
+        })
+
+    def _fetch_commit_ends(self) -> None:
+        """Fetches the newest and the oldest commit on the default branch."""
+        head, tail = WindowedList(
+            requester=self._repo._requester, content_class=Commit,
+            url=f'{self._repo.url}/commits', per_page=1
+        ).ends()
+        if head is None:
+            raise ValueError('Repository has no commits')
+        self._head_datetime = head.commit.committer.date
+        self._tail_datetime = tail.commit.committer.date
+
+    def _tail_commit_datetime(self) -> datetime:
+        """Returns the date of the oldest commit on the default branch."""
+        if self._tail_datetime is None:
+            self._fetch_commit_ends()
+        return self._tail_datetime
+
+    def _head_commit_datetime(self) -> datetime:
+        """Returns the date of the newest commit on the default branch."""
+        if self._head_datetime is None:
+            head = WindowedList(
+                requester=self._repo._requester, content_class=Commit,
+                url=f'{self._repo.url}/commits', per_page=1
+            ).first()
+            if head is None:
+                raise ValueError('Repository has no commits')
+            self._head_datetime = head.commit.committer.date
+        return self._head_datetime
+
+    def _get_timeline(self) -> AuthorTimeline:
+        if self._timeline is None:
+            self._timeline = AuthorTimeline.from_commits(
+                commits=self._get_commits()
+            )
+        return self._timeline
+
+    def _get_authors(self) -> AuthorTimeline:
+        """Returns the timeline of the author features.
+
+        The contributors statistics are used if enabled, available and the
+        history was not fetched anyway. They tell authors by login, so the
+        features are not the same as those of the history, see
+        fetch_contributor_stats.
+        """
+        if self._commits is None and self._use_stats:
+            if self._stats is None:
+                # False marks statistics that are not available
+                self._stats = fetch_contributor_stats(repo=self._repo) or False
+            if self._stats:
+                return self._stats
+        return self._get_timeline()
+
+    def _authors_until(self) -> datetime:
+        if self._commits is None and self._stats:
+            return self._head_commit_datetime()
+        return self.last_commit_datetime()
+
     def commits_count(
             self, until: Optional[datetime] = None, days: int = 730
     ) -> int:
+        # without the fetched history, the window is counted on its own
+        if self._commits is None:
+            if not until:
+                until = self._head_commit_datetime()
+            since = self.threshold_datetime(until=until, days=days)
+            return self._count_commits(since=since, until=until)
+
         if not until:
             until = self.last_commit_datetime()
         since = self.threshold_datetime(until=until, days=days)
-        return len(list(self._repo.get_commits(until=until, since=since)))
+        return self._commits.count(until=until, since=since)
 
     def branches_count(self) -> int:
-        return len(list(self._repo.get_branches()))
+        if self._branches_count is None:
+            self._branches_count = self._count(list_path='branches')
+        return self._branches_count
 
     def releases_count(
         self, until: Optional[datetime] = None, days: int = 730
     ) -> int:
-        releases = self._repo.get_releases()
-
         if not until:
             until = self.last_commit_datetime()
         since = self.threshold_datetime(until=until, days=days)
 
-        counter = 0
-        for release in releases:
-            if until > release.created_at > since:
-                counter += 1
-        return counter
+        return sum(
+            1 for release in self._get_windowed(name='releases', since=since)
+            if until > release.created_at
+        )
 
     def last_commit_datetime(self) -> datetime:
-        return datetime.strptime(
-            self._repo.get_commits()[0].last_modified,
-            COMMIT_LAST_MODIFIED_FORMAT
+        return self._get_timeline().last_datetime()
+
+    def known_last_commit_datetime(self) -> Optional[datetime]:
+        """Returns the last commit datetime only if no request is needed."""
+        if self._commits is None or not len(self._commits):
+            return None
+        return self._get_timeline().last_datetime()
+
+    def commits_count_delta(
+        self, previous_count: int, previous_until: datetime, days: int = 730
+    ) -> int:
+        """Updates commits_count computed when the last commit was older.
+
+        Only the commits entering and leaving the window since then are
+        counted, unless the whole history was already fetched.
+        """
+        if self._commits is not None:
+            return self.commits_count(days=days)
+
+        until = self._head_commit_datetime()
+        if until <= previous_until:
+            return previous_count
+        since = self.threshold_datetime(until=until, days=days)
+        previous_since = self.threshold_datetime(
+            until=previous_until, days=days
+        )
+        second = timedelta(seconds=1)
+        if since > previous_until:
+            return self._count_commits(since=since, until=until)
+
+        added = self._count_commits(
+            since=previous_until + second, until=until
+        )
+        removed = self._count_commits(
+            since=previous_since, until=since - second
         )
+        return previous_count + added - removed
 
     def last_commit_age(self) -> int:
         return (
-            datetime.now().date() - self.last_commit_datetime().date()
+            current_datetime().date() - self.last_commit_datetime().date()
         ).days
 
     def first_commit_datetime(self) -> datetime:
-        return datetime.strptime(
-            self._repo.get_commits().reversed[0].last_modified,
-            COMMIT_LAST_MODIFIED_FORMAT
-        )
+        return self._get_timeline().first_datetime()
 
     @classmethod
     def threshold_datetime(cls, until: datetime, days: int) -> datetime:
@@ -174,15 +387,29 @@ class RepositoryData:
     def stargazers_count(self) -> int:
         return self._repo.stargazers_count
 
+    def _owner_profile(self) -> Profile:
+        return self._profiles.get(user=self._repo.owner)
+
+    def _get_contributors(self) -> List[NamedUser]:
+        if self._contributors is None:
+            self._contributors = list(self._repo.get_contributors())
+        return self._contributors
+
+    def _contributor_profiles(self) -> List[Profile]:
+        return [
+            self._profiles.get(user=contributor)
+            for contributor in self._get_contributors()
+        ]
+
     def owner_account_age(self) -> int:
-        return self.datetime_to_days(dtime=self._repo.owner.created_at)
+        return self.datetime_to_days(dtime=self._owner_profile().created_at)
 
     @staticmethod
     def datetime_to_days(dtime: datetime) -> int:
-        return (datetime.now() - dtime).days
+        return (current_datetime() - dtime).days
 
     def avg_dev_account_age(self) -> float:
-        contributors = list(self._repo.get_contributors())
+        contributors = self._contributor_profiles()
         collective_age = 0
         for contributor in contributors:
             collective_age += self.datetime_to_days(
@@ -196,94 +423,45 @@ class RepositoryData:
         else:
             return collective_age / contributors_count
 
-    @staticmethod
-    def _filter_dirs(dirs: List[str]) -> List[str]:
-        with open('configs/vendor.yml', 'r') as vendor_file:
-            vendor_regexes = safe_load(vendor_file)
-        regexes = [compile(regex) for regex in vendor_regexes]
-        for dir_name in dirs:
-            if any([rgx.match(dir_name) for rgx in regexes]):
-                dirs.remove(dir_name)
-        return dirs
-
-    def _get_dirs(self) -> List[str]:
-        dirs = self._filter_dirs(dirs=[
-            dir_name.path for dir_name in self._repo.get_contents(path='')
-            if dir_name.type == 'dir'
-        ])
-        if len(dirs) == 0:
-            return dirs
-
-        i = 0
-        while i < len(dirs):
-            subdirs = self._filter_dirs(dirs=[
-                dir_name.path for dir_name in self._repo.get_contents(
-                    path=dirs[i]
-                )
-                if dir_name.type == 'dir'
-            ])
-            dirs += subdirs
-            i += 1
-
-        if not self._dirs:
-            self._dirs = dirs
-
-        return dirs
-
-    def _get_files(self) -> List[str]:
-        files = []
-        for dir_name in self._get_dirs():
-            files.extend([
-                file.path for file in self._repo.get_contents(path=dir_name)
-                if file.type == 'file'
-            ])
-
-        if not self._files:
-            self._files = files
-
-        return files
-
-    def _has_file(self, file_names: List[str]) -> bool:
-        if not self._files:
-            files = [path.basename(file) for file in self._get_dirs()]
-        else:
-            files = self._files
-
-        for file in file_names:
-            if file.lower() in files:
-                return True
-        return False
+    def _get_tree(self) -> TreeIndex:
+        if self._tree is None:
+            self._tree = TreeIndex.from_repo(repo=self._repo)
+        return self._tree
 
     def has_test(self) -> bool:
-        return self._has_file(file_names=['test', 'tests', 't', 'spec'])
+        return self._get_tree().has_dir(names=['test', 'tests', 't', 'spec'])
 
     def has_doc(self) -> bool:
-        return self._has_file(
-            file_names=['doc', 'docs', 'document', 'documents']
+        return self._get_tree().has_dir(
+            names=['doc', 'docs', 'document', 'documents']
         )
 
     def has_example(self) -> bool:
-        return self._has_file(file_names=['example', 'examples'])
+        return self._get_tree().has_dir(names=['example', 'examples'])
+
+    def _get_readme(self) -> Optional[ContentFile]:
+        # False marks a repository known to have no readme
+        if self._readme is None:
+            try:
+                self._readme = self._repo.get_readme()
+            except UnknownObjectException:
+                self._readme = False
+        return self._readme or None
 
     def has_readme(self) -> bool:
-        try:
-            self._repo.get_readme()
-            return True
-        except UnknownObjectException:
-            return False
+        return self._get_readme() is not None
 
     def owner_projects_count(self) -> int:
-        repos = self._repo.owner.public_repos
-        return repos if repos else 0
+        return self._owner_profile().public_repos
 
     def owner_following(self) -> int:
-        return self._repo.owner.following
+        return self._owner_profile().following
 
     def owner_followers(self) -> int:
-        return self._repo.owner.followers
+        return self._owner_profile().followers
 
     def devs_followers_avg(self) -> float:
-        contributors = list(self._repo.get_contributors())
+        contributors = self._contributor_profiles()
         count = 0
         for contributor in contributors:
             count += contributor.followers
@@ -294,7 +472,7 @@ class RepositoryData:
             return count / contributors_count
 
     def devs_following_avg(self) -> float:
-        contributors = list(self._repo.get_contributors())
+        contributors = self._contributor_profiles()
         count = 0
         for contributor in contributors:
             count += contributor.following
@@ -305,41 +483,21 @@ class RepositoryData:
             return count / contributors_count
 
     def commits_by_dev_with_most_commits(self) -> int:
-        commits = self._repo.get_commits()
-        contr_dict = {}
-        for commit in commits:
-            name = commit.commit.author.name
-            if name in contr_dict:
-                contr_dict[name] += 1
-            else:
-                contr_dict[name] = 1
-
-        max_contriburor = max(contr_dict, key=contr_dict.get)
-        return contr_dict[max_contriburor]
+        _, commits_count = self._get_authors().most_commits_by_name()
+        return commits_count
 
     def _contributors_divided(
         self, threshold: int = 730
     ) -> Tuple[Set[str], Set[str]]:
-        until = self.last_commit_datetime()
+        authors = self._get_authors()
         threshold_datetime = self.threshold_datetime(
-            until=until, days=threshold
+            until=self._authors_until(), days=threshold
         )
 
-        commits_before = self._repo.get_commits(until=threshold_datetime)
-        commits_after = self._repo.get_commits(since=threshold_datetime)
-
-        contributors_old = set()
-        contributors_new = set()
-
-        for commit in commits_before:
-            name = commit.commit.author.name
-            if name not in contributors_old:
-                contributors_old.add(name)
-
-        for commit in commits_after:
-            name = commit.commit.author.name
-            if name not in contributors_old:
-                contributors_new.add(name)
+        contributors_old = authors.names_joined(until=threshold_datetime)
+        contributors_new = authors.names_active(
+            since=threshold_datetime
+        ) - contributors_old
 
         return contributors_new, contributors_old
 
@@ -351,7 +509,7 @@ class RepositoryData:
 
     @staticmethod
     def _days_to_datetime(days: int):
-        date = datetime.now().date() - timedelta(days=days)
+        date = current_datetime().date() - timedelta(days=days)
         return datetime.combine(date, datetime.min.time())
 
     def stickiness(
@@ -359,15 +517,12 @@ class RepositoryData:
     ) -> float:
         new, _ = self._contributors_divided(threshold=new_threshold)
 
-        until = self.last_commit_datetime()
-        since = self.threshold_datetime(until=until, days=sticky_threshold)
-        commits_after = self._repo.get_commits(since=since)
-
-        contributors_sticked = set()
-
-        for commit in commits_after:
-            if commit.author and commit.author.login not in new:
-                contributors_sticked.add(commit.author.login)
+        since = self.threshold_datetime(
+            until=self._authors_until(), days=sticky_threshold
+        )
+        contributors_sticked = self._get_authors().logins_active(
+            since=since
+        ) - new
 
         new_contributors_count = len(new)
         if new_contributors_count == 0:
@@ -378,31 +533,12 @@ class RepositoryData:
     def _contributor_joined_datetime(
             self, contributor: NamedUser
     ) -> Optional[datetime]:
-        commits = self._repo.get_commits()
-        for commit in commits.reversed:
-            if commit.author == contributor:
-                return commit.commit.author.date
-        return None
+        return self._get_timeline().joined(login=contributor.login)
 
     def wealth(
         self, until: Optional[datetime] = None, days: int = 730,
     ) -> float:
-        if not until:
-            until = self.last_commit_datetime()
-        threshold_date = self.threshold_datetime(until=until, days=days)
-
-        prs = self._repo.get_pulls(state='closed')
-        relevant_prs = [pr for pr in prs if pr.created_at > threshold_date]
-        wealth = 0.0
-        for pr in relevant_prs:
-            days_to_close = (pr.closed_at - pr.created_at).days
-            if days_to_close == 0:
-                days_to_close = 1
-            months_to_close = ceil(days_to_close / 30)
-            if months_to_close == 0:
-                return 0
-            wealth += 1 / months_to_close
-        return wealth
+        return self._sweep_pulls(until=until, days=days).wealth
 
     def unmaintained_in_readme(self) -> bool:
         keywords_list = [
@@ -411,86 +547,94 @@ class RepositoryData:
             'not maintained', 'not under development', 'obsolete', 'archived'
         ]
         if self.has_readme():
-            readme = self._repo.get_readme().decoded_content.decode("utf-8")
+            readme = self._get_readme().decoded_content.decode("utf-8")
             return any(keyword in readme for keyword in keywords_list)
 
-    def in_programming_language(self) -> bool:
-        repo_languages = self._repo.get_languages()
-        with open(
-            'configs/languages.yml', 'r'
-        ) as languages_file:
-            all_languages = safe_load(languages_file)
+    def _get_languages(self) -> Dict[str, int]:
+        if self._languages is None:
+            self._languages = self._repo.get_languages()
+        return self._languages
 
-        for repo_language in repo_languages:
-            try:
-                if all_languages[repo_language]['type'] == 'programming':
-                    return True
-            except KeyError:
-                for language in all_languages:
-                    if 'aliases' in all_languages[language]:
-                        for alias in all_languages[language]['aliases']:
-                            if (
-                                alias == repo_language.lower() and
-                                all_languages[language][
-                                    'type'
-                                ] == 'programming'
-                            ):
-                                return True
-            return False
+    def in_programming_language(self) -> bool:
+        # only the language with the most bytes is considered
+        for repo_language in self._get_languages():
+            return is_programming_language(name=repo_language)
+        return False
 
     def incorrectly_migrated(self) -> bool:
-        commits = list(self._repo.get_commits())
+        commits = self._get_commits()
         if len(commits) < 20:
             raise ValueError('Insufficient number of commits')
 
-        files = self._get_files()
+        files = set(self._get_tree().files)
         original_size = len(files)
 
         for i in range(20):
-            for file in commits[i].files:
+            for file in self._repo.get_commit(sha=commits.shas[i]).files:
                 if file.status == 'added':
-                    if file.filename in files:
-                        files.remove(file.filename)
+                    files.discard(file.filename)
 
         new_size = len(files)
         return new_size < (original_size / 2)
 
+    def pushed_at(self) -> datetime:
+        return self._repo.pushed_at
+
+    def updated_at(self) -> datetime:
+        return self._repo.updated_at
+
     def archived(self) -> bool:
         return self._repo.archived
 
     def commit_in_days(self, days: int = 730) -> bool:
-        now = datetime.now()
+        now = current_datetime()
         threshold_date = self.threshold_datetime(until=now, days=days)
-        commits = list(self._repo.get_commits(since=threshold_date))
-        return bool(len(commits))
+        if self._commits is not None:
+            return self._get_timeline().last_datetime() >= threshold_date
+        # a single commit since the threshold answers the question
+        commits = WindowedList(
+            requester=self._repo._requester, content_class=Commit,
+            url=f'{self._repo.url}/commits', per_page=1,
+            params={'since': threshold_date.strftime(_DATETIME_FORMAT)}
+        )
+        found = commits.first() is not None
+        METRICS.record_pages_saved(pages=commits.saved_pages)
+        return found
 
     def development_time(self) -> int:
+        if self._commits is None:
+            # the newest and the oldest commits answer it without the
+            # history, both are fetched along with the oldest
+            first = self._tail_commit_datetime()
+            return (self._head_commit_datetime() - first).days
         return (
             self.last_commit_datetime() - self.first_commit_datetime()
         ).days
 
+    def maybe_suitable(self) -> bool:
+        """Screens the repository by its fetched fields without API calls.
+
+        Empty repositories, forks and repositories whose main language is
+        not a programming one cannot be suitable. Those passing are
+        checked by their languages in in_programming_language. Archived
+        repositories are kept, they are told unmaintained by the flag.
+        """
+        return (
+            self._repo.pushed_at is not None and
+            self._repo.size != 0 and
+            not self._repo.fork and
+            self._repo.language is not None and
+            is_programming_language(name=self._repo.language)
+        )
+
     def suitable(self) -> bool:
         try:
-            if (
-                self.development_time() < 730 or
-                not self.in_programming_language()
-            ):
-                return False
-            else:
-                return True
+            return SUITABLE_RULE(repo_data=self)
         except ValueError:
             return False
 
     def unmaintained(self) -> bool:
-        if (
-            'dotfile' in self.repo_name() or
-            self.archived() or
-            self.unmaintained_in_readme() or
-            not self.commit_in_days(days=365)
-        ):
-            return True
-        else:
-            return False
+        return UNMAINTAINED_RULE(repo_data=self)
 
     def repo_name(self) -> str:
         return self._repo.full_name
@@ -498,36 +642,215 @@ class RepositoryData:
     def url(self) -> str:
         return self._repo.html_url
 
+    def _compute_feature(self, feature: str) -> Any:
+        return getattr(self, feature)()
+
+    def _source_features(self, features: List[str]) -> List[str]:
+        """Returns the features computed from the planned sources."""
+        return features
+
     def get_row(self, features: List[str], logger: Logger) -> List[Any]:
+        # the sources shared by the features are fetched first, each once
+        sources = FEATURE_PLAN.sources(
+            features=self._source_features(features=features)
+        )
+        logger.debug(
+            msg='Planned sources: ' +
+                ', '.join(source.name for source in sources)
+        )
+        steps = [(source.name, True) for source in sources]
+        steps += [(feature, False) for feature in features]
+
         row = []
         features_len = len(features)
-        feature_index = 0
+        step_index = 0
         rate_limit_exceeded = False
-        while feature_index < features_len:
+        while step_index < len(steps):
+            name, is_source = steps[step_index]
             try:
-                row.append(getattr(self, features[feature_index])())
-
-                logger.info(
-                    msg=f'Computed {feature_index + 1} / {features_len} ' +
-                    f'feature: {features[feature_index]}'
-                )
+                if is_source:
+                    with METRICS.scope(feature=f'source:{name}'):
+                        sources[step_index].fetch(self)
+                    logger.debug(msg=f'Fetched source: {name}')
+                else:
+                    with METRICS.scope(feature=name):
+                        row.append(self._compute_feature(feature=name))
+                    logger.info(
+                        msg=f'Computed {len(row)} / {features_len} ' +
+                        f'feature: {name}'
+                    )
                 rate_limit_exceeded = False
-                feature_index += 1
-            except RateLimitExceededException:
+                step_index += 1
+            except RateLimitExceededException as error:
+                METRICS.record_retry(
+                    feature=f'source:{name}' if is_source else name
+                )
                 if not rate_limit_exceeded:
                     rate_limit_exceeded = True
                     logger.debug(msg='Rate limit exceeded for the first time')
+                elif is_source:
+                    # the features needing the source fetch it on their own
+                    logger.info(msg=f'Source is too big to fetch: {name}')
+                    step_index += 1
                 else:
-                    logger.info(
-                        msg='Feature is too big to compute: ' +
-                            features[feature_index]
-                    )
-                    row.append('Could not compute')
-                    feature_index += 1
+                    logger.info(msg=f'Feature is too big to compute: {name}')
+                    row.append(COULD_NOT_COMPUTE)
+                    step_index += 1
 
                 logger.info(msg='Github API rate limit reached')
-                self._git = get_git_instance(
-                    number_of_attempts=10, logger=logger
+                self.renew_git(
+                    logger=logger, resource=rate_limited_resource(error=error)
                 )
                 continue
         return row
+
+
+# estimated API calls, the commit history takes a call per 100 commits,
+# which is not known before fetching, so it is ranked after the other
+# sources
+_COMMITS_COST = 5
+# the newest commit and the last page of the commits listed one per page
+_COMMIT_ENDS_COST = 2
+
+
+def _commits_fetched(repo_data: RepositoryData) -> bool:
+    return repo_data._commits is not None
+
+
+def _commit_ends_fetched(repo_data: RepositoryData) -> bool:
+    return (
+        repo_data._commits is not None or
+        repo_data._tail_datetime is not None
+    )
+
+
+def _readme_fetched(repo_data: RepositoryData) -> bool:
+    return repo_data._readme is not None
+
+
+SUITABLE_RULE = Rule(
+    name='suitable', require_all=True, predicates=[
+        Predicate(
+            name='maybe_suitable', cost=0,
+            check=lambda repo_data: repo_data.maybe_suitable()
+        ),
+        Predicate(
+            name='in_programming_language', cost=1,
+            check=lambda repo_data: repo_data.in_programming_language()
+        ),
+        Predicate(
+            name='development_time', cost=_COMMIT_ENDS_COST,
+            check=lambda repo_data: repo_data.development_time() >= 730,
+            fetched=_commit_ends_fetched
+        )
+    ]
+)
+
+UNMAINTAINED_RULE = Rule(
+    name='unmaintained', require_all=False, predicates=[
+        Predicate(
+            name='dotfile', cost=0,
+            check=lambda repo_data: 'dotfile' in repo_data.repo_name()
+        ),
+        Predicate(
+            name='archived', cost=0,
+            check=lambda repo_data: repo_data.archived()
+        ),
+        Predicate(
+            name='unmaintained_in_readme', cost=1,
+            check=lambda repo_data: repo_data.unmaintained_in_readme(),
+            fetched=_readme_fetched
+        ),
+        Predicate(
+            name='no_commit_in_year', cost=1,
+            check=lambda repo_data: not repo_data.commit_in_days(days=365),
+            fetched=_commits_fetched
+        )
+    ]
+)
+
+
+FEATURE_PLAN = FeaturePlan(
+    sources=[
+        Source(
+            name='commits', cost=_COMMITS_COST,
+            fetch=lambda repo_data: repo_data._get_commits()
+        ),
+        # listed newest first down to the start of the commit window
+        Source(
+            name='pulls', cost=3, after=('commits',),
+            fetch=lambda repo_data: repo_data._sweep_pulls()
+        ),
+        Source(
+            name='issues', cost=3, after=('commits',),
+            fetch=lambda repo_data: repo_data._get_windowed(
+                name='issues', since=repo_data._window_since()
+            )
+        ),
+        Source(
+            name='releases', cost=1, after=('commits',),
+            fetch=lambda repo_data: repo_data._get_windowed(
+                name='releases', since=repo_data._window_since()
+            )
+        ),
+        Source(
+            name='branches', cost=1,
+            fetch=lambda repo_data: repo_data.branches_count()
+        ),
+        # the contributors statistics or the commit history
+        Source(
+            name='authors', cost=1, after=('commits',),
+            fetch=lambda repo_data: repo_data._get_authors()
+        ),
+        Source(
+            name='contributors', cost=_COMMITS_COST,
+            fetch=lambda repo_data: repo_data._contributor_profiles()
+        ),
+        Source(
+            name='owner', cost=1,
+            fetch=lambda repo_data: repo_data._owner_profile()
+        ),
+        Source(
+            name='tree', cost=1,
+            fetch=lambda repo_data: repo_data._get_tree()
+        ),
+        Source(
+            name='readme', cost=1,
+            fetch=lambda repo_data: repo_data._get_readme()
+        ),
+        Source(
+            name='languages', cost=1,
+            fetch=lambda repo_data: repo_data._get_languages()
+        )
+    ],
+    features={
+        'pulls_count_open': ('commits', 'pulls'),
+        'pulls_count_closed': ('commits', 'pulls'),
+        'issues_count_open': ('commits', 'issues'),
+        'issues_count_closed': ('commits', 'issues'),
+        # counted in a request or two unless the history is fetched anyway
+        'commits_count': (),
+        'branches_count': ('branches',),
+        'releases_count': ('commits', 'releases'),
+        'development_time': ('commits',),
+        'owner_account_age': ('owner',),
+        'avg_dev_account_age': ('contributors',),
+        'has_test': ('tree',),
+        'has_doc': ('tree',),
+        'has_example': ('tree',),
+        'has_readme': ('readme',),
+        'owner_projects_count': ('owner',),
+        'owner_following': ('owner',),
+        'owner_followers': ('owner',),
+        'devs_followers_avg': ('contributors',),
+        'devs_following_avg': ('contributors',),
+        'commits_by_dev_with_most_commits': ('authors',),
+        'magnetism': ('authors',),
+        'stickiness': ('authors',),
+        'wealth': ('commits', 'pulls'),
+        'last_commit_age': ('commits',),
+        'unmaintained_in_readme': ('readme',),
+        'in_programming_language': ('languages',),
+        'incorrectly_migrated': ('commits', 'tree')
+    }
+)
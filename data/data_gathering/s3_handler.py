@@ -1,12 +1,15 @@
 
+from copy import deepcopy
 from datetime import datetime
-from logging import Logger
+from json import dumps, loads
+from logging import getLogger, Logger
 from os import getenv
 from time import time
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from boto3 import client
 from botocore.config import Config
+from botocore.exceptions import ClientError
 
 
 _AWS_ACCESS_KEY_ID = getenv('AWS_ACCESS_KEY_ID')
@@ -15,11 +18,30 @@ _BUCKET_NAME = getenv('BUCKET_NAME')
 _ENDPOINT_URL = getenv('ENDPOINT_URL')
 
 _TIMESTAMP_FORMAT = '%Y-%m-%d-%H:%M:%S'
+# errors of endpoints rejecting the If-Match and If-None-Match headers of
+# PutObject, e.g. S3 compatible ones or S3 before the end of 2024
+_UNSUPPORTED_CONDITION_CODES = ('NotImplemented', 'InvalidArgument')
 
 
 class S3Handler:
+    """Uploads and downloads timestamped versions of files.
 
-    def __init__(self, region_name: str) -> None:
+    Versions of every file are indexed in a manifest object holding the
+    latest key, the history of keys, the delta objects of the file and the
+    number of versions retained, so that uploads, downloads and retention
+    deletes do not list the bucket. Manifests are cached for the run and
+    written only if unchanged since read, a manifest changed meanwhile by
+    another run is read again and the change applied to it. The bucket is
+    listed only to index files uploaded before manifests were kept.
+    """
+
+    # shared by all handlers of the run, manifests with their ETags
+    _manifests: Dict[str, Tuple[Dict[str, Any], Optional[str]]] = {}
+    _bucket_exists = False
+    # cleared once the endpoint rejects a conditional write
+    _conditional_writes = True
+
+    def __init__(self, region_name: str, retention: int = 1) -> None:
         config = Config(region_name=region_name)
         self.client = client(
             's3', config=config,
@@ -28,6 +50,7 @@ class S3Handler:
             endpoint_url=_ENDPOINT_URL
         )
         self.region = region_name
+        self.retention = retention
 
     def create_bucket(self, region: str = None) -> None:
         if region:
@@ -38,13 +61,85 @@ class S3Handler:
         self.client.create_bucket(
             Bucket=_BUCKET_NAME, CreateBucketConfiguration=location
         )
+        S3Handler._bucket_exists = True
 
     def bucket_exits_check(self) -> bool:
-        try:
-            self.client.list_objects(Bucket=_BUCKET_NAME)
+        if S3Handler._bucket_exists:
             return True
-        except self.client.exceptions.NoSuchBucket:
+        try:
+            self.client.head_bucket(Bucket=_BUCKET_NAME)
+        except ClientError:
             return False
+        S3Handler._bucket_exists = True
+        return True
+
+    @staticmethod
+    def _manifest_name(file_name: str, prefix: str) -> str:
+        return f'{prefix}manifests/{file_name}.json'
+
+    def _read_manifest(
+        self, file_name: str, prefix: str
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        manifest_name = self._manifest_name(file_name=file_name, prefix=prefix)
+        if manifest_name not in self._manifests:
+            body, etag = self.read_versioned_object(object_name=manifest_name)
+            if body:
+                self._manifests[manifest_name] = (loads(body), etag)
+            else:
+                self._manifests[manifest_name] = (
+                    self._index_objects(file_name=file_name, prefix=prefix),
+                    None
+                )
+        return self._manifests[manifest_name]
+
+    def manifest(self, file_name: str, prefix: str = '') -> Dict[str, Any]:
+        return self._read_manifest(file_name=file_name, prefix=prefix)[0]
+
+    def _index_objects(self, file_name: str, prefix: str) -> Dict[str, Any]:
+        # versions uploaded before the manifest was kept
+        history = [
+            obj_name
+            for obj_name in self.list_objects_in_bucket(prefix=prefix)
+            if self.remove_time_stamp(
+                s=self.remove_prefix(s=obj_name, prefix=prefix)
+            ) == file_name
+        ]
+        history.sort(key=lambda obj_name: self.extract_time_stamp(s=obj_name))
+        return {
+            'version': 0, 'latest': history[-1] if history else None,
+            'history': history, 'deltas': [], 'retention': self.retention
+        }
+
+    def _update_manifest(
+        self, file_name: str, prefix: str,
+        update: Callable[[Dict[str, Any]], None],
+        logger: Optional[Logger] = None
+    ) -> Dict[str, Any]:
+        """Applies update to the manifest and writes it conditionally.
+
+        If another run wrote the manifest since it was read, it is read
+        again and update is applied to the new one.
+
+        Returns:
+            The manifest before the update.
+        """
+        manifest_name = self._manifest_name(file_name=file_name, prefix=prefix)
+        while True:
+            manifest, etag = self._read_manifest(
+                file_name=file_name, prefix=prefix
+            )
+            updated = deepcopy(manifest)
+            update(updated)
+            updated['version'] += 1
+            updated['retention'] = self.retention
+            etag = self.write_object_if(
+                object_name=manifest_name, body=dumps(updated).encode(),
+                etag=etag, logger=logger
+            )
+            if etag:
+                self._manifests[manifest_name] = (updated, etag)
+                return manifest
+            del self._manifests[manifest_name]
 
     def upload_file(
         self, file_name: str, logger: Logger, prefix: Optional[str] = None
@@ -55,43 +150,165 @@ class S3Handler:
         self.client.upload_file(
             file_name, _BUCKET_NAME, prefix + object_name_ts
         )
+
+        def add_version(manifest: Dict[str, Any]) -> None:
+            # uploads within the same second overwrite the same object
+            if prefix + object_name_ts not in manifest['history']:
+                manifest['history'].append(prefix + object_name_ts)
+            manifest['latest'] = prefix + object_name_ts
+
+        self._update_manifest(
+            file_name=file_name, prefix=prefix, update=add_version,
+            logger=logger
+        )
         logger.debug(msg=f'File uploaded: {object_name_ts}, prefix: {prefix}')
 
+    def upload_delta(
+        self, file_name: str, delta_name: str, logger: Logger,
+        prefix: str = ''
+    ) -> None:
+        """Uploads a delta of file_name kept until deleted explicitly."""
+        object_name = prefix + self.append_time_stamp(s=delta_name)
+        self.client.upload_file(delta_name, _BUCKET_NAME, object_name)
+        self._update_manifest(
+            file_name=file_name, prefix=prefix,
+            update=lambda manifest: manifest['deltas'].append(
+                {'name': delta_name, 'key': object_name}
+            ), logger=logger
+        )
+        logger.debug(msg=f'Delta uploaded: {object_name}')
+
+    def deltas(
+        self, file_name: str, prefix: str = ''
+    ) -> List[Dict[str, str]]:
+        manifest = self.manifest(file_name=file_name, prefix=prefix)
+        return list(manifest['deltas'])
+
+    def delete_deltas(
+        self, file_name: str, delta_names: List[str], logger: Logger,
+        prefix: str = ''
+    ) -> None:
+        def remove_deltas(manifest: Dict[str, Any]) -> None:
+            manifest['deltas'] = [
+                delta for delta in manifest['deltas']
+                if delta['name'] not in delta_names
+            ]
+
+        # objects are deleted once the manifest does not list them
+        manifest = self._update_manifest(
+            file_name=file_name, prefix=prefix, update=remove_deltas,
+            logger=logger
+        )
+        for delta in manifest['deltas']:
+            if delta['name'] in delta_names:
+                self.delete_object(object_name=delta['key'], logger=logger)
+
     def delete_oldest_object(
         self, file_name: str, logger: Logger, prefix: Optional[str] = None
     ) -> None:
-        """Deletes oldest object in the bucket with given file name.
+        """Deletes oldest objects in the bucket with given file name.
 
-        Oldest object is determined by the timestamp in the object name.
-        Object will not be deleted if it is the only object with the given
-        prefix in the bucket.
+        Objects are deleted from the history in the manifest of the file
+        until only retention latest objects remain.
 
         Args:
             file_name: Name of the file to be uploaded.
         """
         if not prefix:
             prefix = ''
-        file_tuples_list = [
-            (obj_name, self.extract_time_stamp(s=obj_name))
-            for obj_name in self.list_objects_in_bucket(prefix=prefix)
-            if self.remove_prefix(
-                s=obj_name, prefix=prefix
-            ).startswith(file_name)
-        ]
-        logger.debug(
-            msg=f'Old files found: {[f[0] for f in file_tuples_list]}'
+        manifest = self.manifest(file_name=file_name, prefix=prefix)
+        logger.debug(msg=f'Old files found: {manifest["history"]}')
+        if len(manifest['history']) <= self.retention:
+            return
+
+        def oldest(manifest: Dict[str, Any]) -> int:
+            return max(len(manifest['history']) - self.retention, 0)
+
+        def keep_latest(manifest: Dict[str, Any]) -> None:
+            manifest['history'] = manifest['history'][oldest(manifest):]
+
+        manifest = self._update_manifest(
+            file_name=file_name, prefix=prefix, update=keep_latest,
+            logger=logger
         )
-        if len(file_tuples_list) > 1:
-            file_tuples_list.sort(key=lambda tup: tup[1])
-            oldest_object = file_tuples_list[0][0]
-            response = self.client.delete_object(
-                Bucket=_BUCKET_NAME, Key=oldest_object
+        for object_name in manifest['history'][:oldest(manifest)]:
+            self.delete_object(object_name=object_name, logger=logger)
+
+    def read_object(self, object_name: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(
+                Bucket=_BUCKET_NAME, Key=object_name
+            )['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def write_object(self, object_name: str, body: bytes) -> None:
+        self.client.put_object(
+            Bucket=_BUCKET_NAME, Key=object_name, Body=body
+        )
+
+    def read_versioned_object(
+        self, object_name: str
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """Returns the body of the object and its ETag, Nones if missing."""
+        try:
+            response = self.client.get_object(
+                Bucket=_BUCKET_NAME, Key=object_name
             )
-            logger.debug(
-                msg=f'File deleted: {oldest_object}, response code: ' +
-                    f'{response["ResponseMetadata"]["HTTPStatusCode"]}'
+        except self.client.exceptions.NoSuchKey:
+            return None, None
+        return response['Body'].read(), response['ETag']
+
+    def write_object_if(
+        self, object_name: str, body: bytes, etag: Optional[str] = None,
+        logger: Optional[Logger] = None
+    ) -> Optional[str]:
+        """Writes the object only if its ETag still matches.
+
+        Without the ETag, the object is written only if it does not exist.
+        Endpoints without conditional writes reject the condition, the
+        object is then written unconditionally, with a warning, and so are
+        all following objects of the run.
+
+        Returns:
+            ETag of the written object, None if the condition failed.
+        """
+        if not logger:
+            logger = getLogger('dummy')
+
+        if S3Handler._conditional_writes:
+            condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+            try:
+                return self.client.put_object(
+                    Bucket=_BUCKET_NAME, Key=object_name, Body=body,
+                    **condition
+                )['ETag']
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                # concurrent conditional writes of a key may conflict
+                if code in (
+                    'PreconditionFailed', 'ConditionalRequestConflict'
+                ):
+                    return None
+                if code not in _UNSUPPORTED_CONDITION_CODES:
+                    raise
+            S3Handler._conditional_writes = False
+            logger.warning(
+                msg=f'Conditional writes rejected by the endpoint ({code}), ' +
+                    'concurrent runs may overwrite each other'
             )
-            logger.debug(msg=f'Full responose: {response["ResponseMetadata"]}')
+        return self.client.put_object(
+            Bucket=_BUCKET_NAME, Key=object_name, Body=body
+        )['ETag']
+
+    def delete_object(self, object_name: str, logger: Logger) -> None:
+        response = self.client.delete_object(
+            Bucket=_BUCKET_NAME, Key=object_name
+        )
+        logger.debug(
+            msg=f'File deleted: {object_name}, response code: ' +
+                f'{response["ResponseMetadata"]["HTTPStatusCode"]}'
+        )
 
     def download_file(
         self, file_name: str, logger: Logger, object_name: str = None,
@@ -101,13 +318,9 @@ class S3Handler:
         if object_name:
             obj_to_download = object_name
         else:
-            bucket_objs = self.list_objects_in_bucket(prefix=prefix)
-            for bucket_obj in bucket_objs:
-                obj_name_without_prefix = self.remove_prefix(
-                    s=bucket_obj, prefix=prefix
-                )
-                if obj_name_without_prefix.startswith(file_name):
-                    obj_to_download = bucket_obj
+            obj_to_download = self.manifest(
+                file_name=file_name, prefix=prefix
+            )['latest']
 
         if obj_to_download:
             with open(file_name, 'wb') as f:
@@ -122,14 +335,12 @@ class S3Handler:
     ) -> List[Optional[str]]:
         if not prefix:
             prefix = ''
-        try:
-            return [
-                obj['Key'] for obj in self.client.list_objects(
-                    Bucket=_BUCKET_NAME, Prefix=prefix
-                )['Contents']
-            ]
-        except KeyError:
-            return []
+        paginator = self.client.get_paginator('list_objects_v2')
+        return [
+            obj['Key']
+            for page in paginator.paginate(Bucket=_BUCKET_NAME, Prefix=prefix)
+            for obj in page.get('Contents', [])
+        ]
 
     @staticmethod
     def append_time_stamp(s: str) -> str:
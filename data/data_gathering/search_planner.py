@@ -0,0 +1,152 @@
+from datetime import date, datetime, time, timedelta
+from json import dump, load
+from logging import getLogger, Logger
+from random import shuffle
+from typing import Any, Dict, List, Optional
+
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+# slices are not split below this length, Github compares whole seconds
+_MIN_SLICE_LENGTH = timedelta(minutes=1)
+
+
+class DateSlice:
+    """Range of creation times searched page by page.
+
+    Both ends are inclusive, page is the next page of the results to be
+    processed.
+    """
+
+    def __init__(
+        self, start: datetime, end: datetime, page: int = 0,
+        exhausted: bool = False
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.page = page
+        self.exhausted = exhausted
+
+    def query(self) -> str:
+        return (
+            f'{self.start.strftime(_DATETIME_FORMAT)}..' +
+            f'{self.end.strftime(_DATETIME_FORMAT)}'
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'start': self.start.strftime(_DATETIME_FORMAT),
+            'end': self.end.strftime(_DATETIME_FORMAT),
+            'page': self.page, 'exhausted': self.exhausted
+        }
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> 'DateSlice':
+        return cls(
+            start=datetime.strptime(values['start'], _DATETIME_FORMAT),
+            end=datetime.strptime(values['end'], _DATETIME_FORMAT),
+            page=values['page'], exhausted=values['exhausted']
+        )
+
+
+class SearchPlanner:
+    """Enumerates the searched date range as slices in shuffled order.
+
+    Every day of the range is a slice at first. Slices whose results
+    exceed the search limit are split in halves, a slice is exhausted once
+    all pages of its results were processed. The state is persisted in a
+    JSON file, so a resumed run continues where the previous one stopped.
+    """
+
+    def __init__(
+        self, file_name: str, from_date: date, to_date: date,
+        logger: Optional[Logger] = None
+    ) -> None:
+        if not logger:
+            logger = getLogger('dummy')
+
+        self.file_name = file_name
+        self._logger = logger
+        self._range = [from_date.isoformat(), to_date.isoformat()]
+        self._slices: List[DateSlice] = []
+        try:
+            with open(file=file_name, mode='r') as f:
+                state = load(f)
+            if state['range'] == self._range:
+                self._slices = [
+                    DateSlice.from_dict(values=values)
+                    for values in state['slices']
+                ]
+                logger.debug(msg=f'Date slices loaded: {file_name}')
+        except FileNotFoundError:
+            pass
+
+        if not self._slices:
+            days = [
+                from_date + timedelta(days=i)
+                for i in range((to_date - from_date).days)
+            ]
+            self._slices = [
+                DateSlice(
+                    start=datetime.combine(day, time()),
+                    end=datetime.combine(day, time(23, 59, 59))
+                )
+                for day in days
+            ]
+            shuffle(self._slices)
+            self.save()
+        self._next = 0
+
+    def save(self) -> None:
+        with open(file=self.file_name, mode='w') as f:
+            dump(
+                {
+                    'range': self._range,
+                    'slices': [
+                        date_slice.to_dict() for date_slice in self._slices
+                    ]
+                }, f
+            )
+
+    def remaining(self) -> int:
+        return sum(
+            1 for date_slice in self._slices if not date_slice.exhausted
+        )
+
+    def next_slice(self) -> Optional[DateSlice]:
+        while self._next < len(self._slices):
+            date_slice = self._slices[self._next]
+            if not date_slice.exhausted:
+                return date_slice
+            self._next += 1
+        return None
+
+    def split(self, date_slice: DateSlice) -> bool:
+        """Splits the slice in halves unless it is too short.
+
+        Returns:
+            False if the slice was not split.
+        """
+        if date_slice.end - date_slice.start < _MIN_SLICE_LENGTH:
+            return False
+        middle = date_slice.start + (date_slice.end - date_slice.start) / 2
+        middle = middle.replace(microsecond=0)
+        index = self._slices.index(date_slice)
+        self._slices[index:index + 1] = [
+            DateSlice(start=date_slice.start, end=middle),
+            DateSlice(start=middle + timedelta(seconds=1), end=date_slice.end)
+        ]
+        self.save()
+        self._logger.debug(msg=f'Date slice split: {date_slice.query()}')
+        return True
+
+    def advance(self, date_slice: DateSlice, pages_count: int) -> None:
+        """Moves the slice to its next page, exhausting it after the last."""
+        date_slice.page += 1
+        if date_slice.page >= pages_count:
+            self.exhaust(date_slice=date_slice)
+        else:
+            self.save()
+
+    def exhaust(self, date_slice: DateSlice) -> None:
+        date_slice.exhausted = True
+        self.save()
+        self._logger.debug(msg=f'Date slice exhausted: {date_slice.query()}')
@@ -0,0 +1,149 @@
+from hashlib import sha256
+from json import dumps, loads
+from logging import Logger
+from os import path
+from typing import Any, Dict, List
+
+from .s3_handler import S3Handler
+
+
+class SegmentedFiles:
+    """Uploads append-only files (CSV, logs) to S3 in numbered segments.
+
+    Every upload sends only the bytes appended since the previous upload as
+    a new segment object and rewrites a small JSON manifest listing the
+    segments of the file. Files are reassembled from their manifests on
+    download. Once a file has more than max_segments segments, it is
+    compacted: uploaded whole as a single segment replacing the others.
+    """
+
+    def __init__(
+        self, file_names: List[str], region_name: str, prefix: str = '',
+        max_segments: int = 100
+    ) -> None:
+        self.file_names = file_names
+        self._s3_handler = S3Handler(region_name=region_name)
+        self._prefix = prefix
+        self._max_segments = max_segments
+        # manifests and hashes of the uploaded contents cached for the run
+        self._manifests: Dict[str, Dict[str, Any]] = {}
+        self._hashes: Dict[str, Any] = {}
+
+    def _key(self, file_name: str, name: str) -> str:
+        return f'{self._prefix}segments/{file_name}/{name}'
+
+    def _manifest(self, file_name: str) -> Dict[str, Any]:
+        if file_name not in self._manifests:
+            body = self._s3_handler.read_object(
+                object_name=self._key(file_name=file_name, name='manifest')
+            )
+            self._manifests[file_name] = loads(body) if body else {
+                'size': 0, 'sha256': sha256().hexdigest(), 'next': 0,
+                'segments': []
+            }
+        return self._manifests[file_name]
+
+    def _put_segment(self, file_name: str, body: bytes) -> Dict[str, Any]:
+        manifest = self._manifest(file_name=file_name)
+        key = self._key(file_name=file_name, name=f'{manifest["next"]:08d}')
+        self._s3_handler.write_object(object_name=key, body=body)
+        manifest['next'] += 1
+        return {'key': key, 'size': len(body)}
+
+    def _put_manifest(self, file_name: str) -> None:
+        manifest = self._manifest(file_name=file_name)
+        manifest['sha256'] = self._hashes[file_name].hexdigest()
+        self._s3_handler.write_object(
+            object_name=self._key(file_name=file_name, name='manifest'),
+            body=dumps(manifest).encode()
+        )
+
+    def _uploaded_prefix_matches(self, file_name: str) -> bool:
+        # a fresh log or a regenerated CSV does not continue the uploaded
+        # content, its tail cannot be appended
+        manifest = self._manifest(file_name=file_name)
+        if path.getsize(file_name) < manifest['size']:
+            return False
+        hash_ = sha256()
+        with open(file=file_name, mode='rb') as f:
+            remaining = manifest['size']
+            while remaining:
+                chunk = f.read(min(remaining, 1024 ** 2))
+                hash_.update(chunk)
+                remaining -= len(chunk)
+        self._hashes[file_name] = hash_
+        return hash_.hexdigest() == manifest['sha256']
+
+    def _replace(self, file_name: str, logger: Logger) -> None:
+        """Uploads the whole file as a single segment replacing the others."""
+        manifest = self._manifest(file_name=file_name)
+        old_keys = [segment['key'] for segment in manifest['segments']]
+        with open(file=file_name, mode='rb') as f:
+            body = f.read()
+        manifest['segments'] = [
+            self._put_segment(file_name=file_name, body=body)
+        ]
+        manifest['size'] = len(body)
+        self._hashes[file_name] = sha256(body)
+        self._put_manifest(file_name=file_name)
+        for key in old_keys:
+            self._s3_handler.delete_object(object_name=key, logger=logger)
+        logger.debug(msg=f'Segments replaced: {file_name}')
+
+    def upload(
+        self, file_name: str, logger: Logger, rewrite: bool = False
+    ) -> None:
+        """Uploads bytes appended to the file since the last upload.
+
+        Args:
+            rewrite: Whether the file was rewritten rather than appended.
+        """
+        if not path.isfile(file_name):
+            return
+        manifest = self._manifest(file_name=file_name)
+        if rewrite or (
+            file_name not in self._hashes and
+            not self._uploaded_prefix_matches(file_name=file_name)
+        ):
+            self._replace(file_name=file_name, logger=logger)
+            return
+
+        with open(file=file_name, mode='rb') as f:
+            f.seek(manifest['size'])
+            body = f.read()
+        if not body:
+            return
+        manifest['segments'].append(
+            self._put_segment(file_name=file_name, body=body)
+        )
+        manifest['size'] += len(body)
+        self._hashes[file_name].update(body)
+        if len(manifest['segments']) > self._max_segments:
+            self._replace(file_name=file_name, logger=logger)
+        else:
+            self._put_manifest(file_name=file_name)
+        logger.debug(msg=f'Segment uploaded: {file_name}, size: {len(body)}')
+
+    def download(self, file_name: str, logger: Logger) -> bool:
+        """Reassembles the file from the segments listed in its manifest.
+
+        Returns:
+            False if the file has no segments in the bucket.
+        """
+        manifest = self._manifest(file_name=file_name)
+        if not manifest['segments']:
+            return False
+        hash_ = sha256()
+        with open(file=file_name, mode='wb') as f:
+            for segment in manifest['segments']:
+                body = self._s3_handler.read_object(object_name=segment['key'])
+                f.write(body)
+                hash_.update(body)
+        self._hashes[file_name] = hash_
+        logger.debug(
+            msg=f'File reassembled: {file_name}, segments: ' +
+                f'{len(manifest["segments"])}'
+        )
+        if len(manifest['segments']) > self._max_segments:
+            self._replace(file_name=file_name, logger=logger)
+        return True
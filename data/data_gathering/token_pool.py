@@ -0,0 +1,217 @@
+from logging import getLogger, Logger
+from os import environ
+from random import choices
+from threading import Condition
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+from github import Github
+from github.GithubException import GithubException
+from github.MainClass import DEFAULT_BASE_URL
+
+
+# limits of the resources before the first response tells them
+_DEFAULT_LIMITS = {'core': 5000, 'search': 30, 'graphql': 5000}
+_DEFAULT_LIMIT = 5000
+# waiters are woken a little after the reset to allow for clock skew
+_RESET_MARGIN = 1
+# the largest page Github serves, a third of the calls of the default
+_PER_PAGE = 100
+# secondary rate limits do not say when they end
+_SECONDARY_LIMIT_BACKOFF = 60
+# primary rate limits reset every hour, waiting longer means a problem
+MAX_WAIT = 65 * 60
+
+
+class NoAPICalls(Exception):
+    pass
+
+
+def read_tokens() -> List[Optional[str]]:
+    """Reads Github access tokens from the environment.
+
+    Tokens are taken from GITHUB_ACCESS_TOKEN, GITHUB_ACCESS_TOKEN_0,
+    GITHUB_ACCESS_TOKEN_1, ... (until the first missing one) and from the
+    comma separated GITHUB_ACCESS_TOKENS. Without any token, a single
+    unauthenticated instance is used.
+    """
+    tokens = []
+    if environ.get('GITHUB_ACCESS_TOKEN'):
+        tokens.append(environ['GITHUB_ACCESS_TOKEN'])
+    index = 0
+    while environ.get(f'GITHUB_ACCESS_TOKEN_{index}'):
+        tokens.append(environ[f'GITHUB_ACCESS_TOKEN_{index}'])
+        index += 1
+    tokens += [
+        token.strip()
+        for token in environ.get('GITHUB_ACCESS_TOKENS', '').split(',')
+        if token.strip()
+    ]
+    return list(dict.fromkeys(tokens)) or [None]
+
+
+def rate_limited_resource(error: GithubException) -> str:
+    """Returns the resource whose rate limit the error reports."""
+    return (error.headers or {}).get('x-ratelimit-resource', 'core')
+
+
+class _Token:
+
+    def __init__(self, token: Optional[str], base_url: str) -> None:
+        self.token = token
+        self.git = Github(
+            login_or_token=token, base_url=base_url, per_page=_PER_PAGE
+        )
+        # the header PyGithub authenticates the requests of the token with
+        self.authorization = f'token {token}' if token else None
+        # remaining calls, limit and reset time by the resource, the
+        # requester keeps only the X-RateLimit-* headers of the last
+        # response, whichever resource it was
+        self.budgets: Dict[str, Tuple[int, int, float]] = {}
+        self.leases = 0
+        self.blocked_until = 0.0
+
+    def reset_time(self, resource: str = 'core') -> float:
+        _, _, reset = self.budgets.get(resource, (0, 0, 0.0))
+        return max(reset, self.blocked_until)
+
+    def remaining(self, now: float, resource: str = 'core') -> int:
+        if now < self.blocked_until:
+            return 0
+        if resource not in self.budgets:
+            return _DEFAULT_LIMITS.get(resource, _DEFAULT_LIMIT)
+        remaining, limit, reset = self.budgets[resource]
+        if now >= reset:
+            return limit
+        return remaining
+
+
+class TokenPool:
+    """Pool of Github instances, one per access token.
+
+    Remaining API calls and reset times are taken from the headers of the
+    regular responses, see observe, so the pool itself never calls the API.
+    They are kept per resource (core, search, graphql), which Github limits
+    separately. Instances are leased at random, weighted by the remaining
+    calls of the resource the caller needs divided among the current
+    leases. When all tokens are exhausted, callers wait until the earliest
+    reset.
+    """
+
+    def __init__(
+        self, tokens: List[Optional[str]], base_url: str = DEFAULT_BASE_URL
+    ) -> None:
+        self._tokens = [
+            _Token(token=token, base_url=base_url) for token in tokens
+        ]
+        self._by_git: Dict[int, _Token] = {
+            id(token.git): token for token in self._tokens
+        }
+        self._by_authorization: Dict[Optional[str], _Token] = {
+            token.authorization: token for token in self._tokens
+        }
+        self._condition = Condition()
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    @property
+    def instances(self) -> List[Github]:
+        return [token.git for token in self._tokens]
+
+    def token(self, git: Github) -> Optional[str]:
+        token = self._by_git.get(id(git))
+        return token.token if token else None
+
+    def observe(
+        self, authorization: Optional[str], headers: Dict[str, str]
+    ) -> None:
+        """Updates the budget of the token from the headers of a response.
+
+        Github names the resource the request counted against in the
+        X-RateLimit-Resource header.
+        """
+        token = self._by_authorization.get(authorization)
+        if (
+            not token or 'x-ratelimit-remaining' not in headers or
+            'x-ratelimit-limit' not in headers
+        ):
+            return
+        with self._condition:
+            token.budgets[headers.get('x-ratelimit-resource', 'core')] = (
+                int(headers['x-ratelimit-remaining']),
+                int(headers['x-ratelimit-limit']),
+                float(headers.get('x-ratelimit-reset', 0))
+            )
+
+    def lease(
+        self, logger: Optional[Logger] = None,
+        max_wait: Optional[float] = MAX_WAIT, resource: str = 'core'
+    ) -> Github:
+        if not logger:
+            logger = getLogger('dummy')
+
+        deadline = time() + max_wait if max_wait is not None else None
+        with self._condition:
+            while True:
+                now = time()
+                weights = [
+                    token.remaining(now=now, resource=resource) /
+                    (1 + token.leases)
+                    for token in self._tokens
+                ]
+                if any(weights):
+                    token = choices(self._tokens, weights=weights)[0]
+                    token.leases += 1
+                    logger.debug(
+                        msg=f'Leased token {self._tokens.index(token)}, ' +
+                            f'remaining {resource} calls: ' +
+                            f'{token.remaining(now=now, resource=resource)}'
+                    )
+                    return token.git
+
+                reset = min(
+                    token.reset_time(resource=resource)
+                    for token in self._tokens
+                )
+                waiting_time = max(reset - now, 0) + _RESET_MARGIN
+                if deadline is not None:
+                    if now >= deadline:
+                        raise NoAPICalls('No API calls received')
+                    waiting_time = min(waiting_time, deadline - now)
+                logger.info(msg=f'Waiting for {waiting_time / 60} minutes')
+                self._condition.wait(timeout=waiting_time)
+
+    def release(self, git: Github) -> None:
+        with self._condition:
+            token = self._by_git.get(id(git))
+            if token and token.leases > 0:
+                token.leases -= 1
+
+    def exhausted(self, git: Github, resource: str = 'core') -> None:
+        """Marks the token of git as exhausted after a rate limit error.
+
+        Secondary rate limits are hit with calls of the resource still
+        remaining, so the token is blocked for a while in that case.
+        """
+        with self._condition:
+            token = self._by_git.get(id(git))
+            if not token:
+                return
+            now = time()
+            if token.remaining(now=now, resource=resource) > 0:
+                token.blocked_until = now + _SECONDARY_LIMIT_BACKOFF
+            self._condition.notify_all()
+
+    def renew(
+        self, git: Github, logger: Optional[Logger] = None,
+        max_wait: Optional[float] = MAX_WAIT, resource: str = 'core'
+    ) -> Github:
+        """Releases git exhausted by a rate limit error and leases another.
+
+        The resource is the one whose limit was exceeded, see
+        rate_limited_resource.
+        """
+        self.exhausted(git=git, resource=resource)
+        self.release(git=git)
+        return self.lease(logger=logger, max_wait=max_wait, resource=resource)
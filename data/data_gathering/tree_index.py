@@ -0,0 +1,68 @@
+from os import path
+from typing import List, Set
+
+from github.Repository import Repository
+
+from .classification import is_vendored
+
+
+class TreeIndex:
+    """Index of the default branch tree of a repository.
+
+    The whole tree is fetched with a single recursive git tree request,
+    only if Github truncates the response, subtrees are fetched separately.
+    Vendored directories, and everything below them, are left out. As in
+    the directory crawl it replaces, vendor patterns are matched at the
+    start of the directory path and basenames are compared as they are.
+    """
+
+    def __init__(self) -> None:
+        self.dirs: Set[str] = set()
+        self.files: Set[str] = set()
+        self.dir_basenames: Set[str] = set()
+        self.file_basenames: Set[str] = set()
+        self._excluded: Set[str] = set()
+
+    @classmethod
+    def from_repo(cls, repo: Repository) -> 'TreeIndex':
+        index = cls()
+        index._add_tree(repo=repo, sha=repo.default_branch, prefix='')
+        return index
+
+    def _add_tree(self, repo: Repository, sha: str, prefix: str) -> None:
+        tree = repo.get_git_tree(sha=sha, recursive=True)
+        if not tree.raw_data.get('truncated'):
+            for element in tree.tree:
+                self._add(
+                    path_name=prefix + element.path, element_type=element.type
+                )
+            return
+
+        for element in repo.get_git_tree(sha=sha).tree:
+            path_name = prefix + element.path
+            if self._add(path_name=path_name, element_type=element.type):
+                self._add_tree(
+                    repo=repo, sha=element.sha, prefix=path_name + '/'
+                )
+
+    def _add(self, path_name: str, element_type: str) -> bool:
+        parent = path.dirname(path_name)
+        if parent in self._excluded:
+            if element_type == 'tree':
+                self._excluded.add(path_name)
+            return False
+
+        if element_type == 'tree':
+            if is_vendored(path=path_name):
+                self._excluded.add(path_name)
+                return False
+            self.dirs.add(path_name)
+            self.dir_basenames.add(path.basename(path_name))
+            return True
+        elif element_type == 'blob':
+            self.files.add(path_name)
+            self.file_basenames.add(path.basename(path_name))
+        return False
+
+    def has_dir(self, names: List[str]) -> bool:
+        return any(name.lower() in self.dir_basenames for name in names)
@@ -0,0 +1,220 @@
+from array import array
+from bisect import bisect_left
+from glob import glob
+from hashlib import blake2b
+from heapq import merge
+from logging import getLogger, Logger
+from marshal import load
+from mmap import ACCESS_READ, mmap
+from os import path, remove, replace
+from struct import Struct
+from typing import Any, Iterator, List, Optional, Set, Tuple
+
+_MAGIC = b'VIDS'
+# magic, sequence number of the last merged delta, count of keys
+_HEADER = Struct('<4sQQ')
+
+
+def name_key(name: str) -> int:
+    return int.from_bytes(
+        blake2b(name.encode(), digest_size=8).digest(), 'little'
+    )
+
+
+def delta_file_name(file_name: str, sequence: int) -> str:
+    stem = path.splitext(file_name)[0]
+    return f'{stem}-{sequence:08d}.delta'
+
+
+def delta_sequence(file_name: str, delta_name: str) -> Optional[int]:
+    """Returns the sequence number if delta_name is a delta of file_name."""
+    stem = path.splitext(file_name)[0] + '-'
+    if not delta_name.startswith(stem) or not delta_name.endswith('.delta'):
+        return None
+    try:
+        return int(delta_name[len(stem):-len('.delta')])
+    except ValueError:
+        return None
+
+
+class VisitedStore:
+    """Set of visited repository IDs or names kept in a snapshot and deltas.
+
+    The snapshot is a sorted array of unsigned 64-bit keys, memory mapped
+    and searched by bisection. Keys added since the snapshot are kept in
+    memory and every checkpoint appends only the keys added since the
+    previous one as a new numbered delta file. Deltas are merged into the
+    snapshot once compact_size keys accumulate or on compact. Names are
+    stored by their 64-bit hashes, so a store of names supports only
+    membership tests.
+    """
+
+    def __init__(
+        self, file_name: str, hashed: bool = False,
+        compact_size: int = 100000, logger: Optional[Logger] = None
+    ) -> None:
+        if not logger:
+            logger = getLogger('dummy')
+
+        self.file_name = file_name
+        self._hashed = hashed
+        self._compact_size = compact_size
+        self._logger = logger
+        self._mmap: Any = None
+        self._snapshot: Any = array('Q')
+        self._sequence = 0
+        self._added: Set[int] = set()
+        self._pending: List[int] = []
+        self._load()
+
+    def _key(self, key: Any) -> int:
+        return name_key(name=key) if self._hashed else key
+
+    def _load(self) -> None:
+        legacy = None
+        if path.isfile(self.file_name):
+            with open(file=self.file_name, mode='rb') as f:
+                magic = f.read(len(_MAGIC))
+                f.seek(0)
+                if magic != _MAGIC:
+                    try:
+                        legacy = load(f)
+                    except EOFError:
+                        legacy = set()
+            if legacy is None:
+                self._map_snapshot()
+
+        # deltas not merged yet, the older ones are left over from compaction
+        self._remove_deltas()
+        deltas = self._deltas()
+        for sequence, delta_name in deltas:
+            keys = array('Q')
+            with open(file=delta_name, mode='rb') as f:
+                keys.frombytes(f.read())
+            self._added.update(key for key in keys if not self._has(key=key))
+            self._sequence = sequence
+
+        if legacy is not None:
+            self._logger.debug(msg=f'Converting IDs file: {self.file_name}')
+            self._added.update(self._key(key=key) for key in legacy)
+            self.compact()
+        self._logger.debug(
+            msg=f'IDs loaded: {self.file_name}, size: {len(self)}, ' +
+                f'deltas: {len(deltas)}'
+        )
+
+    def _map_snapshot(self) -> None:
+        with open(file=self.file_name, mode='rb') as f:
+            magic, self._sequence, count = _HEADER.unpack(
+                f.read(_HEADER.size)
+            )
+            if not count:
+                self._snapshot = array('Q')
+                return
+            self._mmap = mmap(f.fileno(), 0, access=ACCESS_READ)
+        self._snapshot = memoryview(self._mmap)[_HEADER.size:].cast('Q')
+
+    def _close_snapshot(self) -> None:
+        if self._mmap:
+            self._snapshot.release()
+            self._mmap.close()
+            self._mmap = None
+        self._snapshot = array('Q')
+
+    def _deltas(self) -> List[Tuple[int, str]]:
+        deltas = []
+        pattern = path.splitext(self.file_name)[0] + '-*.delta'
+        for delta_name in glob(pattern):
+            sequence = delta_sequence(
+                file_name=self.file_name, delta_name=delta_name
+            )
+            if sequence is not None:
+                deltas.append((sequence, delta_name))
+        return sorted(deltas)
+
+    def _remove_deltas(self) -> None:
+        # deltas already merged into the snapshot
+        for sequence, delta_name in self._deltas():
+            if sequence <= self._sequence:
+                remove(delta_name)
+
+    def _has(self, key: int) -> bool:
+        if key in self._added:
+            return True
+        index = bisect_left(self._snapshot, key)
+        return index < len(self._snapshot) and self._snapshot[index] == key
+
+    def __contains__(self, key: Any) -> bool:
+        return self._has(key=self._key(key=key))
+
+    def __len__(self) -> int:
+        return len(self._snapshot) + len(self._added)
+
+    def __iter__(self) -> Iterator[int]:
+        if self._hashed:
+            raise TypeError('Hashed names cannot be iterated')
+        yield from self._snapshot
+        yield from self._added
+
+    def add(self, key: Any) -> None:
+        key = self._key(key=key)
+        if self._has(key=key):
+            return
+        self._added.add(key)
+        self._pending.append(key)
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    def checkpoint(self) -> Optional[str]:
+        """Writes keys added since the last checkpoint into a new delta.
+
+        Returns:
+            Name of the delta file or None when nothing was added.
+        """
+        if not self._pending:
+            return None
+        delta_name = delta_file_name(
+            file_name=self.file_name, sequence=self._sequence + 1
+        )
+        with open(file=delta_name, mode='wb') as f:
+            array('Q', self._pending).tofile(f)
+        self._sequence += 1
+        self._pending = []
+        # the delta files are kept until compact, they may be uploaded yet
+        if len(self._added) >= self._compact_size:
+            self._merge()
+        return delta_name
+
+    def _merge(self) -> None:
+        self._write_snapshot(keys=merge(self._snapshot, sorted(self._added)))
+
+    def compact(self) -> str:
+        """Merges all deltas into the snapshot and removes them.
+
+        Returns:
+            Name of the snapshot file.
+        """
+        self.checkpoint()
+        self._merge()
+        self._remove_deltas()
+        return self.file_name
+
+    def rewrite(self, keys: Set[Any]) -> None:
+        """Replaces the whole content by keys, persisted on compact."""
+        added = {self._key(key=key) for key in keys}
+        self._close_snapshot()
+        self._added = added
+        self._pending = []
+
+    def _write_snapshot(self, keys: Any) -> None:
+        snapshot = array('Q', keys)
+        temp_file_name = self.file_name + '.tmp'
+        with open(file=temp_file_name, mode='wb') as f:
+            f.write(_HEADER.pack(_MAGIC, self._sequence, len(snapshot)))
+            snapshot.tofile(f)
+        self._close_snapshot()
+        replace(temp_file_name, self.file_name)
+        self._added = set()
+        self._map_snapshot()
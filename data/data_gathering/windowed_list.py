@@ -0,0 +1,131 @@
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from github.Requester import Requester
+
+
+class WindowedList:
+    """Github list fetched page by page only as far back as a window.
+
+    Items are expected newest first by created_at, either as the endpoint
+    orders them or as requested by the params, e.g. sort='created' and
+    direction='desc'. Paginating stops at the first item created before
+    the window. The number of the last page is read from the Link header of
+    the first response, so that the pages saved by stopping are known.
+    The same number answers counts, see count.
+    """
+
+    def __init__(
+        self, requester: Requester, content_class: Any, url: str,
+        params: Optional[Dict[str, Any]] = None, per_page: int = 100
+    ) -> None:
+        self._requester = requester
+        self._content_class = content_class
+        self._url = url
+        self._params = {**(params or {}), 'per_page': per_page}
+        self.pages = 0
+        self.last_page: Optional[int] = None
+
+    @property
+    def saved_pages(self) -> int:
+        if self.last_page is None:
+            return 0
+        return max(self.last_page - self.pages, 0)
+
+    @staticmethod
+    def _links(headers: Dict[str, str]) -> Dict[str, str]:
+        links = {}
+        for link in headers.get('link', '').split(', '):
+            if '; ' in link:
+                url, rel = link.split('; ')[:2]
+                links[rel[5:-1]] = url[1:-1]
+        return links
+
+    @staticmethod
+    def _last_page(links: Dict[str, str]) -> Optional[int]:
+        last = links.get('last')
+        if not last:
+            return None
+        return int(parse_qs(urlparse(last).query)['page'][0])
+
+    def _pages(self) -> Iterator[Tuple[Dict[str, str], List[Any]]]:
+        url: Optional[str] = self._url
+        params: Optional[Dict[str, Any]] = self._params
+        while url:
+            headers, data = self._requester.requestJsonAndCheck(
+                'GET', url, parameters=params
+            )
+            self.pages += 1
+            links = self._links(headers=headers)
+            if self.last_page is None:
+                self.last_page = self._last_page(links=links) or 1
+            yield headers, data or []
+            url, params = links.get('next') if data else None, None
+
+    def _items(self) -> Iterator[Any]:
+        for headers, data in self._pages():
+            for element in data:
+                yield self._content_class(
+                    self._requester, headers, element, completed=False
+                )
+
+    def fetch(self, since: datetime) -> List[Any]:
+        """Returns the items created after since."""
+        items = []
+        for item in self._items():
+            if item.created_at <= since:
+                break
+            items.append(item)
+        return items
+
+    def first(self) -> Optional[Any]:
+        """Returns the first item, fetching one page at most."""
+        for item in self._items():
+            return item
+        return None
+
+    def ends(self) -> Tuple[Optional[Any], Optional[Any]]:
+        """Returns the first and the last item, fetching two pages at most.
+
+        The last page is requested directly by the Link header of the
+        first one, so one item per page keeps both requests small.
+        """
+        headers, data = self._requester.requestJsonAndCheck(
+            'GET', self._url, parameters=self._params
+        )
+        self.pages += 1
+        if not data:
+            return None, None
+        first = self._content_class(
+            self._requester, headers, data[0], completed=False
+        )
+        links = self._links(headers=headers)
+        self.last_page = self._last_page(links=links) or 1
+        if self.last_page > 1:
+            headers, data = self._requester.requestJsonAndCheck(
+                'GET', links['last']
+            )
+            self.pages += 1
+        last = self._content_class(
+            self._requester, headers, data[-1], completed=False
+        ) if data else first
+        return first, last
+
+    def count(self) -> int:
+        """Returns the number of items in a single request.
+
+        With one item per page, the number of the last page is the count.
+        Search results carry total_count, lists that fit a single page or
+        endpoints that do not paginate are counted as returned.
+        """
+        headers, data = self._requester.requestJsonAndCheck(
+            'GET', self._url, parameters={**self._params, 'per_page': 1}
+        )
+        self.pages += 1
+        last_page = self._last_page(links=self._links(headers=headers))
+        if last_page is not None:
+            return last_page
+        if isinstance(data, dict):
+            return data.get('total_count', 0)
+        return len(data or [])
@@ -0,0 +1,309 @@
+from contextlib import contextmanager
+from json import dumps, loads
+from sqlite3 import connect
+from threading import Event, Lock, Thread
+from time import time
+from typing import (
+    Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+)
+from zlib import crc32
+
+from .s3_handler import S3Handler
+
+
+_QUEUE = 'queue'
+_MERGE = 'merge'
+
+
+class LocalObjects:
+    """Objects kept in an SQLite file, versioned for conditional writes.
+
+    Has the conditional reads and writes of S3Handler and stands in for
+    the bucket when the workers share a volume or a host, e.g. to run the
+    work queue locally with several processes. The version of an object
+    serves as its ETag.
+    """
+
+    def __init__(self, file_name: str) -> None:
+        # every statement is a transaction of its own
+        self._connection = connect(
+            file_name, check_same_thread=False, isolation_level=None,
+            timeout=60
+        )
+        self._lock = Lock()
+        with self._lock:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS objects (name TEXT PRIMARY KEY, ' +
+                'body BLOB NOT NULL, version INTEGER NOT NULL)'
+            )
+
+    def read_object(self, object_name: str) -> Optional[bytes]:
+        return self.read_versioned_object(object_name=object_name)[0]
+
+    def read_versioned_object(
+        self, object_name: str
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT body, version FROM objects WHERE name = ?',
+                (object_name,)
+            ).fetchone()
+        if not row:
+            return None, None
+        return row[0], str(row[1])
+
+    def write_object(self, object_name: str, body: bytes) -> None:
+        with self._lock:
+            self._connection.execute(
+                'INSERT INTO objects VALUES (?, ?, 1) ON CONFLICT(name) ' +
+                'DO UPDATE SET body = excluded.body, version = version + 1',
+                (object_name, body)
+            )
+
+    def write_object_if(
+        self, object_name: str, body: bytes, etag: Optional[str] = None
+    ) -> Optional[str]:
+        with self._lock:
+            if etag is None:
+                cursor = self._connection.execute(
+                    'INSERT OR IGNORE INTO objects VALUES (?, ?, 1)',
+                    (object_name, body)
+                )
+                return '1' if cursor.rowcount else None
+            cursor = self._connection.execute(
+                'UPDATE objects SET body = ?, version = version + 1 ' +
+                'WHERE name = ? AND version = ?',
+                (body, object_name, int(etag))
+            )
+        return str(int(etag) + 1) if cursor.rowcount else None
+
+
+class Lease:
+    """Chunk of IDs, or the merge, claimed by a worker until it expires."""
+
+    def __init__(self, name: str, record: Dict[str, Any], etag: str) -> None:
+        self.name = name
+        self.record = record
+        self.etag = etag
+        self.lost = False
+        # the lease is renewed from another thread
+        self.lock = Lock()
+
+    @property
+    def ids(self) -> List[int]:
+        return self.record['ids']
+
+
+class WorkQueue:
+    """IDs split into chunks which workers claim for a limited time.
+
+    Every chunk is an object of its own, holding its IDs, the worker owning
+    it and the time its lease expires. Objects change only by conditional
+    writes, so of two workers claiming the same chunk exactly one succeeds,
+    and a worker whose lease expired meanwhile notices it on the next
+    renewal. Chunks of workers that stopped are claimed again once their
+    leases expire. Outputs are kept per chunk, a recomputed chunk replaces
+    its output. When all chunks are done, the outputs are merged by a
+    single worker, which claims the merge the same way.
+    """
+
+    def __init__(
+        self, objects: Union[S3Handler, LocalObjects], name: str,
+        worker: str, lease_seconds: int = 300, prefix: str = ''
+    ) -> None:
+        self._objects = objects
+        self._prefix = f'{prefix}queues/{name}/'
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self._chunks: Optional[int] = None
+        # done chunks stay done, they are not read again
+        self._done: Set[str] = set()
+
+    @staticmethod
+    def _chunk_name(index: int) -> str:
+        return f'chunks/{index:06d}'
+
+    def _read(
+        self, name: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        body, etag = self._objects.read_versioned_object(
+            object_name=self._prefix + name
+        )
+        return (loads(body) if body else None), etag
+
+    def _write(
+        self, name: str, record: Dict[str, Any], etag: Optional[str] = None
+    ) -> Optional[str]:
+        return self._objects.write_object_if(
+            object_name=self._prefix + name, body=dumps(record).encode(),
+            etag=etag
+        )
+
+    @staticmethod
+    def _lease_record(**fields: Any) -> Dict[str, Any]:
+        return {'owner': None, 'expires': 0.0, 'done': False, **fields}
+
+    def populate(self, ids: Iterable[int], chunk_size: int) -> int:
+        """Splits the IDs into chunks, unless the queue already exists.
+
+        Workers populating the queue at once write the same chunks, the
+        queue object written last marks the queue complete.
+
+        Returns:
+            Number of chunks in the queue.
+        """
+        queue, _ = self._read(name=_QUEUE)
+        if not queue:
+            ids = sorted(ids)
+            chunks = [
+                ids[start:start + chunk_size]
+                for start in range(0, len(ids), chunk_size)
+            ]
+            for index, chunk in enumerate(chunks):
+                self._write(
+                    name=self._chunk_name(index=index),
+                    record=self._lease_record(ids=chunk, computed=[])
+                )
+            self._write(name=_MERGE, record=self._lease_record())
+            self._write(name=_QUEUE, record={
+                'chunks': len(chunks), 'ids': len(ids),
+                'chunk_size': chunk_size
+            })
+            queue, _ = self._read(name=_QUEUE)
+        self._chunks = queue['chunks']
+        return self._chunks
+
+    def chunks(self) -> int:
+        if self._chunks is None:
+            queue, _ = self._read(name=_QUEUE)
+            if not queue:
+                raise ValueError('Work queue is not populated')
+            self._chunks = queue['chunks']
+        return self._chunks
+
+    def _claim(self, name: str) -> Optional[Lease]:
+        record, etag = self._read(name=name)
+        if record['done'] or (
+            record['owner'] and record['expires'] > time()
+        ):
+            return None
+        record.update(owner=self.worker, expires=time() + self.lease_seconds)
+        etag = self._write(name=name, record=record, etag=etag)
+        return Lease(name=name, record=record, etag=etag) if etag else None
+
+    def claim(self) -> Optional[Lease]:
+        """Claims a pending chunk or a chunk whose lease expired.
+
+        Workers start looking at different chunks, so they seldom claim
+        the same one, the worker losing the race moves on to the next.
+
+        Returns:
+            Lease of the chunk, None if no chunk can be claimed now.
+        """
+        chunks = self.chunks()
+        start = crc32(self.worker.encode()) % max(chunks, 1)
+        for offset in range(chunks):
+            name = self._chunk_name(index=(start + offset) % chunks)
+            if name in self._done:
+                continue
+            lease = self._claim(name=name)
+            if lease:
+                return lease
+        return None
+
+    def claim_merge(self) -> Optional[Lease]:
+        """Claims merging of the outputs once all chunks are done."""
+        if self.remaining():
+            return None
+        return self._claim(name=_MERGE)
+
+    def _update(self, lease: Lease, **fields: Any) -> bool:
+        with lease.lock:
+            if lease.lost:
+                return False
+            record = {**lease.record, **fields}
+            etag = self._write(name=lease.name, record=record, etag=lease.etag)
+            if not etag:
+                lease.lost = True
+                return False
+            lease.record, lease.etag = record, etag
+            return True
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """Extends the lease, returns False if the lease was lost."""
+        return self._update(lease=lease, expires=time() + self.lease_seconds)
+
+    @contextmanager
+    def keep_alive(self, lease: Lease) -> Iterator[Lease]:
+        """Renews the lease in the background while the chunk is computed."""
+        stopped = Event()
+
+        def renew() -> None:
+            while not stopped.wait(timeout=self.lease_seconds / 3):
+                if not self.heartbeat(lease=lease):
+                    return
+
+        thread = Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield lease
+        finally:
+            stopped.set()
+            thread.join()
+
+    def release(self, lease: Lease) -> bool:
+        """Gives the chunk back so that others do not wait for expiry."""
+        return self._update(lease=lease, owner=None, expires=0.0)
+
+    def _output_name(self, name: str) -> str:
+        return f'{self._prefix}outputs/{name}'
+
+    def complete(
+        self, lease: Lease, computed: Iterable[int],
+        output: Optional[bytes] = None
+    ) -> bool:
+        """Saves the output of the chunk and marks the chunk done.
+
+        The output is saved first, if the lease was lost meanwhile, it is
+        replaced by the output of the worker computing the chunk again.
+
+        Returns:
+            False if the lease was lost.
+        """
+        if output is not None:
+            self._objects.write_object(
+                object_name=self._output_name(name=lease.name), body=output
+            )
+        if not self._update(
+            lease=lease, done=True, computed=sorted(computed)
+        ):
+            return False
+        self._done.add(lease.name)
+        return True
+
+    def remaining(self) -> int:
+        """Returns the number of chunks not done yet."""
+        remaining = 0
+        for index in range(self.chunks()):
+            name = self._chunk_name(index=index)
+            if name in self._done:
+                continue
+            record, _ = self._read(name=name)
+            if record['done']:
+                self._done.add(name)
+            else:
+                remaining += 1
+        return remaining
+
+    def merged(self) -> bool:
+        record, _ = self._read(name=_MERGE)
+        return bool(record and record['done'])
+
+    def outputs(self) -> Iterator[Tuple[List[int], Optional[bytes]]]:
+        """Yields the IDs computed in every chunk with its output in order."""
+        for index in range(self.chunks()):
+            name = self._chunk_name(index=index)
+            record, _ = self._read(name=name)
+            yield record['computed'], self._objects.read_object(
+                object_name=self._output_name(name=name)
+            )
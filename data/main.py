@@ -1,8 +1,12 @@
 
 from argparse import ArgumentParser, RawTextHelpFormatter
+from os import getpid
+from socket import gethostname
 
+from data_gathering.cassette import Cassette
 from data_gathering.config import config_values
-from data_gathering.dataset import Dataset
+from data_gathering.connection import use_cassette
+from data_gathering.dataset import Dataset, OfflineDataset
 
 
 parser = ArgumentParser(formatter_class=RawTextHelpFormatter)
@@ -46,14 +50,66 @@ parser.add_argument(
          '  - unmaintained_csv_file - path to file into which will be' +
          'saved features of maintained repositories'
 )
+parser.add_argument(
+    '-w', '--workers', action='store', type=int, dest='workers', default=1,
+    help='Number of repositories whose features are computed \n' +
+         'concurrently, used together with --compute-features'
+)
+parser.add_argument(
+    '-r', '--refresh', action='store_true', dest='refresh', default=False,
+    help='Recompute only stale features of the repositories in the \n' +
+         'feature store and regenerate the CSV from it, used together \n' +
+         'with --compute-features'
+)
+parser.add_argument(
+    '-g', '--graphql', action='store_true', dest='graphql', default=False,
+    help='Fetch features of each repository with a few GraphQL queries \n' +
+         'instead of one or more REST calls per feature, used together \n' +
+         'with --compute-features'
+)
+parser.add_argument(
+    '-q', '--work-queue', action='store', dest='work_queue', metavar='NAME',
+    help='Share the IDs with other workers through the named work queue, \n' +
+         'every worker computes the chunks of IDs it claims, used \n' +
+         'together with --compute-features'
+)
+parser.add_argument(
+    '--worker', action='store', dest='worker', metavar='NAME',
+    help='Name of the worker in the work queue, unique among the \n' +
+         'workers, defaults to the host name and the process ID'
+)
+
+parser.add_argument(
+    '--record', action='store', dest='record', metavar='CASSETTE',
+    help='Record all Github responses into the cassette file, nothing \n' +
+         'is downloaded from or uploaded to S3'
+)
+parser.add_argument(
+    '--replay', action='store', dest='replay', metavar='CASSETTE',
+    help='Serve all Github responses from the cassette file without \n' +
+         'any network access, nothing is downloaded from or uploaded to S3'
+)
 
 args = parser.parse_args()
 
 if args.search and args.compute:
     print('Use at most one argument')
     exit(1)
+if args.work_queue and args.refresh:
+    print('Use at most one of --work-queue and --refresh')
+    exit(1)
+if args.record and args.replay:
+    print('Use at most one of --record and --replay')
+    exit(1)
 
-dataset = Dataset()
+if args.record or args.replay:
+    # its stats are logged at the end of the run
+    use_cassette(cassette=Cassette(
+        file_name=args.replay or args.record, replay=bool(args.replay)
+    ))
+    dataset = OfflineDataset()
+else:
+    dataset = Dataset()
 
 s3_config_values = config_values['s3_handling']
 if args.search:
@@ -64,8 +120,10 @@ if args.search:
     search_config_values = config_values['search_repos']
     if args.type == 'maintained':
         query = search_config_values['queries']['maintained']
+        slices_file = search_config_values['slices_files']['maintained']
     else:
         query = search_config_values['queries']['unmaintained']
+        slices_file = search_config_values['slices_files']['unmaintained']
 
     dataset.search_repos(
         end_condition=search_config_values['end_condition'],
@@ -78,29 +136,77 @@ if args.search:
         not_suitable_ids_file=search_config_values['not_suitable_ids'],
         file_name_prefix=s3_config_values['file_name_prefix'],
         region_name=s3_config_values['region'],
-        logger_name=search_config_values['logger_file'], query=query
+        logger_name=search_config_values['logger_file'], query=query,
+        segmented_upload=s3_config_values['segmented_upload'],
+        max_segments=s3_config_values['max_segments'],
+        slices_file_name=slices_file
     )
 
 elif args.compute:
     compute_config_values = config_values['compute_features']
     if args.compute == 'unmaintained':
         csv_file = compute_config_values['unmaintained']['csv_file']
+        parquet_file = compute_config_values['unmaintained']['parquet_file']
         ids_file = compute_config_values['unmaintained']['ids_file']
         logger_file = compute_config_values['unmaintained']['logger_file'] 
+        feature_store_file = compute_config_values['unmaintained'][
+            'feature_store_file'
+        ]
     elif args.compute == 'maintained':
         csv_file = compute_config_values['maintained']['csv_file']
+        parquet_file = compute_config_values['maintained']['parquet_file']
         ids_file = compute_config_values['maintained']['ids_file']
         logger_file = compute_config_values['maintained']['logger_file'] 
+        feature_store_file = compute_config_values['maintained'][
+            'feature_store_file'
+        ]
     else:
         print('Wrong --compute_features value')
         exit(1)
 
-    dataset.compute_features(
-        features_file=compute_config_values['features'],
-        partial_upload_size=compute_config_values['partial_upload_size'],
-        csv_file_name=csv_file,
-        ids_file_name=ids_file,
-        file_name_prefix=s3_config_values['file_name_prefix'],
-        region_name=s3_config_values['region'],
-        logger_name=logger_file
-    )
+    profile_cache_config_values = compute_config_values['profile_cache']
+    if args.work_queue:
+        work_queue_config_values = compute_config_values['work_queue']
+        dataset.compute_features_sharded(
+            features_file=compute_config_values['features'],
+            csv_file_name=csv_file,
+            ids_file_name=ids_file,
+            file_name_prefix=s3_config_values['file_name_prefix'],
+            region_name=s3_config_values['region'],
+            logger_name=logger_file, queue_name=args.work_queue,
+            worker_name=args.worker or f'{gethostname()}-{getpid()}',
+            chunk_size=work_queue_config_values['chunk_size'],
+            lease_seconds=work_queue_config_values['lease_seconds'],
+            objects_file=work_queue_config_values['objects_file'],
+            graphql=args.graphql,
+            profile_cache_file=profile_cache_config_values['file'],
+            profile_cache_size=profile_cache_config_values['max_size'],
+            profile_cache_ttl=profile_cache_config_values['ttl_days'],
+            workers=args.workers, parquet_file_name=parquet_file,
+            csv_export=compute_config_values['csv_export'],
+            segmented_upload=s3_config_values['segmented_upload'],
+            max_segments=s3_config_values['max_segments'],
+            contributor_stats=compute_config_values['contributor_stats']
+        )
+    else:
+        dataset.compute_features(
+            features_file=compute_config_values['features'],
+            partial_upload_size=compute_config_values['partial_upload_size'],
+            csv_file_name=csv_file,
+            ids_file_name=ids_file,
+            file_name_prefix=s3_config_values['file_name_prefix'],
+            region_name=s3_config_values['region'],
+            logger_name=logger_file, graphql=args.graphql,
+            profile_cache_file=profile_cache_config_values['file'],
+            profile_cache_size=profile_cache_config_values['max_size'],
+            profile_cache_ttl=profile_cache_config_values['ttl_days'],
+            workers=args.workers, feature_store_file=feature_store_file,
+            feature_store_max_age=compute_config_values[
+                'feature_store_max_age'
+            ],
+            refresh=args.refresh, parquet_file_name=parquet_file,
+            csv_export=compute_config_values['csv_export'],
+            segmented_upload=s3_config_values['segmented_upload'],
+            max_segments=s3_config_values['max_segments'],
+            contributor_stats=compute_config_values['contributor_stats']
+        )
@@ -0,0 +1,39 @@
+from os import chdir, environ, path
+from shutil import copytree
+from tempfile import mkdtemp
+
+from pytest import fixture
+
+# importing the package creates files (e.g. the HTTP cache) in the working
+# directory, they are kept out of the repository
+chdir(mkdtemp())
+# S3 is mocked, the bucket is read from the environment when imported
+environ.update(
+    BUCKET_NAME='data-gathering-test', AWS_ACCESS_KEY_ID='testing',
+    AWS_SECRET_ACCESS_KEY='testing'
+)
+environ.pop('ENDPOINT_URL', None)
+
+
+@fixture(scope='session')
+def configs():
+    """Configs copied into the working directory, which they are read from."""
+    copytree(
+        path.join(path.dirname(path.dirname(__file__)), 'configs'),
+        'configs', dirs_exist_ok=True
+    )
+
+
+@fixture
+def bucket():
+    """Mocked S3 with an empty bucket."""
+    from moto import mock_aws
+
+    from data_gathering.s3_handler import S3Handler
+
+    with mock_aws():
+        S3Handler(region_name='eu-central-1').create_bucket()
+        yield environ['BUCKET_NAME']
+        S3Handler._manifests.clear()
+        S3Handler._bucket_exists = False
+        S3Handler._conditional_writes = True
@@ -0,0 +1,176 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from math import ceil
+from threading import Lock, Thread
+from time import sleep, time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+from github import Github
+
+
+# status, body and headers of a response, a handler gets the query and the
+# request body and returns the response
+Response = Tuple[int, Any, Dict[str, str]]
+Handler = Callable[[Dict[str, List[str]], Optional[bytes]], Response]
+
+
+class FakeGithub:
+    """Github API served locally from a table of routes.
+
+    Routes are keyed by the method and the path, bodies are sent as JSON.
+    Every request is kept in requests as the method, the path with the
+    query and the body. Routes given an ETag answer requests with the
+    same If-None-Match by 304 Not Modified, counted in not_modified.
+    Responses are delayed by latency. With a rate
+    limit, every token gets that many requests in a window of
+    reset_seconds and the X-RateLimit-* headers, further requests are
+    refused until the window resets.
+    """
+
+    def __init__(
+        self, latency: float = 0.0, rate_limit: Optional[int] = None,
+        reset_seconds: float = 60.0
+    ) -> None:
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._etags: Dict[Tuple[str, str], str] = {}
+        self.not_modified = 0
+        self.requests: List[Tuple[str, str, Optional[bytes]]] = []
+        self._latency = latency
+        self._rate_limit = rate_limit
+        self._reset_seconds = reset_seconds
+        # requests made and the reset time by the authorization header
+        self._windows: Dict[Optional[str], Tuple[int, float]] = {}
+        self._lock = Lock()
+        self.limited = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def route(
+        self, verb: str, path: str,
+        response: Union[Handler, Tuple[int, Any]],
+        etag: Optional[str] = None
+    ) -> None:
+        if etag:
+            self._etags[(verb, path)] = etag
+        else:
+            self._etags.pop((verb, path), None)
+        if callable(response):
+            self._routes[(verb, path)] = response
+        else:
+            status, body = response
+            self._routes[(verb, path)] = lambda query, data: (
+                status, body, {}
+            )
+
+    def requested(self, verb: str, path: str) -> int:
+        return sum(
+            1 for request in self.requests
+            if request[0] == verb and urlparse(request[1]).path == path
+        )
+
+    def github(self, token: str = 'token') -> Github:
+        return Github(login_or_token=token, base_url=self.url, retry=None)
+
+    def __enter__(self) -> 'FakeGithub':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _limit(self, authorization: Optional[str]) -> Dict[str, str]:
+        with self._lock:
+            now = time()
+            used, reset = self._windows.get(authorization, (0, 0.0))
+            if now >= reset:
+                used, reset = 0, now + self._reset_seconds
+            used += 1
+            self._windows[authorization] = (used, reset)
+        return {
+            'X-RateLimit-Limit': str(self._rate_limit),
+            'X-RateLimit-Remaining': str(max(self._rate_limit - used, 0)),
+            'X-RateLimit-Reset': str(ceil(reset)),
+            'X-RateLimit-Used': str(used),
+        }
+
+    def _respond(
+        self, verb: str, target: str, data: Optional[bytes],
+        authorization: Optional[str] = None,
+        if_none_match: Optional[str] = None
+    ) -> Response:
+        with self._lock:
+            self.requests.append((verb, target, data))
+        if self._latency:
+            sleep(self._latency)
+        limits = {}
+        if self._rate_limit is not None:
+            limits = self._limit(authorization=authorization)
+            if int(limits['X-RateLimit-Used']) > self._rate_limit:
+                with self._lock:
+                    self.limited += 1
+                return 403, {'message': 'API rate limit exceeded'}, limits
+        url = urlparse(target)
+        handler = self._routes.get((verb, url.path))
+        if not handler:
+            return 404, {'message': 'Not Found'}, limits
+        etag = self._etags.get((verb, url.path))
+        if etag and if_none_match == etag:
+            with self._lock:
+                self.not_modified += 1
+            return 304, None, {**limits, 'ETag': etag}
+        status, body, headers = handler(parse_qs(url.query), data)
+        if etag:
+            headers = {**headers, 'ETag': etag}
+        return status, body, {**limits, **headers}
+
+    def _handler(self) -> Any:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def _serve(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                data = self.rfile.read(length) if length else None
+                status, body, headers = fake._respond(
+                    verb=self.command, target=self.path, data=data,
+                    authorization=self.headers.get('Authorization'),
+                    if_none_match=self.headers.get('If-None-Match')
+                )
+                payload = b'' if body is None else dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = _serve
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def repo_json(url: str, owner: str = 'owner', name: str = 'repo') -> Any:
+    return {
+        'id': 1, 'name': name, 'full_name': f'{owner}/{name}',
+        'url': f'{url}/repos/{owner}/{name}',
+        'owner': {
+            'login': owner, 'type': 'User',
+            'url': f'{url}/users/{owner}'
+        },
+        'pushed_at': '2020-06-01T00:00:00Z',
+        'updated_at': '2020-06-01T00:00:00Z',
+        'created_at': '2015-01-01T00:00:00Z',
+        'default_branch': 'master', 'language': 'Python',
+        'fork': False, 'archived': False, 'size': 100,
+        'forks_count': 3, 'stargazers_count': 5, 'watchers_count': 5,
+    }
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+from pytest import fixture, raises
+
+from data_gathering import cassette
+from data_gathering.cassette import Cassette, CassetteMiss
+from data_gathering.connection import use_cassette
+from data_gathering.repository_data import RepositoryData
+
+from .fake_github import FakeGithub, repo_json
+
+
+COMMITS_PATH = '/repos/owner/repo/commits'
+COMMIT = {
+    'sha': '0' * 40,
+    'commit': {
+        'author': {'name': 'alice', 'date': '2020-06-01T00:00:00Z'},
+        'committer': {'name': 'alice', 'date': '2020-06-01T00:00:00Z'},
+    },
+    'author': {'login': 'alice'},
+}
+
+
+class Clock(datetime):
+    at = datetime(2021, 1, 1, 12)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.at
+
+
+@fixture(autouse=True)
+def clock(monkeypatch):
+    monkeypatch.setattr(cassette, 'datetime', Clock)
+    yield Clock
+    use_cassette(cassette=None)
+
+
+def _list_commits(query, data):
+    since = query.get('since')
+    if since and since[0] > '2020-06-01T00:00:00Z':
+        return 200, [], {}
+    return 200, [COMMIT], {}
+
+
+def _features(fake):
+    repo_data = RepositoryData(git=fake.github())
+    repo_data.set_repo(repo_name_or_id='owner/repo')
+    return (
+        repo_data.commit_in_days(days=365),
+        repo_data.commit_in_days(days=100),
+        repo_data.last_commit_age(),
+    )
+
+
+def test_replay_runs_at_the_time_of_the_recording(clock):
+    with FakeGithub() as fake:
+        fake.route('GET', '/repos/owner/repo', (200, repo_json(url=fake.url)))
+        fake.route('GET', COMMITS_PATH, _list_commits)
+        use_cassette(cassette=Cassette(file_name='cassette.sqlite'))
+        recorded = _features(fake)
+
+    # the time derived requests of a later replay are the recorded ones
+    clock.at = datetime(2021, 9, 1, 12)
+    use_cassette(
+        cassette=Cassette(file_name='cassette.sqlite', replay=True)
+    )
+    assert _features(fake) == recorded == (True, False, 214)
+
+
+def test_replay_of_a_request_not_recorded():
+    with FakeGithub() as fake:
+        use_cassette(cassette=Cassette(file_name='empty.sqlite', replay=True))
+
+        with raises(CassetteMiss):
+            fake.github().get_repo('owner/repo')
+        assert not fake.requests
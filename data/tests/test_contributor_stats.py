@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+
+from github import Consts
+from pytest import fixture
+
+from data_gathering.contributor_stats import fetch_contributor_stats
+from data_gathering.repository_data import RepositoryData
+
+from .fake_github import FakeGithub, repo_json
+
+
+STATS_PATH = '/repos/owner/repo/stats/contributors'
+EPOCH = datetime(1970, 1, 1)
+AUTHOR_FEATURES = (
+    'commits_by_dev_with_most_commits', 'magnetism', 'stickiness'
+)
+
+
+@fixture(autouse=True)
+def no_202_wait(monkeypatch):
+    monkeypatch.setattr(Consts, 'PROCESSING_202_WAIT_TIME', 0)
+
+
+def _repo(fake):
+    fake.route('GET', '/repos/owner/repo', (200, repo_json(url=fake.url)))
+    return fake.github().get_repo('owner/repo')
+
+
+def test_statistics_never_ready_give_up_after_attempts():
+    with FakeGithub() as fake:
+        fake.route('GET', STATS_PATH, (202, {}))
+        repo = _repo(fake)
+
+        assert fetch_contributor_stats(repo=repo, attempts=2) is None
+        assert fake.requested('GET', STATS_PATH) == 2
+
+
+def test_statistics_ready_after_accepted():
+    answers = iter([(202, {}, {})] * 2)
+
+    def stats(query, data):
+        return next(answers, (200, [{
+            'author': {'login': 'alice'}, 'total': 3,
+            'weeks': [{'w': 1577836800, 'a': 0, 'd': 0, 'c': 3}]
+        }], {}))
+
+    with FakeGithub() as fake:
+        fake.route('GET', STATS_PATH, stats)
+        repo = _repo(fake)
+
+        timeline = fetch_contributor_stats(repo=repo, attempts=4)
+
+        assert fake.requested('GET', STATS_PATH) == 3
+        assert timeline.most_commits_by_name() == ('alice', 3)
+
+
+def _week(date):
+    start = date - timedelta(days=(date.weekday() + 1) % 7)
+    return datetime(start.year, start.month, start.day)
+
+
+def _serve_history(fake, commits):
+    """Serves the commits, newest first, and the statistics made of them.
+
+    Commits are given as the author name, the login and the date.
+    """
+    commits = sorted(commits, key=lambda commit: commit[2], reverse=True)
+    listed = [{
+        'sha': f'{index:040x}',
+        'commit': {
+            'author': {'name': name, 'date': f'{date.isoformat()}Z'},
+            'committer': {'name': name, 'date': f'{date.isoformat()}Z'},
+        },
+        'author': {'login': login},
+    } for index, (name, login, date) in enumerate(commits)]
+    weeks = {}
+    for _, login, date in commits:
+        counts = weeks.setdefault(login, {})
+        counts[_week(date)] = counts.get(_week(date), 0) + 1
+    stats = [{
+        'author': {'login': login}, 'total': sum(counts.values()),
+        'weeks': [
+            {'w': int((week - EPOCH).total_seconds()), 'c': count}
+            for week, count in sorted(counts.items())
+        ]
+    } for login, counts in weeks.items()]
+
+    def list_commits(query, data):
+        per_page = int(query.get('per_page', ['30'])[0])
+        return 200, listed[:per_page], {}
+
+    fake.route('GET', '/repos/owner/repo/commits', list_commits)
+    fake.route('GET', STATS_PATH, (200, stats))
+
+
+def _author_features(fake, contributor_stats):
+    repo_data = RepositoryData(
+        git=fake.github(), contributor_stats=contributor_stats
+    )
+    repo_data.set_repo(repo=_repo(fake))
+    return {
+        feature: getattr(repo_data, feature)()
+        for feature in AUTHOR_FEATURES
+    }
+
+
+# commits away from the week boundaries of the thresholds, in 2020-06-01
+# back 730 and 365 days
+HISTORY = [
+    ('carol', 'carol', datetime(2015, 3, 4, 10)),
+    ('carol', 'carol', datetime(2016, 5, 6, 10)),
+    ('alice', 'alice', datetime(2016, 7, 8, 10)),
+    ('alice', 'alice', datetime(2017, 9, 10, 10)),
+    ('bob', 'bob', datetime(2018, 11, 12, 10)),
+    ('dave', 'dave', datetime(2019, 1, 14, 10)),
+    ('alice', 'alice', datetime(2019, 11, 20, 10)),
+    ('bob', 'bob', datetime(2020, 2, 3, 10)),
+    ('alice', 'alice', datetime(2020, 6, 1, 10)),
+]
+
+
+def test_statistics_match_history_when_names_are_logins():
+    with FakeGithub() as fake:
+        _serve_history(fake, commits=HISTORY)
+
+        from_history = _author_features(fake, contributor_stats=False)
+        from_stats = _author_features(fake, contributor_stats=True)
+
+        assert fake.requested('GET', STATS_PATH) == 1
+        assert from_history == {
+            'commits_by_dev_with_most_commits': 4,
+            'magnetism': 1.0,
+            'stickiness': 0.5,
+        }
+        assert from_stats == from_history
+
+
+def test_statistics_diverge_from_history_by_names():
+    # the history tells authors by the name of the commit, the statistics
+    # by the login only, so commits of an author under two names add up
+    history = [
+        ('Alice Smith' if name == 'alice' and date.year < 2019 else name,
+         login, date)
+        for name, login, date in HISTORY
+    ]
+    with FakeGithub() as fake:
+        _serve_history(fake, commits=history)
+
+        from_history = _author_features(fake, contributor_stats=False)
+        from_stats = _author_features(fake, contributor_stats=True)
+
+        assert from_history['commits_by_dev_with_most_commits'] == 2
+        assert from_stats['commits_by_dev_with_most_commits'] == 4
+        # alice of 2019 on is a new author in the history
+        assert from_history['magnetism'] == 3 / 2
+        assert from_stats['magnetism'] == 1.0
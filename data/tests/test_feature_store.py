@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from data_gathering.dataset import Dataset
+from data_gathering.dataset_writer import DatasetWriter
+from data_gathering.feature_store import FeatureStore
+from data_gathering.repository_data import COULD_NOT_COMPUTE
+
+
+FEATURES = ['url', 'forks_count', 'stargazers_count']
+PUSHED_AT = datetime(2020, 1, 1)
+
+
+def _store(*repos):
+    store = FeatureStore()
+    for repo_id, values in repos:
+        store.save(
+            repo_id=repo_id, values=values, pushed_at=PUSHED_AT,
+            updated_at=PUSHED_AT
+        )
+    return store
+
+
+def _csv(tmp_path, rows):
+    file_name = str(tmp_path / 'maintained.csv')
+    writer = DatasetWriter(features=FEATURES, csv_file_name=file_name)
+    for row in rows:
+        writer.write_row(row=row)
+    writer.close()
+    return file_name
+
+
+def test_rows_keep_repos_with_missing_values():
+    # values that could not be computed are never saved
+    store = _store(
+        (1, {'url': 'u1', 'forks_count': 1, 'stargazers_count': 2}),
+        (2, {'url': 'u2', 'forks_count': 3}),
+    )
+
+    assert list(store.rows(features=FEATURES, missing=COULD_NOT_COMPUTE)) == [
+        ['u1', 1, 2], ['u2', 3, COULD_NOT_COMPUTE]
+    ]
+
+
+def test_store_covers_published_urls(tmp_path):
+    csv_file_name = _csv(tmp_path, rows=[['u1', 1, 2], ['u2', 3, 4]])
+    store = _store(
+        (1, {'url': 'u1'}), (2, {'url': 'u2'}), (3, {'url': 'u3'})
+    )
+
+    assert Dataset._store_covers(
+        feature_store=store, features=FEATURES, csv_file_name=csv_file_name,
+        parquet_file_name=None
+    )
+
+
+def test_store_missing_published_repo_does_not_cover(tmp_path):
+    csv_file_name = _csv(tmp_path, rows=[['u1', 1, 2], ['u2', 3, 4]])
+    store = _store((1, {'url': 'u1'}), (3, {'url': 'u3'}))
+
+    assert not Dataset._store_covers(
+        feature_store=store, features=FEATURES, csv_file_name=csv_file_name,
+        parquet_file_name=None
+    )
+
+
+def test_empty_store_does_not_cover_parquet(tmp_path):
+    parquet_file_name = str(tmp_path / 'maintained.parquet')
+    writer = DatasetWriter(
+        features=FEATURES, parquet_file_name=parquet_file_name
+    )
+    writer.write_row(row=['u1', 1, 2])
+    writer.close()
+
+    assert not Dataset._store_covers(
+        feature_store=_store(), features=FEATURES, csv_file_name=None,
+        parquet_file_name=parquet_file_name
+    )
+
+
+def test_store_covers_without_published_file(tmp_path):
+    assert Dataset._store_covers(
+        feature_store=_store(), features=FEATURES,
+        csv_file_name=str(tmp_path / 'missing.csv'), parquet_file_name=None
+    )
@@ -0,0 +1,121 @@
+from json import loads
+from logging import getLogger
+
+from data_gathering.graphql_data import GraphQLRepositoryData
+from data_gathering.repository_data import RepositoryData
+
+from .fake_github import FakeGithub, repo_json
+
+
+FEATURES = [
+    'owner_type', 'owner_projects_count', 'owner_followers',
+    'owner_following', 'branches_count', 'last_commit_age',
+]
+OWNER = {
+    'login': 'owner', 'type': 'Organization',
+    'created_at': '2012-01-01T00:00:00Z', 'public_repos': 4,
+    'followers': 7, 'following': 0,
+}
+HEAD = {
+    'sha': '0' * 40,
+    'commit': {
+        'author': {'name': 'alice', 'date': '2020-06-01T00:00:00Z'},
+        'committer': {'name': 'alice', 'date': '2020-06-01T00:00:00Z'},
+    },
+    'author': {'login': 'alice'},
+}
+
+
+class RenewingPool:
+    """Pool handing out instances of the fake API."""
+
+    def __init__(self, fake):
+        self.fake = fake
+        self.renewed = 0
+        self.resources = []
+
+    def renew(self, git, logger=None, resource='core'):
+        self.renewed += 1
+        self.resources.append(resource)
+        return self.fake.github(token=f'token{self.renewed}')
+
+    def release(self, git):
+        pass
+
+
+def _graphql(query, data):
+    assert 'repositories' in loads(data)['query']
+    # organizations have no followers in GraphQL
+    return 200, {'data': {'repository': {
+        'owner': {
+            '__typename': 'Organization',
+            'createdAt': '2012-01-01T00:00:00Z',
+            'repositories': {'totalCount': 4},
+        },
+        'defaultBranchRef': {'target': {
+            'oid': '0' * 40, 'committedDate': '2020-06-01T00:00:00Z',
+            'history': {'totalCount': 1},
+        }},
+        'branches': {'totalCount': 3},
+    }}}, {}
+
+
+def _serve(fake, graphql):
+    repo = repo_json(url=fake.url)
+    repo['owner']['type'] = 'Organization'
+    fake.route('GET', '/repos/owner/repo', (200, repo))
+    fake.route('GET', '/repositories/1', (200, repo))
+    fake.route('GET', '/users/owner', (200, OWNER))
+    fake.route('GET', '/repos/owner/repo/commits', (200, [HEAD]))
+    fake.route('GET', '/repos/owner/repo/branches', lambda query, data: (
+        200, [{'name': 'master'}], {
+            'Link': f'<{fake.url}/repos/owner/repo/branches?per_page=1' +
+                    '&page=3>; rel="last"'
+        }
+    ))
+    fake.route('POST', '/graphql', graphql)
+
+
+def _row(repo_data):
+    repo_data.set_repo(repo_name_or_id='owner/repo')
+    return repo_data.get_row(features=FEATURES, logger=getLogger('test'))
+
+
+def test_graphql_row_matches_rest_row_of_an_organization():
+    with FakeGithub() as fake:
+        _serve(fake, graphql=_graphql)
+
+        graphql_row = _row(GraphQLRepositoryData(
+            git=fake.github(), endpoint=f'{fake.url}/graphql'
+        ))
+        assert fake.requested('POST', '/graphql') == 1
+        assert not fake.requested('GET', '/repos/owner/repo/branches')
+        rest_row = _row(RepositoryData(git=fake.github()))
+
+        assert graphql_row == rest_row
+        assert graphql_row[2:4] == [7, 0]
+
+
+def test_prefetch_is_retried_after_the_rate_limit():
+    answers = iter([(403, {'message': 'API rate limit exceeded'}, {
+        'X-RateLimit-Remaining': '0', 'X-RateLimit-Limit': '5000',
+        'X-RateLimit-Reset': '0', 'X-RateLimit-Resource': 'graphql',
+    })])
+
+    def graphql(query, data):
+        return next(answers, None) or _graphql(query, data)
+
+    with FakeGithub() as fake:
+        _serve(fake, graphql=graphql)
+        pool = RenewingPool(fake)
+
+        repo_data = GraphQLRepositoryData(
+            git=fake.github(), token_pool=pool,
+            endpoint=f'{fake.url}/graphql'
+        )
+        row = _row(repo_data)
+
+        assert pool.resources == ['graphql']
+        assert fake.requested('POST', '/graphql') == 2
+        assert row[4] == 3
+        assert not fake.requested('GET', '/repos/owner/repo/branches')
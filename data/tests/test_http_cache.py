@@ -0,0 +1,68 @@
+from pytest import fixture
+
+from data_gathering import HTTP_CACHE, METRICS
+from data_gathering.connection import install
+from data_gathering.http_cache import HttpCache
+
+from tests.fake_github import FakeGithub, repo_json
+
+
+@fixture
+def cache():
+    """Fresh HTTP cache of Github instances created within the test."""
+    cache = HttpCache()
+    install(cache=cache)
+    yield cache
+    install(cache=HTTP_CACHE, metrics=METRICS)
+
+
+def test_not_modified_response_is_served_from_cache(cache):
+    with FakeGithub() as fake:
+        fake.route(
+            'GET', '/repos/owner/repo', (200, repo_json(url=fake.url)),
+            etag='"v1"'
+        )
+        git = fake.github()
+
+        assert git.get_repo('owner/repo').forks_count == 3
+        assert git.get_repo('owner/repo').forks_count == 3
+
+        assert fake.requested('GET', '/repos/owner/repo') == 2
+        assert fake.not_modified == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_changed_response_replaces_cached_one(cache):
+    with FakeGithub() as fake:
+        repo = repo_json(url=fake.url)
+        fake.route('GET', '/repos/owner/repo', (200, repo), etag='"v1"')
+        git = fake.github()
+        git.get_repo('owner/repo')
+
+        fake.route(
+            'GET', '/repos/owner/repo', (200, {**repo, 'forks_count': 4}),
+            etag='"v2"'
+        )
+        assert git.get_repo('owner/repo').forks_count == 4
+        assert git.get_repo('owner/repo').forks_count == 4
+
+        assert fake.not_modified == 1
+
+
+def test_response_evicted_before_not_modified_is_requested_again(
+    cache, monkeypatch
+):
+    with FakeGithub() as fake:
+        fake.route(
+            'GET', '/repos/owner/repo', (200, repo_json(url=fake.url)),
+            etag='"v1"'
+        )
+        git = fake.github()
+        git.get_repo('owner/repo')
+        # evicted by another thread once the validators were sent
+        monkeypatch.setattr(cache, 'get', lambda key: None)
+
+        assert git.get_repo('owner/repo').forks_count == 3
+
+        assert fake.requested('GET', '/repos/owner/repo') == 3
+        assert fake.not_modified == 1
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from data_gathering import profile_cache
+from data_gathering.profile_cache import Profile, ProfileCache
+
+
+def _user(login, followers=1):
+    return SimpleNamespace(
+        login=login, created_at=datetime(2015, 1, 1), followers=followers,
+        following=2, public_repos=3
+    )
+
+
+def _clock(monkeypatch, now):
+    monkeypatch.setattr(profile_cache, 'time', lambda: now[0])
+
+
+def test_profiles_are_fetched_again_after_ttl(monkeypatch, tmp_path):
+    now = [1000.0]
+    _clock(monkeypatch, now)
+    file_name = str(tmp_path / 'profiles.sqlite')
+    cache = ProfileCache(file_name=file_name, ttl=timedelta(seconds=60))
+
+    assert cache.get(_user('alice')).followers == 1
+    now[0] += 59
+    assert cache.get(_user('alice', followers=5)).followers == 1
+    # a new process reads the profile from the database
+    assert ProfileCache(
+        file_name=file_name, ttl=timedelta(seconds=60)
+    ).get(_user('alice', followers=5)).followers == 1
+
+    now[0] += 1
+    assert cache.get(_user('alice', followers=5)) == Profile(
+        created_at=datetime(2015, 1, 1), followers=5, following=2,
+        public_repos=3
+    )
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_profiles_are_evicted(monkeypatch):
+    now = [1000.0]
+    _clock(monkeypatch, now)
+    cache = ProfileCache(max_size=10, memory_size=0)
+
+    for index in range(100):
+        if index == 95:
+            # used again, so kept over the profiles fetched after it
+            now[0] += 1
+            cache.get(_user('user0'))
+        now[0] += 1
+        cache.get(_user(f'user{index}'))
+
+    logins = {
+        row[0] for row in cache._connection.execute(
+            'SELECT login FROM profiles'
+        )
+    }
+    assert logins == {'user0'} | {f'user{index}' for index in range(91, 100)}
@@ -0,0 +1,90 @@
+from pytest import fixture, mark
+
+from data_gathering.repository_data import RepositoryData
+
+from .fake_github import FakeGithub, repo_json
+
+
+COMMITS_PATH = '/repos/owner/repo/commits'
+
+
+@fixture(autouse=True)
+def use_configs(configs):
+    pass
+
+
+def _commit(index, date):
+    return {
+        'sha': f'{index:040x}',
+        'commit': {
+            'author': {'name': 'alice', 'date': date},
+            'committer': {'name': 'alice', 'date': date},
+        },
+        'author': {'login': 'alice'},
+    }
+
+
+def _serve_commits(fake, dates):
+    """Serves the commits of the dates, newest first, paginated."""
+    commits = [_commit(index, date) for index, date in enumerate(dates)]
+
+    def list_commits(query, data):
+        per_page = int(query['per_page'][0])
+        page = int(query.get('page', ['1'])[0])
+        last = (len(commits) + per_page - 1) // per_page
+        url = f'{fake.url}{COMMITS_PATH}?per_page={per_page}'
+        links = [f'<{url}&page={last}>; rel="last"'] if last > 1 else []
+        start = (page - 1) * per_page
+        return 200, commits[start:start + per_page], {
+            'Link': ', '.join(links)
+        } if links else {}
+
+    fake.route('GET', COMMITS_PATH, list_commits)
+
+
+def _repo_data(fake, **fields):
+    fake.route('GET', '/repos/owner/repo', (200, {
+        **repo_json(url=fake.url), **fields
+    }))
+    fake.route('GET', '/repos/owner/repo/languages', (200, {'Python': 100}))
+    repo_data = RepositoryData(git=fake.github())
+    repo_data.set_repo(repo_name_or_id='owner/repo')
+    return repo_data
+
+
+def test_suitable_reads_only_the_newest_and_oldest_commit():
+    dates = [
+        f'{year}-06-01T00:00:00Z' for year in range(2020, 2014, -1)
+    ] * 50
+    with FakeGithub() as fake:
+        _serve_commits(fake, dates=sorted(dates, reverse=True))
+        repo_data = _repo_data(fake)
+
+        assert repo_data.suitable()
+        assert fake.requested('GET', COMMITS_PATH) == 2
+        assert repo_data.development_time() == 1827
+        assert repo_data._commits is None
+
+
+def test_development_time_of_a_single_commit():
+    with FakeGithub() as fake:
+        _serve_commits(fake, dates=['2020-06-01T00:00:00Z'])
+        repo_data = _repo_data(fake)
+
+        assert repo_data.development_time() == 0
+        assert not repo_data.suitable()
+        assert fake.requested('GET', COMMITS_PATH) == 1
+
+
+@mark.parametrize('fields', [
+    {'pushed_at': None}, {'size': 0}, {'fork': True}, {'language': None},
+    {'language': 'Markdown'},
+])
+def test_unsuitable_payload_costs_no_api_call(fields):
+    with FakeGithub() as fake:
+        _serve_commits(fake, dates=['2020-06-01T00:00:00Z'])
+        repo_data = _repo_data(fake, **fields)
+
+        assert not repo_data.suitable()
+        assert fake.requested('GET', '/repos/owner/repo/languages') == 0
+        assert fake.requested('GET', COMMITS_PATH) == 0
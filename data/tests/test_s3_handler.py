@@ -0,0 +1,128 @@
+from itertools import count
+from json import loads
+from logging import getLogger
+
+from botocore.exceptions import ClientError
+from pytest import fixture
+
+from data_gathering import s3_handler
+from data_gathering.s3_handler import S3Handler
+
+
+LOGGER = getLogger('test')
+MANIFEST = 'manifests/ids.dat.json'
+
+
+@fixture
+def handler(bucket, monkeypatch):
+    # every upload gets a timestamp a second later than the previous one
+    seconds = count(start=1600000000)
+    monkeypatch.setattr(s3_handler, 'time', lambda: next(seconds))
+    with open('ids.dat', 'w') as f:
+        f.write('1\n')
+    with open('ids.dat.delta', 'w') as f:
+        f.write('2\n')
+    return S3Handler(region_name='eu-central-1', retention=2)
+
+
+def _stored_manifest(handler):
+    return loads(handler.read_object(object_name=MANIFEST))
+
+
+def _another_run(change):
+    """Runs change as another run would, with manifests of its own."""
+    manifests = dict(S3Handler._manifests)
+    S3Handler._manifests.clear()
+    change(S3Handler(region_name='eu-central-1', retention=2))
+    S3Handler._manifests.clear()
+    S3Handler._manifests.update(manifests)
+
+
+def test_retention_is_kept_and_recorded(handler):
+    for _ in range(3):
+        handler.upload_file(file_name='ids.dat', logger=LOGGER)
+    handler.delete_oldest_object(file_name='ids.dat', logger=LOGGER)
+
+    manifest = _stored_manifest(handler)
+    assert manifest['retention'] == 2
+    assert len(manifest['history']) == 2
+    assert manifest['latest'] == manifest['history'][-1]
+    assert sorted(handler.list_objects_in_bucket(prefix='ids')) == (
+        manifest['history']
+    )
+
+
+def test_manifest_changed_by_another_run_is_read_again(handler):
+    handler.upload_file(file_name='ids.dat', logger=LOGGER)
+
+    _another_run(lambda other: other.upload_delta(
+        file_name='ids.dat', delta_name='ids.dat.delta', logger=LOGGER
+    ))
+    # the cached manifest is stale, the write is retried on the stored one
+    handler.upload_file(file_name='ids.dat', logger=LOGGER)
+
+    manifest = _stored_manifest(handler)
+    assert len(manifest['history']) == 2
+    assert [delta['name'] for delta in manifest['deltas']] == [
+        'ids.dat.delta'
+    ]
+    assert manifest['version'] == 3
+    assert handler.manifest(file_name='ids.dat') == manifest
+
+
+def test_manifest_created_by_another_run_is_not_overwritten(handler):
+    handler.manifest(file_name='ids.dat')
+
+    _another_run(lambda other: other.upload_file(
+        file_name='ids.dat', logger=LOGGER
+    ))
+    handler.upload_delta(
+        file_name='ids.dat', delta_name='ids.dat.delta', logger=LOGGER
+    )
+
+    manifest = _stored_manifest(handler)
+    assert len(manifest['history']) == 1
+    assert len(manifest['deltas']) == 1
+
+
+def test_deltas_are_deleted_after_the_manifest_is_written(handler):
+    handler.upload_delta(
+        file_name='ids.dat', delta_name='ids.dat.delta', logger=LOGGER
+    )
+    _another_run(lambda other: other.upload_file(
+        file_name='ids.dat', logger=LOGGER
+    ))
+    handler.delete_deltas(
+        file_name='ids.dat', delta_names=['ids.dat.delta'], logger=LOGGER
+    )
+
+    manifest = _stored_manifest(handler)
+    assert manifest['deltas'] == []
+    assert handler.list_objects_in_bucket(prefix='ids') == (
+        manifest['history']
+    )
+
+
+def test_writes_are_unconditional_without_endpoint_support(handler, caplog):
+    put_object = handler.client.put_object
+    conditions = []
+
+    def rejecting_conditions(**kwargs):
+        conditional = 'IfMatch' in kwargs or 'IfNoneMatch' in kwargs
+        if kwargs['Key'] == MANIFEST:
+            conditions.append(conditional)
+        if conditional:
+            raise ClientError({'Error': {
+                'Code': 'NotImplemented',
+                'Message': 'A header you provided implies functionality ' +
+                           'that is not implemented'
+            }}, 'PutObject')
+        return put_object(**kwargs)
+
+    handler.client.put_object = rejecting_conditions
+    handler.upload_file(file_name='ids.dat', logger=LOGGER)
+    handler.upload_file(file_name='ids.dat', logger=LOGGER)
+
+    assert conditions == [True, False, False]
+    assert len(_stored_manifest(handler)['history']) == 2
+    assert 'Conditional writes rejected' in caplog.text
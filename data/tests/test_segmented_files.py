@@ -0,0 +1,104 @@
+from logging import getLogger
+
+from data_gathering.s3_handler import S3Handler
+from data_gathering.segmented_files import SegmentedFiles
+
+
+LOGGER = getLogger('test')
+
+
+def _segments(file_name='features.csv', max_segments=3):
+    return SegmentedFiles(
+        file_names=[file_name], region_name='eu-central-1',
+        max_segments=max_segments
+    )
+
+
+def _append(file_name, text):
+    with open(file_name, 'a') as f:
+        f.write(text)
+
+
+def _read(file_name):
+    with open(file_name) as f:
+        return f.read()
+
+
+def _reassembled(file_name='features.csv', max_segments=3):
+    with open(file_name, 'w'):
+        pass
+    assert _segments(max_segments=max_segments).download(
+        file_name=file_name, logger=LOGGER
+    )
+    return _read(file_name)
+
+
+def test_only_appended_bytes_are_uploaded(bucket):
+    with open('features.csv', 'w') as f:
+        f.write('id\n1\n')
+    segments = _segments()
+    segments.upload(file_name='features.csv', logger=LOGGER)
+    _append('features.csv', '2\n')
+    segments.upload(file_name='features.csv', logger=LOGGER)
+    segments.upload(file_name='features.csv', logger=LOGGER)
+
+    manifest = _segments()._manifest(file_name='features.csv')
+    assert [segment['size'] for segment in manifest['segments']] == [5, 2]
+    assert _reassembled() == 'id\n1\n2\n'
+
+
+def test_upload_continues_a_downloaded_file(bucket):
+    with open('features.csv', 'w') as f:
+        f.write('id\n1\n')
+    _segments().upload(file_name='features.csv', logger=LOGGER)
+
+    # a later run downloads the file, appends and uploads the tail only
+    segments = _segments()
+    segments.download(file_name='features.csv', logger=LOGGER)
+    _append('features.csv', '2\n')
+    segments.upload(file_name='features.csv', logger=LOGGER)
+
+    manifest = _segments()._manifest(file_name='features.csv')
+    assert len(manifest['segments']) == 2
+    assert _reassembled() == 'id\n1\n2\n'
+
+
+def test_rewritten_file_replaces_the_segments(bucket):
+    with open('features.csv', 'w') as f:
+        f.write('id\n1\n2\n')
+    _segments().upload(file_name='features.csv', logger=LOGGER)
+
+    # a new run regenerates a shorter file, it cannot continue the upload
+    with open('features.csv', 'w') as f:
+        f.write('id\n3\n')
+    _segments().upload(file_name='features.csv', logger=LOGGER)
+
+    manifest = _segments()._manifest(file_name='features.csv')
+    assert len(manifest['segments']) == 1
+    assert _reassembled() == 'id\n3\n'
+
+
+def test_segments_are_compacted_over_the_maximum(bucket):
+    with open('features.csv', 'w') as f:
+        f.write('id\n')
+    segments = _segments(max_segments=2)
+    for repo_id in range(1, 4):
+        segments.upload(file_name='features.csv', logger=LOGGER)
+        _append('features.csv', f'{repo_id}\n')
+    segments.upload(file_name='features.csv', logger=LOGGER)
+
+    # the third segment compacted the first three into the fourth
+    keys = [
+        segment['key']
+        for segment in _segments()._manifest(file_name='features.csv')[
+            'segments'
+        ]
+    ]
+    assert keys == [
+        'segments/features.csv/00000003', 'segments/features.csv/00000004'
+    ]
+    assert _reassembled(max_segments=2) == 'id\n1\n2\n3\n'
+    # the replaced segments are deleted
+    assert sorted(S3Handler(region_name='eu-central-1').list_objects_in_bucket(
+        prefix='segments/'
+    )) == keys + ['segments/features.csv/manifest']
@@ -0,0 +1,85 @@
+from time import time
+
+from pytest import fixture, raises
+
+from data_gathering import TOKEN_POOL
+from data_gathering.connection import observe_rate_limits
+from data_gathering.token_pool import NoAPICalls, TokenPool
+
+from tests.fake_github import FakeGithub, repo_json
+
+
+@fixture
+def fake():
+    with FakeGithub() as fake:
+        yield fake
+
+
+@fixture
+def pool(fake):
+    """Pool of two tokens of the fake API, observing its responses."""
+    pool = TokenPool(tokens=['first', 'second'], base_url=fake.url)
+    observe_rate_limits(observer=pool.observe)
+    yield pool
+    observe_rate_limits(observer=TOKEN_POOL.observe)
+
+
+def _limits(resource, remaining, limit):
+    return {
+        'X-RateLimit-Resource': resource,
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Limit': str(limit),
+        'X-RateLimit-Reset': str(int(time()) + 3600),
+    }
+
+
+def test_budgets_are_kept_per_resource(fake, pool):
+    fake.route('GET', '/search/repositories', lambda query, data: (
+        200, {'total_count': 0, 'items': []}, _limits('search', 0, 30)
+    ))
+    fake.route('GET', '/repos/owner/repo', lambda query, data: (
+        200, repo_json(url=fake.url), _limits('core', 4000, 5000)
+    ))
+    first, second = pool.instances
+
+    list(first.search_repositories(query='language:python'))
+    first.get_repo('owner/repo')
+
+    # the core response does not hide the exhausted search budget
+    assert all(
+        pool.lease(resource='search') is second for _ in range(20)
+    )
+    assert pool.lease(resource='core') in (first, second)
+
+
+def test_lease_waits_for_the_exhausted_resource_only(fake, pool):
+    fake.route('GET', '/search/repositories', lambda query, data: (
+        200, {'total_count': 0, 'items': []}, _limits('search', 0, 30)
+    ))
+    for git in pool.instances:
+        list(git.search_repositories(query='language:python'))
+
+    with raises(NoAPICalls):
+        pool.lease(resource='search', max_wait=0)
+    assert pool.lease(resource='graphql', max_wait=0)
+
+
+def test_search_pages_hold_a_hundred_repos(fake, pool):
+    repos = [
+        {**repo_json(url=fake.url, name=f'repo{index}'), 'id': index}
+        for index in range(250)
+    ]
+
+    def search(query, data):
+        per_page = int(query['per_page'][0])
+        page = int(query.get('page', ['1'])[0])
+        start = (page - 1) * per_page
+        return 200, {
+            'total_count': len(repos), 'items': repos[start:start + per_page]
+        }, {}
+
+    fake.route('GET', '/search/repositories', search)
+    git = pool.lease(resource='search')
+
+    assert len(git.search_repositories(query='q').get_page(0)) == 100
+    assert git.per_page == 100
@@ -0,0 +1,35 @@
+from data_gathering.tree_index import TreeIndex
+
+from .fake_github import FakeGithub, repo_json
+
+
+def _index(fake, paths):
+    fake.route('GET', '/repos/owner/repo', (200, repo_json(url=fake.url)))
+    fake.route('GET', '/repos/owner/repo/git/trees/master', (200, {
+        'sha': 'master', 'truncated': False, 'tree': [
+            {'path': name, 'type': 'tree', 'mode': '040000', 'sha': name}
+            for name in paths
+        ]
+    }))
+    return TreeIndex.from_repo(repo=fake.github().get_repo('owner/repo'))
+
+
+def test_vendor_patterns_match_at_the_start_of_the_directory_path(configs):
+    with FakeGithub() as fake:
+        index = _index(fake, paths=[
+            '_esy', '_esy/examples', 'src', 'src/_esy', 'src/_esy/docs',
+            'cache', 'cache/tests'
+        ])
+
+    assert '_esy' not in index.dirs and not index.has_dir(['examples'])
+    assert 'src/_esy' in index.dirs and index.has_dir(['docs'])
+    # the pattern of cache needs the slash, only the path below matches
+    assert 'cache' in index.dirs and not index.has_dir(['tests'])
+
+
+def test_directory_names_are_compared_as_they_are(configs):
+    with FakeGithub() as fake:
+        index = _index(fake, paths=['Tests', 'docs'])
+
+    assert not index.has_dir(['test', 'tests'])
+    assert index.has_dir(['doc', 'docs'])
@@ -0,0 +1,242 @@
+from functools import partial
+from json import dumps
+from logging import getLogger
+from multiprocessing import get_context
+from threading import Thread
+from urllib.request import Request, urlopen
+
+from pytest import fixture
+
+from data_gathering import s3_handler, work_queue
+from data_gathering.dataset import OfflineDataset
+from data_gathering.dataset_writer import read_parquet
+from data_gathering.s3_handler import S3Handler
+from data_gathering.visited_store import VisitedStore
+from data_gathering.work_queue import LocalObjects, WorkQueue
+
+
+@fixture(params=['s3', 'local'])
+def objects(request):
+    if request.param == 'local':
+        yield LocalObjects(file_name=':memory:')
+    else:
+        request.getfixturevalue('bucket')
+        yield S3Handler(region_name='eu-central-1')
+
+
+@fixture(params=['s3', 'local'])
+def shared(request, tmp_path, monkeypatch):
+    """Backend of worker processes, an S3 server or an SQLite file."""
+    if request.param == 'local':
+        yield 'local', str(tmp_path / 'objects.sqlite')
+        return
+
+    from moto.server import create_backend_app, DomainDispatcherApplication
+    from werkzeug.serving import make_server
+
+    # requests are served one at a time, so that a conditional write is
+    # atomic as in S3, the threaded moto server checks and writes apart
+    server = make_server(
+        '127.0.0.1', 0, DomainDispatcherApplication(create_backend_app),
+        threaded=False
+    )
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://127.0.0.1:{server.server_port}'
+    # workers read the endpoint on import, this process has imported it
+    monkeypatch.setenv('ENDPOINT_URL', url)
+    monkeypatch.setattr(s3_handler, '_ENDPOINT_URL', url)
+    S3Handler(region_name='eu-central-1').create_bucket()
+    yield 's3', url
+    # the backends of moto are kept by this process, not by the server
+    urlopen(Request(f'{url}/moto-api/reset', method='POST'))
+    server.shutdown()
+    thread.join()
+    S3Handler._manifests.clear()
+    S3Handler._bucket_exists = False
+    S3Handler._conditional_writes = True
+
+
+@fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(work_queue, 'time', lambda: now[0])
+    return now
+
+
+def _queue(objects, worker, lease_seconds=60):
+    return WorkQueue(
+        objects=objects, name='compute', worker=worker,
+        lease_seconds=lease_seconds
+    )
+
+
+def _open(backend):
+    kind, location = backend
+    if kind == 'local':
+        return LocalObjects(file_name=location)
+    return S3Handler(region_name='eu-central-1')
+
+
+def _run(target, backend, barrier, results, index):
+    objects = _open(backend=backend)
+    barrier.wait()
+    results.put((index, target(objects, index)))
+
+
+def _in_processes(count, target, backend):
+    """Runs target in count processes started at once, returns the results.
+
+    The target gets the objects of the backend opened by its process and
+    the index of the process.
+    """
+    context = get_context('spawn')
+    barrier, results = context.Barrier(count), context.Queue()
+    processes = [
+        context.Process(
+            target=_run, args=(target, backend, barrier, results, index)
+        ) for index in range(count)
+    ]
+    for process in processes:
+        process.start()
+    collected = dict(results.get(timeout=120) for _ in processes)
+    for process in processes:
+        process.join()
+    return [collected[index] for index in range(count)]
+
+
+def _write_if(objects, index, etag):
+    return objects.write_object_if(
+        object_name='lease', body=f'worker {index}'.encode(), etag=etag
+    )
+
+
+def _claim(objects, index):
+    return _queue(objects, f'worker {index}').claim() is not None
+
+
+def _work(objects, index):
+    """Computes chunks until none is left, then tries to merge."""
+    queue = _queue(objects, f'worker {index}')
+    completed = []
+    while True:
+        lease = queue.claim()
+        if not lease:
+            break
+        if queue.complete(
+            lease=lease, computed=lease.ids, output=str(index).encode()
+        ):
+            completed.append(lease.name)
+    merge = queue.claim_merge()
+    return completed, bool(merge and queue.complete(lease=merge, computed=[]))
+
+
+def test_chunks_are_computed_and_merged_once(objects):
+    first, second = _queue(objects, 'first'), _queue(objects, 'second')
+    assert first.populate(ids=range(10), chunk_size=4) == 3
+    assert second.populate(ids=range(100), chunk_size=4) == 3
+
+    for queue in (first, second, first):
+        lease = queue.claim()
+        assert queue.complete(
+            lease=lease, computed=lease.ids, output=str(lease.ids).encode()
+        )
+    assert first.claim() is None and first.remaining() == 0
+
+    merge = second.claim_merge()
+    assert merge and first.claim_merge() is None
+    assert [ids for ids, _ in first.outputs()] == [
+        [0, 1, 2, 3], [4, 5, 6, 7], [8, 9]
+    ]
+
+
+def test_expired_lease_is_claimed_by_another_worker(objects, clock):
+    stopped, other = _queue(objects, 'stopped'), _queue(objects, 'other')
+    stopped.populate(ids=range(4), chunk_size=4)
+    lease = stopped.claim()
+    assert other.claim() is None
+
+    clock[0] += 61
+    reclaimed = other.claim()
+    assert reclaimed.ids == lease.ids
+
+    # the stopped worker notices the loss and its output does not count
+    assert not stopped.heartbeat(lease=lease)
+    assert not stopped.complete(lease=lease, computed=[0], output=b'lost')
+    assert other.complete(
+        lease=reclaimed, computed=reclaimed.ids, output=b'kept'
+    )
+    assert list(other.outputs()) == [([0, 1, 2, 3], b'kept')]
+
+
+def test_concurrent_conditional_writes_have_one_winner(shared):
+    objects = _open(backend=shared)
+    etag = objects.write_object_if(object_name='lease', body=b'free')
+    assert etag
+    assert objects.write_object_if(object_name='lease', body=b'again') is None
+
+    results = _in_processes(8, partial(_write_if, etag=etag), shared)
+
+    winners = [index for index, result in enumerate(results) if result]
+    assert len(winners) == 1
+    assert objects.read_versioned_object(object_name='lease') == (
+        f'worker {winners[0]}'.encode(), results[winners[0]]
+    )
+
+
+def test_concurrent_claims_of_a_chunk_have_one_winner(shared):
+    _queue(_open(backend=shared), 'populating').populate(
+        ids=range(4), chunk_size=4
+    )
+
+    assert sum(_in_processes(8, _claim, shared)) == 1
+
+
+def test_workers_compute_every_chunk_once_and_merge_once(shared):
+    _queue(_open(backend=shared), 'populating').populate(
+        ids=range(40), chunk_size=4
+    )
+
+    results = _in_processes(4, _work, shared)
+
+    completed = [name for names, _ in results for name in names]
+    assert sorted(completed) == [f'chunks/{index:06d}' for index in range(10)]
+    assert [merged for _, merged in results].count(True) == 1
+
+
+def test_merge_repeated_after_upload_adds_no_rows(tmp_path, monkeypatch):
+    features = ['repo_name', 'url', 'forks_count']
+    ids_file = str(tmp_path / 'ids.dat')
+    VisitedStore(file_name=ids_file).rewrite(keys=set(range(8)))
+    queue = _queue(LocalObjects(file_name=':memory:'), 'merging')
+    queue.populate(ids=range(8), chunk_size=4)
+    while (lease := queue.claim()):
+        queue.complete(
+            lease=lease, computed=lease.ids, output=dumps([
+                [f'owner/repo{repo_id}', f'url{repo_id}', repo_id]
+                for repo_id in lease.ids
+            ]).encode()
+        )
+    merge = dict(
+        features=features, ids_file_name=ids_file,
+        csv_file_name=str(tmp_path / 'features.csv'),
+        parquet_file_name=str(tmp_path / 'features.parquet'),
+        other_files=[], region_name='', file_name_prefix='',
+        logger=getLogger('test')
+    )
+    dataset = OfflineDataset()
+    # the worker merging first stops before marking the merge done, its
+    # lease is given up as if it expired
+    lease = queue.claim_merge()
+    with monkeypatch.context() as patch:
+        patch.setattr(queue, 'complete', lambda lease, computed: True)
+        dataset._merge_chunks(queue=queue, lease=lease, **merge)
+    queue.release(lease=lease)
+    dataset._merge_chunks(queue=queue, lease=queue.claim_merge(), **merge)
+
+    with open(tmp_path / 'features.csv') as f:
+        assert len(f.readlines()) == 9
+    assert read_parquet(
+        file_name=str(tmp_path / 'features.parquet')
+    ).column('url').to_pylist() == [f'url{repo_id}' for repo_id in range(8)]
+    assert queue.merged()